@@ -7,10 +7,10 @@ import os
 import logging
 import subprocess
 from pathlib import Path
-from gcloud_ops import list_dirs
+from gcloud_ops import iter_objects, list_dirs
 from collections import defaultdict
 
-from file_utils import parse_file_size_to_bytes
+from file_utils import format_bytes_readable
 
 logging.basicConfig(
     level=logging.INFO,
@@ -417,7 +417,7 @@ def validate_local_release_resources_structure(
 
 
 def list_bucket_structure(gs_bucket: str, temp_dir: Path = None, save_log: bool = False,
-                          case_folders: list = None) -> tuple:
+                          case_folders: list = None, inventory_report: str = None) -> tuple:
     """
     List gs_bucket contents recursively and organise by top-level folder.
 
@@ -431,6 +431,9 @@ def list_bucket_structure(gs_bucket: str, temp_dir: Path = None, save_log: bool
         If True and `temp_dir` is provided, write gcloud output to a log file.
     case_folders : list, optional
         Expected lowercase folder names; any mismatch in actual case is reported.
+    inventory_report : str, optional
+        Inventory report file(s) (CSV or Parquet file, directory or glob) to read
+        the bucket's objects from instead of listing the bucket.
 
     Returns
     -------
@@ -443,57 +446,51 @@ def list_bucket_structure(gs_bucket: str, temp_dir: Path = None, save_log: bool
         case_warnings : list of dict
             One entry per folder with a case mismatch: {'expected': str, 'found': str}.
     """
-    print(f"  Listing bucket structure...")
-    cmd = [
-        "gcloud", "storage", "ls",
-        "--recursive",
-        "--long",
-        "--readable-sizes",
-        gs_bucket,
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-
+    print(f"  Listing bucket structure{f' from inventory report {inventory_report}' if inventory_report else ''}...")
+    log_fh = None
     if save_log and temp_dir:
         log_file = temp_dir / "gcloud_ls_output.txt"
-        with open(log_file, 'w') as f:
-            f.write(result.stdout)
-        print(f"  Saved gcloud ls output to: {log_file}")
+        log_fh = open(log_file, 'w')
 
     structure = defaultdict(list)
     folder_name_map = {}
     case_warnings = []
 
-    for line in result.stdout.strip().split('\n'):
-        line = line.strip()
-        if not line or line.startswith('TOTAL:') or line.endswith(':'):
-            continue
-
-        parts = line.split(None, 2)
-        if len(parts) != 3:
-            continue
-        size_str, _date_str, path = parts
-        size_bytes = parse_file_size_to_bytes(size_str)
-
-        if path.endswith('/'):
-            continue
-
-        filename = os.path.basename(path)
-        if filename.startswith('.'):
-            continue
-
-        file_info = {'path': path, 'size': size_bytes, 'size_str': size_str}
-
-        path_parts = path.replace(gs_bucket + '/', '').split('/')
-        if len(path_parts) > 1:
-            folder_original = path_parts[0]
-            folder_lower = folder_original.lower()
-            structure[folder_lower].append(file_info)
-
-            if folder_lower not in folder_name_map:
-                folder_name_map[folder_lower] = folder_original
-                if case_folders and folder_lower in case_folders and folder_original != folder_lower:
-                    case_warnings.append({'expected': folder_lower, 'found': folder_original})
+    # Records are aggregated as the listing streams in; the full output is never held in memory
+    try:
+        if inventory_report:
+            from inventory_reports import iter_report_records
+            records = iter_report_records(inventory_report, gs_bucket)
         else:
-            structure['root'].append(file_info)
+            records = iter_objects(gs_bucket)
+        for record in records:
+            path = record.url
+            size_bytes = record.size
+            size_str = format_bytes_readable(size_bytes)
+            if log_fh:
+                log_fh.write(f"{size_str:>12}  {record.updated}  {path}\n")
+
+            filename = os.path.basename(path)
+            if filename.startswith('.'):
+                continue
+
+            file_info = {'path': path, 'size': size_bytes, 'size_str': size_str}
+
+            path_parts = path.replace(gs_bucket + '/', '').split('/')
+            if len(path_parts) > 1:
+                folder_original = path_parts[0]
+                folder_lower = folder_original.lower()
+                structure[folder_lower].append(file_info)
+
+                if folder_lower not in folder_name_map:
+                    folder_name_map[folder_lower] = folder_original
+                    if case_folders and folder_lower in case_folders and folder_original != folder_lower:
+                        case_warnings.append({'expected': folder_lower, 'found': folder_original})
+            else:
+                structure['root'].append(file_info)
+    finally:
+        if log_fh:
+            log_fh.close()
+            print(f"  Saved listing to: {log_file}")
 
     return dict(structure), folder_name_map, case_warnings
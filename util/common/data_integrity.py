@@ -1,83 +1,235 @@
 #!/usr/bin/env python3
 """Data-integrity checks for staging -> production promotion.
 
-Operates on google.cloud.storage Bucket objects: gathers release file lists,
-reads MANIFEST.tsv files, runs MD5 / non-empty / associated-metadata checks,
-and compares staging vs. curated blob names and hashes.
+Each bucket's release outputs are listed once into a BlobInventory (one
+prefix listing of <workflow>/release/<version>/ with only the fields the
+checks need); the file lists, MANIFEST.tsv reads, MD5 / non-empty /
+associated-metadata / manifest-checksum checks and the staging vs. curated
+ReleaseDiff all run against that snapshot.
 """
 
-import re
 import logging
 import pandas as pd
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from io import StringIO
 
+from storage_backends import ObjectRecord
 
-def list_gs_files(bucket, release_version, workflow_name):
-	blobs = bucket.list_blobs(prefix=workflow_name) # This skips the curated metadata and artifacts directories
+
+# Only the fields the checks read, so listing pages stay small
+INVENTORY_FIELDS = "items(name,size,md5Hash,crc32c,generation,updated),nextPageToken"
+MANIFEST_COLUMNS = ["filename", "md5_hash", "timestamp", "workflow", "workflow_version", "workflow_release"]
+MANIFEST_FETCH_WORKERS = 16
+
+
+def release_prefix(workflow_name, release_version):
+	return f"{workflow_name}/release/{release_version}/"
+
+
+def _list_records(bucket, prefix):
+	records = [
+		ObjectRecord(
+			bucket=bucket.name,
+			name=blob.name,
+			size=blob.size or 0,
+			md5_hash=blob.md5_hash,
+			crc32c=blob.crc32c,
+			generation=blob.generation,
+			updated=blob.updated.isoformat() if blob.updated else None,
+		)
+		for blob in bucket.list_blobs(prefix=prefix, fields=INVENTORY_FIELDS)
+	]
+	logging.info(f"Listed {len(records)} objects under [gs://{bucket.name}/{prefix}]")
+	return records
+
+
+class BlobInventory:
+	"""Snapshot of every object under <workflow>/release/<version>/ in one bucket."""
+
+	def __init__(self, bucket, release_version, workflow_name, records, bucket_name=None):
+		self.bucket = bucket  # None for an inventory read from a report file with no bucket to fetch from
+		self.bucket_name = bucket_name or bucket.name
+		self.release_version = release_version
+		self.workflow_name = workflow_name
+		self.records = records
+		self.by_name = {record.name: record for record in records}
+
+	@classmethod
+	def from_bucket(cls, bucket, release_version, workflow_name, store=None, max_age=None):
+		"""
+		List the release prefix once. This skips the curated metadata and artifacts directories.
+
+		store: optional InventoryStore; the listing is then saved as a snapshot,
+		and a stored snapshot younger than max_age seconds is used instead of listing.
+		"""
+		prefix = release_prefix(workflow_name, release_version)
+		if store is not None:
+			snapshot, _changes = store.refresh(bucket.name, prefix, lambda: _list_records(bucket, prefix), max_age)
+			return cls(bucket, release_version, workflow_name, snapshot.records)
+		return cls(bucket, release_version, workflow_name, _list_records(bucket, prefix))
+
+	@classmethod
+	def from_report(cls, report_paths, bucket_name, release_version, workflow_name, bucket=None):
+		"""
+		Read the release prefix from inventory report files instead of listing it.
+
+		bucket: optional google.cloud.storage Bucket, needed only by the checks
+		that read object contents (read_manifest_files, deep_verify).
+		"""
+		from inventory_reports import iter_report_records
+
+		prefix = release_prefix(workflow_name, release_version)
+		records = list(iter_report_records(report_paths, f"gs://{bucket_name}/{prefix}"))
+		return cls(bucket, release_version, workflow_name, records, bucket_name=bucket_name)
+
+	@property
+	def names(self):
+		return [record.name for record in self.records]
+
+	def url(self, name):
+		return f"gs://{self.bucket_name}/{name}"
+
+	def __len__(self):
+		return len(self.records)
+
+
+def list_gs_files(inventory):
 	blob_names = []
 	gs_files = []
 	sample_list_loc = []
-	pattern = re.compile(rf"{workflow_name}/release/{release_version}/") # This checks for the most recent release version
-	for blob in blobs:
-		if pattern.match(blob.name):
-			blob_names.append(blob.name)
-			gs_files.append(f"gs://{bucket.name}/{blob.name}")
-			if blob.name.endswith("sample_list.tsv"):
-				sample_list_loc.append(f"gs://{bucket.name}/{blob.name}")
+	for record in inventory.records:
+		blob_names.append(record.name)
+		gs_files.append(record.url)
+		if record.name.endswith("sample_list.tsv"):
+			sample_list_loc.append(record.url)
 	return blob_names, gs_files, sample_list_loc
 
 
-def read_manifest_files(bucket, release_version, workflow_name):
-	blobs = bucket.list_blobs(prefix=workflow_name) # This has to be called again because 'Iterator has already started'
+def _download_texts(inventory, names, max_workers):
+	def _download(name):
+		return inventory.bucket.blob(name).download_as_bytes().decode("utf-8")
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names))), thread_name_prefix="manifest") as pool:
+		return list(pool.map(_download, names))
+
+
+def _parse_manifest(text, gs_path):
+	try:
+		return pd.read_csv(StringIO(text), sep="\t", dtype=str)
+	except pd.errors.ParserError as e:
+		raise pd.errors.ParserError(
+			f"Failed to parse {gs_path}: {e}"
+		) from e
+
+
+def read_manifest_files(inventory, max_workers=MANIFEST_FETCH_WORKERS):
+	"""
+	Combine every MANIFEST.tsv in the inventory into one DataFrame (all columns as str).
+
+	Manifests are downloaded concurrently; manifests that share a header row are
+	then joined and parsed in a single read_csv pass. A parse error is raised
+	against the gs:// path of the manifest that caused it.
+	"""
+	names = [record.name for record in inventory.records if record.name.endswith("MANIFEST.tsv")]
+	for name in names:
+		logging.info(f"Reading manifest: {inventory.url(name)}")
+	texts = _download_texts(inventory, names, max_workers) if names else []
+
+	groups = {}  # header row -> [(gs_path, text)]
+	for name, text in zip(names, texts):
+		header = text.split("\n", 1)[0].rstrip("\r")
+		if not header.strip():
+			raise pd.errors.EmptyDataError(f"Failed to parse {inventory.url(name)}: no header row")
+		missing = [column for column in MANIFEST_COLUMNS if column not in header.split("\t")]
+		if missing:
+			logging.warning(f"Manifest {inventory.url(name)} is missing columns: {', '.join(missing)}")
+		groups.setdefault(header, []).append((inventory.url(name), text))
+
 	manifest_dfs = []
-	pattern = re.compile(rf"{workflow_name}/release/{release_version}/")
-	for blob in blobs:
-		if blob.name.endswith("MANIFEST.tsv") and pattern.match(blob.name):
-			gs_path = f"gs://{bucket.name}/{blob.name}"
-			logging.info(f"Reading manifest: {gs_path}")
-			content = blob.download_as_text()
-			try:
-				manifest_df = pd.read_csv(StringIO(content), sep="\t")
-			except pd.errors.ParserError as e:
-				raise pd.errors.ParserError(
-					f"Failed to parse {gs_path}: {e}"
-				) from e
-			manifest_dfs.append(manifest_df)
+	for header, manifests in groups.items():
+		bodies = []
+		for _gs_path, text in manifests:
+			body = text.split("\n", 1)[1] if "\n" in text else ""
+			bodies.append(body if body.endswith("\n") or not body else body + "\n")
+		try:
+			manifest_dfs.append(pd.read_csv(StringIO(header + "\n" + "".join(bodies)), sep="\t", dtype=str))
+		except pd.errors.ParserError as e:
+			# Re-parse one by one so the error names the manifest that is malformed
+			for gs_path, text in manifests:
+				_parse_manifest(text, gs_path)
+			raise pd.errors.ParserError(
+				f"Failed to parse {', '.join(gs_path for gs_path, _text in manifests)}: {e}"
+			) from e
 	combined_df = pd.concat(manifest_dfs, ignore_index=True)
 	return combined_df
 
 
-def md5_check(bucket, release_version, workflow_name):
-	blobs = bucket.list_blobs(prefix=workflow_name)
-	hashes = {}
-	pattern = re.compile(rf"{workflow_name}/release/{release_version}/")
-	for blob in blobs:
-		if pattern.match(blob.name):
-			hashes[blob] = blob.md5_hash
-	return hashes
+def md5_check(inventory, computed_md5=None):
+	"""
+	Object name → base64 MD5 (None for composite objects, which only have a
+	crc32c, unless computed_md5 from deep_verify() has their hash).
+	"""
+	computed_md5 = computed_md5 or {}
+	return {record.name: record.md5_hash or computed_md5.get(record.name) for record in inventory.records}
 
 
-def non_empty_check(bucket, release_version, workflow_name, GREEN_CHECKMARK, RED_X):
-	blobs = bucket.list_blobs(prefix=workflow_name)
+def non_empty_check(inventory, GREEN_CHECKMARK, RED_X):
 	not_empty_tests = {}
-	pattern = re.compile(rf"{workflow_name}/release/{release_version}/")
-	for blob in blobs:
-		if pattern.match(blob.name):
-			if blob.size <= 10:
-				logging.error(f"Found a file less than or equal to 10 bytes: [{blob.name}]")
-				not_empty_tests[blob.name] = f"{RED_X}"
-			else:
-				not_empty_tests[blob.name] = f"{GREEN_CHECKMARK}"
+	for record in inventory.records:
+		if record.size <= 10:
+			logging.error(f"Found a file less than or equal to 10 bytes: [{record.name}]")
+			not_empty_tests[record.name] = f"{RED_X}"
+		else:
+			not_empty_tests[record.name] = f"{GREEN_CHECKMARK}"
 	return not_empty_tests
 
 
+class ManifestFilenameIndex:
+	"""
+	Answers `any(name in filename for filename in manifest_filenames)` without
+	scanning every manifest row per lookup.
+
+	Exact matches (the usual case: the manifest lists the file's basename) are a
+	set lookup. Anything else goes through a trigram index, built on the first
+	such lookup, that narrows the rows to those containing every trigram of
+	the name before the substring test confirms the match.
+	"""
+
+	def __init__(self, filenames):
+		self.filenames = [filename for filename in dict.fromkeys(filenames) if isinstance(filename, str)]
+		self._exact = set(self.filenames)
+		self._trigrams = None
+
+	def _build_trigrams(self):
+		trigrams = defaultdict(set)
+		for i, filename in enumerate(self.filenames):
+			for j in range(len(filename) - 2):
+				trigrams[filename[j:j + 3]].add(i)
+		self._trigrams = trigrams
+
+	def contains(self, name):
+		if name in self._exact:
+			return True
+		if len(name) < 3:
+			return any(name in filename for filename in self.filenames)
+		if self._trigrams is None:
+			self._build_trigrams()
+		postings = sorted((self._trigrams.get(name[j:j + 3], ()) for j in range(len(name) - 2)), key=len)
+		if not postings[0]:
+			return False
+		candidates = set(postings[0]).intersection(*postings[1:])
+		return any(name in self.filenames[i] for i in candidates)
+
+
 def associated_metadata_check(combined_manifest_df, blob_list, GREEN_CHECKMARK, RED_X):
 	metadata_present_tests = {}
+	manifest_index = ManifestFilenameIndex(combined_manifest_df["filename"].tolist())
 	for file in blob_list:
 		if file.endswith("MANIFEST.tsv"):
 			metadata_present_tests[file] = "N/A"
 		else:
-			if any(file.split('/')[-1] in filename for filename in combined_manifest_df["filename"].tolist()):
+			if manifest_index.contains(file.split('/')[-1]):
 				metadata_present_tests[file] = f"{GREEN_CHECKMARK}"
 			else:
 				logging.error(f"File does not have associated metadata and is absent from MANIFEST: [{file}]")
@@ -85,48 +237,150 @@ def associated_metadata_check(combined_manifest_df, blob_list, GREEN_CHECKMARK,
 	return metadata_present_tests
 
 
-def compare_blob_names(results, staging):
-	staging_blob_names = results[staging]["blob_names"]
-	curated_blob_names = results["curated"]["blob_names"]
-	staging_md5_hashes = results[staging]["md5_hashes"]
-	staging_bucket_name = next(iter(staging_md5_hashes)).bucket.name
-	same_files = ["N/A"]
-	new_files = ["N/A"]
-	deleted_files = ["N/A"]
-	if sorted(staging_blob_names) == sorted(curated_blob_names):
-		logging.info(f"The blob_names in '{staging}' are equal to those in 'curated.")
-	else:
-		logging.info(f"The blob_names in '{staging}' are not equal to those in 'curated'")
-		same_files = [file for file in staging_blob_names if file in curated_blob_names]
-		new_files = [f"gs://{staging_bucket_name}/{file}" for file in staging_blob_names if file not in curated_blob_names]
-		deleted_files = [f"gs://{staging_bucket_name}/{file}" for file in curated_blob_names if file not in staging_blob_names]
-		if new_files:
-			logging.info(f"New files in '{staging}': {new_files}")
-		if deleted_files:
-			logging.info(f"Deleted files in '{staging}': {deleted_files}")
-	return same_files, new_files, deleted_files
-
-
-def compare_md5_hashes(results, staging, same_files):
-	staging_md5_hashes = results[staging]["md5_hashes"]
-	curated_md5_hashes = results["curated"]["md5_hashes"]
-	staging_bucket_name = next(iter(staging_md5_hashes)).bucket.name
-	staging_file_hashes = {key.name: value for key, value in staging_md5_hashes.items()}
-	curated_file_hashes = {key.name: value for key, value in curated_md5_hashes.items()}
-	modified_files = {}
-	for file in same_files:
-		staging_hash = staging_file_hashes.get(file)
-		curated_hash = curated_file_hashes.get(file)
-		if staging_hash and curated_hash:
-			if staging_hash != curated_hash:
-				modified_files[f"gs://{staging_bucket_name}/{file}"] = {
-					"staging_hash": staging_hash
-				}
-				logging.info(f"Modified: {file}")
-	return modified_files
+CHECKSUM_STATUSES = ("match", "mismatch", "missing_manifest_hash", "composite_object", "not_in_manifest")
+
+
+def verify_manifest_checksums(combined_manifest_df, inventory, computed_md5=None):
+	"""
+	Compare each object's md5 with the md5_hash its MANIFEST.tsv rows record, from metadata only.
+
+	Rows are joined on basename (the manifest's `filename`); an object matches
+	if any manifest row for its basename carries the same hash, since manifests
+	from earlier runs can list older versions of a file. Returns one row per
+	object with columns name, object_md5, manifest_md5 and status, one of
+	CHECKSUM_STATUSES. Composite objects have no md5 to compare (crc32c only)
+	unless computed_md5 (from deep_verify()) supplies one.
+	"""
+	object_md5 = md5_check(inventory, computed_md5)
+	objects = pd.DataFrame(
+		list(object_md5.items()),
+		columns=["name", "object_md5"],
+		dtype=object,
+	)
+	objects["filename"] = objects["name"].str.rsplit("/", n=1).str[-1]
+	manifest = (
+		combined_manifest_df.reindex(columns=["filename", "md5_hash"])
+		.rename(columns={"md5_hash": "manifest_md5"})
+		.drop_duplicates()
+	)
+	joined = objects.merge(manifest, on="filename", how="left", indicator=True)
+	joined["listed"] = joined["_merge"] == "both"
+	joined["has_hash"] = joined["manifest_md5"].notna() & (joined["manifest_md5"].astype(str).str.strip() != "")
+	joined["equal"] = joined["has_hash"] & (joined["manifest_md5"].astype(str).str.strip() == joined["object_md5"])
+
+	per_object = joined.groupby("name", sort=False).agg(
+		object_md5=("object_md5", "first"),
+		manifest_md5=("manifest_md5", lambda hashes: ",".join(sorted(set(hashes.dropna().astype(str))))),
+		listed=("listed", "any"),
+		has_hash=("has_hash", "any"),
+		equal=("equal", "any"),
+	)
+	per_object["status"] = "mismatch"
+	per_object.loc[~per_object["has_hash"], "status"] = "missing_manifest_hash"
+	per_object.loc[per_object["equal"], "status"] = "match"
+	per_object.loc[per_object["object_md5"].isna(), "status"] = "composite_object"
+	per_object.loc[~per_object["listed"], "status"] = "not_in_manifest"
+	per_object = per_object.reset_index()[["name", "object_md5", "manifest_md5", "status"]]
+
+	counts = per_object["status"].value_counts()
+	logging.info(
+		f"Manifest checksums for [gs://{inventory.bucket_name}]: "
+		+ ", ".join(f"{counts.get(status, 0)} {status}" for status in CHECKSUM_STATUSES)
+	)
+	for row in per_object[per_object["status"] == "mismatch"].itertuples(index=False):
+		logging.error(f"MD5 mismatch for [{inventory.url(row.name)}]: object {row.object_md5}, MANIFEST {row.manifest_md5}")
+	for row in per_object[per_object["status"].isin(["missing_manifest_hash", "composite_object"])].itertuples(index=False):
+		logging.warning(f"Cannot verify [{inventory.url(row.name)}] against MANIFEST: {row.status}")
+	return per_object
+
+
+def checksum_check(checksums_df, GREEN_CHECKMARK, RED_X):
+	"""Per-object report cell: a mismatch fails; objects that cannot be verified are N/A with the reason."""
+	checksum_tests = {}
+	for name, status in zip(checksums_df["name"], checksums_df["status"]):
+		if status == "match":
+			checksum_tests[name] = f"{GREEN_CHECKMARK}"
+		elif status == "mismatch":
+			checksum_tests[name] = f"{RED_X}"
+		elif status == "not_in_manifest":
+			checksum_tests[name] = "N/A"
+		else:
+			checksum_tests[name] = f"N/A ({status})"
+	return checksum_tests
+
+
+def _content_changed(current, previous):
+	"""Compare (md5, crc32c, size) fingerprints by the strongest checksum both sides have."""
+	for i in (0, 1):
+		if current[i] and previous[i]:
+			return current[i] != previous[i]
+	return current[2] != previous[2]
+
+
+@dataclass
+class ReleaseDiff:
+	"""Staging vs. curated change set for one release prefix, computed in one hashed pass."""
+	staging_bucket: str
+	curated_bucket: str
+	added: list[str] = field(default_factory=list)
+	removed: list[str] = field(default_factory=list)
+	modified: dict[str, str] = field(default_factory=dict)  # name -> staging md5 (crc32c for composite objects)
+	unchanged: list[str] = field(default_factory=list)
+	staging_prefix: str = ""  # stripped from the names above when comparing different prefixes
+
+	@classmethod
+	def compute(cls, staging_inventory, curated_inventory, staging_prefix="", curated_prefix=""):
+		"""
+		staging_prefix / curated_prefix: compare names relative to these
+		prefixes, e.g. to diff two release versions of the same dataset.
+		"""
+		curated = {
+			record.name[len(curated_prefix):]: (record.md5_hash, record.crc32c, record.size)
+			for record in curated_inventory.records
+			if record.name.startswith(curated_prefix)
+		}
+		diff = cls(staging_inventory.bucket_name, curated_inventory.bucket_name, staging_prefix=staging_prefix)
+		for record in staging_inventory.records:
+			if not record.name.startswith(staging_prefix):
+				continue
+			name = record.name[len(staging_prefix):]
+			previous = curated.pop(name, None)
+			if previous is None:
+				diff.added.append(name)
+			elif _content_changed((record.md5_hash, record.crc32c, record.size), previous):
+				diff.modified[name] = record.md5_hash or record.crc32c
+				logging.info(f"Modified: {record.name}")
+			else:
+				diff.unchanged.append(name)
+		diff.removed = list(curated)
+		if diff.added:
+			logging.info(f"New files in [{diff.staging_bucket}]: {diff.added_urls}")
+		if diff.removed:
+			logging.info(f"Deleted files in [{diff.staging_bucket}]: {diff.removed_urls}")
+		if not diff.added and not diff.removed:
+			logging.info(f"The blob names in [{diff.staging_bucket}] are equal to those in [{diff.curated_bucket}]")
+		return diff
+
+	def _url(self, name):
+		return f"gs://{self.staging_bucket}/{self.staging_prefix}{name}"
+
+	@property
+	def added_urls(self):
+		return [self._url(name) for name in self.added]
+
+	@property
+	def removed_urls(self):
+		# Reported at the staging path they no longer exist under
+		return [self._url(name) for name in self.removed]
+
+	@property
+	def modified_urls(self):
+		return {self._url(name): staging_hash for name, staging_hash in self.modified.items()}
 
 
 __all__ = [
+    "INVENTORY_FIELDS", "MANIFEST_COLUMNS", "MANIFEST_FETCH_WORKERS", "release_prefix", "BlobInventory",
     "list_gs_files", "read_manifest_files", "md5_check", "non_empty_check",
-    "associated_metadata_check", "compare_blob_names", "compare_md5_hashes",
+    "ManifestFilenameIndex", "associated_metadata_check", "CHECKSUM_STATUSES",
+    "verify_manifest_checksums", "checksum_check", "ReleaseDiff",
 ]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Opt-in deep verification of objects that have no stored MD5.
+
+Objects written by parallel composite uploads only carry a crc32c, so their
+MD5 cannot be compared with MANIFEST.tsv from metadata alone. `deep_verify()`
+streams each such object through parallel byte-range reads (pinned to the
+listed generation) and hashes the chunks in order, so memory stays at
+`range_workers * chunk_size` per object whatever the object size. The
+computed crc32c is checked against the stored one to catch a bad read.
+
+Results are cached in a small SQLite file keyed by (bucket, name, generation),
+so each object generation is only hashed once across repeated promotion dry
+runs. Set WF_COMMON_DEEP_VERIFY_CACHE to change where the cache lives.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from retry_policy import retry_call
+from storage_trace import attach, current_operation, record_transfer, traced
+
+
+DEEP_VERIFY_CACHE_ENV_VAR = "WF_COMMON_DEEP_VERIFY_CACHE"
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/wf-common/deep_verify.sqlite")
+CHUNK_SIZE = 16 * 1024 * 1024
+RANGE_WORKERS = 8
+OBJECT_WORKERS = 4
+
+
+class HashCache:
+	"""(bucket, name, generation) -> (md5, crc32c), both base64 like the GCS metadata.
+
+	Use as a context manager (or call close()) so the connection is always
+	released, even when a run fails part way.
+	"""
+
+	def __init__(self, path=None):
+		self.path = path or os.environ.get(DEEP_VERIFY_CACHE_ENV_VAR, DEFAULT_CACHE_PATH)
+		os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(self.path, check_same_thread=False)
+		self._db.execute(
+			"CREATE TABLE IF NOT EXISTS hashes ("
+			"bucket TEXT, name TEXT, generation INTEGER, size INTEGER, md5 TEXT, crc32c TEXT, "
+			"PRIMARY KEY (bucket, name, generation))"
+		)
+		self._db.commit()
+
+	def get(self, bucket, name, generation):
+		with self._lock:
+			row = self._db.execute(
+				"SELECT md5, crc32c FROM hashes WHERE bucket = ? AND name = ? AND generation = ?",
+				(bucket, name, generation),
+			).fetchone()
+		return tuple(row) if row else None
+
+	def put(self, bucket, name, generation, size, md5, crc32c):
+		with self._lock:
+			self._db.execute(
+				"INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+				(bucket, name, generation, size, md5, crc32c),
+			)
+			self._db.commit()
+
+	def close(self):
+		with self._lock:
+			if self._db is not None:
+				self._db.commit()
+				self._db.close()
+				self._db = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+
+def _crc32c_checksum():
+	try:
+		import google_crc32c
+	except ImportError:
+		return None
+	return google_crc32c.Checksum()
+
+
+def _b64(digest):
+	return base64.b64encode(digest).decode("ascii")
+
+
+@traced("hash_object")
+def hash_object(url, bucket, record, chunk_size=CHUNK_SIZE, range_workers=RANGE_WORKERS):
+	"""
+	Stream one object through ranged reads and return its (md5, crc32c).
+
+	Up to range_workers chunks are in flight at once; they are hashed strictly
+	in order as they arrive. crc32c is None if google-crc32c is not installed.
+	"""
+	blob = bucket.blob(record.name, generation=record.generation)
+	md5 = hashlib.md5()
+	crc32c = _crc32c_checksum()
+	operation = current_operation()
+
+	def _read(start):
+		with attach(operation):
+			end = min(start + chunk_size, record.size) - 1
+			data = retry_call(blob.download_as_bytes, start=start, end=end, checksum=None, description=f"ranged read of {url}")
+			if len(data) != end - start + 1:
+				raise IOError(f"Short read of {url} at byte {start}: got {len(data)} of {end - start + 1} bytes")
+			record_transfer(bytes=len(data))
+			return data
+
+	starts = iter(range(0, record.size, chunk_size))
+	with ThreadPoolExecutor(max_workers=range_workers, thread_name_prefix="range") as pool:
+		pending = deque(pool.submit(_read, start) for _, start in zip(range(range_workers), starts))
+		while pending:
+			data = pending.popleft().result()
+			next_start = next(starts, None)
+			if next_start is not None:
+				pending.append(pool.submit(_read, next_start))
+			md5.update(data)
+			if crc32c is not None:
+				crc32c.update(data)
+	record_transfer(objects=1)
+	return _b64(md5.digest()), _b64(crc32c.digest()) if crc32c is not None else None
+
+
+def deep_verify(inventory, cache=None, only_missing_md5=True, chunk_size=CHUNK_SIZE,
+				range_workers=RANGE_WORKERS, object_workers=OBJECT_WORKERS):
+	"""
+	Hash the inventory's objects that lack an MD5 (or all of them) from their bytes.
+
+	Returns {name: base64 md5}. Raises IOError if a computed crc32c disagrees
+	with the stored one, since the read then cannot be trusted. A cache passed
+	in stays open for the caller; otherwise one is opened and closed here.
+	"""
+	with nullcontext(cache) if cache is not None else HashCache() as cache:
+		return _deep_verify(inventory, cache, only_missing_md5, chunk_size, range_workers, object_workers)
+
+
+def _deep_verify(inventory, cache, only_missing_md5, chunk_size, range_workers, object_workers):
+	records = [record for record in inventory.records if not (only_missing_md5 and record.md5_hash)]
+	computed, to_hash = {}, []
+	for record in records:
+		cached = cache.get(inventory.bucket_name, record.name, record.generation)
+		if cached:
+			computed[record.name] = cached[0]
+		else:
+			to_hash.append(record)
+	logging.info(
+		f"Deep verify [gs://{inventory.bucket_name}]: {len(records)} objects, {len(computed)} cached, "
+		f"{len(to_hash)} to hash ({sum(record.size for record in to_hash)} bytes)"
+	)
+
+	def _hash(record):
+		md5, crc32c = hash_object(inventory.url(record.name), inventory.bucket, record, chunk_size, range_workers)
+		if crc32c and record.crc32c and crc32c != record.crc32c:
+			raise IOError(f"crc32c of bytes read from [{inventory.url(record.name)}] is {crc32c}, expected {record.crc32c}")
+		cache.put(inventory.bucket_name, record.name, record.generation, record.size, md5, crc32c)
+		return record.name, md5
+
+	if to_hash:
+		with ThreadPoolExecutor(max_workers=max(1, min(object_workers, len(to_hash))), thread_name_prefix="deep-verify") as pool:
+			computed.update(pool.map(_hash, to_hash))
+	return computed
+
+
+__all__ = [
+    "DEEP_VERIFY_CACHE_ENV_VAR", "DEFAULT_CACHE_PATH", "CHUNK_SIZE", "RANGE_WORKERS", "OBJECT_WORKERS",
+    "HashCache", "hash_object", "deep_verify",
+]
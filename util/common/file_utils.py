@@ -2,17 +2,107 @@
 """General-purpose functions to parse file properties (e.g. size, extension)."""
 
 import csv
+import io
 import os
 import re
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 
 
 _SUPPORTED_DELIMITERS = [",", ";", "\t", "|"]
 _ENCODINGS_TO_TRY = ("utf-8-sig", "utf-8", "cp1252", "latin-1")
 _DELIMITER_DETECTION_LINES = 50
+_HEAD_CHUNK_SIZE = 64 * 1024
+_HEAD_BYTE_BUDGET = 1024 * 1024
+# Profiles hold every column's values, so keep about one dataset's metadata tables
+_PROFILE_CACHE_SIZE = 16
 
 
-def detect_csv_delimiter(file_path: Path, num_lines: int = _DELIMITER_DETECTION_LINES) -> str:
+def _iter_head_chunks(source, byte_budget: int, chunk_size: int = _HEAD_CHUNK_SIZE):
+    """Yield the first `byte_budget` bytes of a local file or gs:// object, chunk by chunk."""
+    if str(source).startswith("gs://"):
+        # Imported here so local-only callers don't load the storage backends
+        from gcloud_ops import read_range, stat_object
+        record = stat_object(str(source))
+        if record is None:
+            raise FileNotFoundError(f"No such object: {source}")
+        # Stop at the object size so no range request starts past its end
+        end = min(byte_budget, record.size)
+        offset = 0
+        while offset < end:
+            chunk = read_range(str(source), offset, min(chunk_size, end - offset))
+            if not chunk:
+                return
+            yield chunk
+            offset += len(chunk)
+    else:
+        with open(source, "rb") as f:
+            remaining = byte_budget
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    return
+                yield chunk
+                remaining -= len(chunk)
+
+
+def _decode(raw: bytes) -> tuple:
+    """Decode with the first of _ENCODINGS_TO_TRY that fits; returns (text, encoding)."""
+    for enc in _ENCODINGS_TO_TRY:
+        try:
+            return raw.decode(enc), enc
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="ignore"), "utf-8"
+
+
+def read_head_lines(source, num_lines: int = _DELIMITER_DETECTION_LINES, byte_budget: int = _HEAD_BYTE_BUDGET) -> tuple:
+    """
+    Read the first `num_lines` non-empty lines of a text file without loading all of it.
+
+    Bytes are read in chunks until enough complete lines have been seen, the
+    end of the file is reached, or `byte_budget` bytes have been read. The
+    encoding fallback (_ENCODINGS_TO_TRY) is applied to that window only; a
+    trailing partial line is dropped unless the whole file fit in the window.
+
+    Parameters
+    ----------
+    source : Path or str
+        Local path, or a gs://bucket/name URL (read with ranged requests).
+    num_lines : int
+        Number of non-empty lines wanted.
+    byte_budget : int
+        Maximum number of bytes to read.
+
+    Returns
+    -------
+    tuple
+        (lines, encoding): up to `num_lines` non-empty lines, and the encoding
+        used to decode them.
+    """
+    buf = bytearray()
+    for chunk in _iter_head_chunks(source, byte_budget):
+        buf += chunk
+        if buf.count(b"\n") + buf.count(b"\r") >= num_lines:
+            cut = max(buf.rfind(b"\n"), buf.rfind(b"\r")) + 1
+            text, _ = _decode(bytes(buf[:cut]))
+            if sum(1 for line in text.splitlines() if line.strip()) >= num_lines:
+                at_eof = False
+                break
+    else:
+        at_eof = len(buf) < byte_budget
+
+    raw = bytes(buf)
+    if not at_eof:
+        cut = max(raw.rfind(b"\n"), raw.rfind(b"\r")) + 1
+        raw = raw[:cut] if cut else raw
+    text, encoding = _decode(raw)
+    lines = [line for line in text.splitlines() if line.strip()]
+    return lines[:num_lines], encoding
+
+
+def detect_csv_delimiter(file_path, num_lines: int = _DELIMITER_DETECTION_LINES) -> str:
     """
     Detect the delimiter used in a CSV-like file using line-level statistics.
 
@@ -20,13 +110,16 @@ def detect_csv_delimiter(file_path: Path, num_lines: int = _DELIMITER_DETECTION_
     the header, median count per line, and consistency across lines. Falls back
     to comma if no delimiter can be confidently identified.
 
+    Only the head of the file is read (see `read_head_lines`), so the cost does
+    not grow with the number of rows.
+
     Adapted from DelimiterHandler.detect_delimiter() in crn-meta-validate, with
     all Streamlit dependencies removed.
 
     Parameters
     ----------
-    file_path : Path
-        Path to the file to inspect.
+    file_path : Path or str
+        Path to the file to inspect, or a gs:// URL.
     num_lines : int
         Maximum number of non-empty lines to evaluate. Default is 50.
 
@@ -36,24 +129,16 @@ def detect_csv_delimiter(file_path: Path, num_lines: int = _DELIMITER_DETECTION_
         Detected delimiter character. Defaults to ',' if detection is inconclusive.
     """
     try:
-        raw = file_path.read_bytes()
+        lines, _encoding = read_head_lines(file_path, max(2, num_lines))
     except Exception:
         return ","
-
-    decoded = None
-    for enc in _ENCODINGS_TO_TRY:
-        try:
-            decoded = raw.decode(enc)
-            break
-        except UnicodeDecodeError:
-            continue
-    if decoded is None:
-        decoded = raw.decode("utf-8", errors="ignore")
-
-    lines = [line for line in decoded.splitlines() if line.strip()]
     if not lines:
         return ","
+    return _score_delimiters(lines, num_lines)
+
 
+def _score_delimiters(lines: list, num_lines: int = _DELIMITER_DETECTION_LINES) -> str:
+    """Pick the delimiter for a file from its non-empty head lines (header first)."""
     header_line = lines[0]
     candidate_lines = lines[:max(2, min(len(lines), num_lines))]
 
@@ -86,6 +171,122 @@ def detect_csv_delimiter(file_path: Path, num_lines: int = _DELIMITER_DETECTION_
     return best if scores[best] >= 0 else ","
 
 
+@dataclass
+class CsvProfile:
+    """
+    Everything the metadata checks need from one CSV file, from a single parse.
+
+    Attributes
+    ----------
+    path : str
+        Path of the profiled file.
+    encoding : str
+        First of ('utf-8-sig', 'utf-8', 'cp1252', 'latin-1') that decodes the
+        file, the same order `detect_csv_delimiter` tries.
+    delimiter : str
+        Delimiter chosen by the `detect_csv_delimiter` scoring on the file's head.
+    header : list of str
+        First row of the file (empty for an empty file).
+    row_count : int
+        Number of CSV records, header and blank rows included.
+    columns : list of list
+        Values of every non-blank data row, one list per header position
+        (None where a row is shorter than the header).
+    """
+    path: str
+    encoding: str
+    delimiter: str
+    header: list
+    row_count: int
+    columns: list
+    _value_sets: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def column_index(self, name: str):
+        """Position of the first header matching `name` (case-insensitive, stripped), or None."""
+        name = name.lower()
+        return next((i for i, col in enumerate(self.header) if col.lower().strip() == name), None)
+
+    def values(self, name: str):
+        """Raw values of a column in row order, or None if the file has no such column."""
+        index = self.column_index(name)
+        return None if index is None else self.columns[index]
+
+    def value_set(self, name: str):
+        """Set of stripped, non-empty values of a column, or None if the file has no such column."""
+        if name.lower() not in self._value_sets:
+            values = self.values(name)
+            self._value_sets[name.lower()] = (
+                None if values is None else {v.strip() for v in values if v is not None} - {''}
+            )
+        return self._value_sets[name.lower()]
+
+
+def _head_lines(text: str, num_lines: int) -> list:
+    """First `num_lines` non-empty lines of a decoded file, looking at most _HEAD_BYTE_BUDGET characters in."""
+    window = text[:_HEAD_BYTE_BUDGET]
+    if len(text) > _HEAD_BYTE_BUDGET:
+        cut = max(window.rfind("\n"), window.rfind("\r")) + 1
+        window = window[:cut] if cut else window
+    lines = []
+    for line in window.splitlines():
+        if line.strip():
+            lines.append(line)
+            if len(lines) == num_lines:
+                break
+    return lines
+
+
+@lru_cache(maxsize=_PROFILE_CACHE_SIZE)
+def _load_csv_profile(path: str, mtime_ns: int, size: int) -> CsvProfile:
+    # mtime_ns and size are only part of the cache key, so a rewritten file is profiled again
+    raw = Path(path).read_bytes()
+    for encoding in _ENCODINGS_TO_TRY:
+        try:
+            text = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    del raw
+
+    head = _head_lines(text, _DELIMITER_DETECTION_LINES)
+    delimiter = _score_delimiters(head) if head else ","
+
+    # newline=None mirrors open() in text mode (universal newlines)
+    reader = csv.reader(io.StringIO(text, newline=None), delimiter=delimiter)
+    header = next(reader, None)
+    row_count = 0 if header is None else 1
+    header = header or []
+    columns = [[] for _ in header]
+    for row in reader:
+        row_count += 1
+        if not row:
+            continue
+        for i, column in enumerate(columns):
+            column.append(row[i] if i < len(row) else None)
+    return CsvProfile(path, encoding, delimiter, header, row_count, columns)
+
+
+def csv_profile(csv_path) -> CsvProfile:
+    """
+    Profile a local CSV file, reusing the cached profile while the file is unchanged.
+
+    Profiles are cached by (path, mtime, size), so however many checks look
+    at the same file during a validation run it is read and parsed once.
+
+    Parameters
+    ----------
+    csv_path : Path or str
+        Path to the CSV file.
+
+    Returns
+    -------
+    CsvProfile
+    """
+    path = os.path.abspath(csv_path)
+    stat = os.stat(path)
+    return _load_csv_profile(path, stat.st_mtime_ns, stat.st_size)
+
+
 def parse_file_size_to_bytes(size_str: str) -> int:
     """
     Parse a human-readable size string to bytes.
@@ -112,6 +313,21 @@ def parse_file_size_to_bytes(size_str: str) -> int:
         return 0
 
 
+def format_bytes_readable(size_bytes: int) -> str:
+    """
+    Format a byte count the way `gcloud storage ls --readable-sizes` does.
+
+    The output round-trips through `parse_file_size_to_bytes`
+    (e.g. 512 → '512B', 1536 → '1.50kiB').
+    """
+    size = float(size_bytes)
+    for unit in ['B', 'kiB', 'MiB', 'GiB']:
+        if size < 1024:
+            return f"{int(size)}B" if unit == 'B' else f"{size:.2f}{unit}"
+        size /= 1024
+    return f"{size:.2f}TiB"
+
+
 def get_file_extension(filepath: str) -> str:
     """
     Extract the file extension, stripping compression layers.
@@ -147,7 +363,7 @@ def check_csv_rows(csv_path: Path, min_rows: int = 2) -> dict:
     """
     Check whether a CSV file has at least `min_rows` rows (header + data).
 
-    The delimiter is auto-detected via `detect_csv_delimiter`.
+    Reads the file's cached `CsvProfile`; the delimiter is auto-detected.
 
     Parameters
     ----------
@@ -164,15 +380,8 @@ def check_csv_rows(csv_path: Path, min_rows: int = 2) -> dict:
         status : str — 'valid', 'insufficient', or 'error'
         error : str or None
     """
-    delimiter = detect_csv_delimiter(csv_path)
     try:
-        for encoding in ('utf-8', 'latin-1'):
-            try:
-                with open(csv_path, 'r', encoding=encoding) as f:
-                    row_count = sum(1 for _ in csv.reader(f, delimiter=delimiter))
-                break
-            except UnicodeDecodeError:
-                continue
+        row_count = csv_profile(csv_path).row_count
         return {
             'row_count': row_count,
             'rows': row_count,
@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
-"""Elementary gcloud / Cloud Storage CLI wrappers and bucket IAM/label helpers.
+"""Elementary gcloud / Cloud Storage wrappers and bucket IAM/label helpers.
 
-Thin wrappers around `gcloud storage ...` subprocess calls (copy/move/remove/
-rsync/list) plus the bucket permission and label operations used during data
-promotion. Also includes the small bucket/dataset name-parsing helpers.
+Thin wrappers for copy/move/remove/rsync/list that dispatch to the active
+storage backend (see storage_backends.py: in-process client by default, the
+`gcloud storage` CLI as fallback) plus the bucket permission and label
+operations used during data promotion. Also includes the small bucket/dataset
+name-parsing helpers.
 """
 
-import json
 import logging
+import random
 import subprocess
 import re
+import time
+from contextlib import contextmanager
+
+from listing_cache import listing_cache
+from storage_backends import IamPolicyConflict, StorageError, get_backend
+from storage_trace import current_operation, record_transfer, traced
 
 
 def get_team_name(bucket: str) -> str:
@@ -25,6 +33,7 @@ def strip_team_prefix(entity_id: str) -> str:
     return norm_id
 
 
+@traced("run_command")
 def run_command(command):
 	try:
 		result = subprocess.run(command, check=True, capture_output=True, text=True)
@@ -37,6 +46,7 @@ def run_command(command):
 			raise
 
 
+@traced("update_labels")
 def remove_internal_qc_label(bucket_name):
 	command = [
 		"gcloud",
@@ -50,162 +60,264 @@ def remove_internal_qc_label(bucket_name):
 	return result.stdout
 
 
-def check_admin_binding(bucket_name):
-	team_name = get_team_name(bucket_name)
-	role_admin = "roles/storage.admin"
-	team_gg = "asap-team-" + team_name + "@dnastack.com"
-	member = f"group:{team_gg}"
-	policy_json = run_command([
-		"gcloud",
-		"storage",
-		"buckets",
-		"get-iam-policy",
-		bucket_name,
-		"--format=json"
-	])
-	policy = json.loads(policy_json)
-	has_admin_binding = any(
-		binding["role"] == role_admin and member in binding.get("members", [])
+IAM_POLICY_MAX_ATTEMPTS = 5
+
+
+def has_iam_binding(policy, role, member):
+	return any(
+		binding["role"] == role and member in binding.get("members", [])
 		for binding in policy.get("bindings", [])
 	)
+
+
+def add_iam_binding(policy, role, member):
+	"""Add member to role in an in-memory policy dict. Returns True if it changed."""
+	if has_iam_binding(policy, role, member):
+		return False
+	bindings = policy.setdefault("bindings", [])
+	for binding in bindings:
+		if binding["role"] == role and "condition" not in binding:
+			binding.setdefault("members", []).append(member)
+			return True
+	bindings.append({"role": role, "members": [member]})
+	return True
+
+
+def remove_iam_binding(policy, role, member):
+	"""Remove member from role in an in-memory policy dict. Returns True if it changed."""
+	changed = False
+	for binding in policy.get("bindings", []):
+		if binding["role"] == role and member in binding.get("members", []):
+			binding["members"].remove(member)
+			changed = True
+	policy["bindings"] = [binding for binding in policy.get("bindings", []) if binding.get("members")]
+	return changed
+
+
+@traced("update_iam_policy")
+def update_bucket_iam_policy(bucket_name, edit, max_attempts=IAM_POLICY_MAX_ATTEMPTS):
+	"""
+	Read-modify-write a bucket IAM policy as one transaction.
+
+	Fetches the policy once, lets `edit(policy)` apply all binding changes in
+	memory (it returns True if anything changed), then writes it back with a
+	single etag-guarded set. If another writer changed the policy in between,
+	the whole read-modify-write is retried on the fresh policy.
+
+	Returns (policy, changed).
+	"""
+	backend = get_backend()
+	for attempt in range(1, max_attempts + 1):
+		policy = backend.get_iam_policy(bucket_name)
+		if not edit(policy):
+			return policy, False
+		try:
+			return backend.set_iam_policy(bucket_name, policy), True
+		except IamPolicyConflict:
+			if attempt == max_attempts:
+				raise
+			delay = random.uniform(0.5, 1.0) * attempt
+			logging.warning(f"IAM policy for [{bucket_name}] changed concurrently (etag conflict); retrying in {delay:.1f}s (attempt {attempt}/{max_attempts})")
+			time.sleep(delay)
+
+
+def _team_gg_member(bucket_name):
+	team_name = get_team_name(bucket_name)
+	team_gg = "asap-team-" + team_name + "@dnastack.com"
+	return f"group:{team_gg}"
+
+
+@traced("get_iam_policy")
+def check_admin_binding(bucket_name):
+	role_admin = "roles/storage.admin"
+	member = _team_gg_member(bucket_name)
+	policy = get_backend().get_iam_policy(bucket_name)
+	has_admin_binding = has_iam_binding(policy, role_admin, member)
 	return member, role_admin, has_admin_binding
 
 
 def change_gg_storage_admin_to_read_write(bucket_name):
-	member, role_admin, has_admin_binding = check_admin_binding(bucket_name)
-	if has_admin_binding:
-		print(f"[INFO] Removing Storage Admin access and granting Storage Object Creator and Viewer to CRN Teams for [{bucket_name}] on Google Group")
-		run_command([
-			"gcloud",
-			"storage",
-			"buckets",
-			"remove-iam-policy-binding",
-			bucket_name,
-			f"--member={member}",
-			f"--role={role_admin}"
-		])
-		run_command([
-			"gcloud",
-			"storage",
-			"buckets",
-			"add-iam-policy-binding",
-			bucket_name,
-			f"--member={member}",
-			"--role=roles/storage.objectViewer"
-		])
-		run_command([
-			"gcloud",
-			"storage",
-			"buckets",
-			"add-iam-policy-binding",
-			bucket_name,
-			f"--member={member}",
-			"--role=roles/storage.objectCreator"
-		])
+	role_admin = "roles/storage.admin"
+	member = _team_gg_member(bucket_name)
+
+	def _admin_to_read_write(policy):
+		if not has_iam_binding(policy, role_admin, member):
+			return False
+		remove_iam_binding(policy, role_admin, member)
+		add_iam_binding(policy, "roles/storage.objectViewer", member)
+		add_iam_binding(policy, "roles/storage.objectCreator", member)
+		return True
+
+	_policy, changed = update_bucket_iam_policy(bucket_name, _admin_to_read_write)
+	if changed:
+		print(f"[INFO] Removed Storage Admin access and granted Storage Object Creator and Viewer to CRN Teams for [{bucket_name}] on Google Group")
 	else:
 		print(f"[INFO] Storage Object Creator and Viewer already granted to CRN Teams' permissions for [{bucket_name}] on Google Group")
 
 
-def list_dirs(bucket_name):
-	command = [
-		"gcloud",
-		"storage",
-		"ls",
-		bucket_name
-	]
-	result = subprocess.run(command, check=True, capture_output=True, text=True)
-	return result.stdout
+_OBJECT_LINE_RE = re.compile(r"^(?:Copying|Moving|Removing|Would copy|Would remove) ", re.MULTILINE)
 
 
-def gcopy(source_path, destination_path, recursive=False):
-	command = [
-		"gcloud",
-		"storage",
-		"cp",
-		source_path,
-		destination_path
-	]
-	if recursive:
-		command.insert(3, "--recursive")
-	result = subprocess.run(command, check=True, capture_output=True, text=True)
-
-	# These if's are because gcloud returns important info in stderr (e.g. "Copying /path/to/file1 to gs://bucket/file1...") 
+def _log_result(result):
+	# gcloud returns important info in stderr (e.g. "Copying /path/to/file1 to gs://bucket/file1...")
 	# even if the command is successful. Since ERROR may be misleading, it's better to logging.info both stdout and stderr
 	if result.stdout:
 		logging.info(result.stdout)
 	if result.stderr:
 		logging.info(result.stderr)
+	# Native backends report bytes/objects as they go; for CLI calls count the per-object lines
+	operation = current_operation()
+	if operation is not None and operation.objects is None:
+		record_transfer(objects=len(_OBJECT_LINE_RE.findall(result.stderr or "")))
+
+
+@contextmanager
+def _writes_to(*urls):
+	# Invalidate after the write (even a failed one) so a listing taken while it ran is not kept
+	try:
+		yield
+	finally:
+		listing_cache.invalidate(*urls)
+
+
+def list_dirs(bucket_name, recursive=False, long=False):
+	"""
+	`gcloud storage ls` output for a bucket or prefix.
+
+	Served from the process-wide listing cache when the same (URL, recursive,
+	long) listing was fetched within the TTL and nothing was written to the
+	bucket through gcloud_ops since.
+	"""
+	output = listing_cache.get(bucket_name, recursive, long)
+	if output is None:
+		output = _list_uncached(bucket_name, recursive, long)
+		listing_cache.put(bucket_name, recursive, long, output)
+	return output
+
+
+@traced("ls")
+def _list_uncached(bucket_name, recursive, long):
+	result = get_backend().ls(bucket_name, recursive=recursive, long=long)
+	record_transfer(objects=len(result.stdout.splitlines()))
+	return result.stdout
+
+
+def iter_objects(url, user_project=None):
+	"""
+	Yield an ObjectRecord for every object under a gs:// bucket or prefix.
+
+	Records are streamed from the listing as it arrives (never buffered as one
+	blob of `ls` output), so memory use does not grow with the bucket size.
+	user_project is billed for the listing (requester-pays buckets).
+	"""
+	yield from get_backend().iter_objects(url, user_project=user_project)
 
+
+@traced("stat")
+def stat_object(url):
+	"""ObjectRecord of a single gs:// object (one metadata request), or None if it does not exist."""
+	return get_backend().stat(url)
+
+
+@traced("cat")
+def read_range(url, start, length):
+	"""Up to length bytes of a gs:// object from offset start; b"" past the end of the object."""
+	data = get_backend().read_range(url, start, length)
+	record_transfer(bytes=len(data), objects=1)
+	return data
+
+
+@traced("cp")
+def gcopy(source_path, destination_path, recursive=False):
+	with _writes_to(destination_path):
+		result = get_backend().cp(source_path, destination_path, recursive=recursive)
+	_log_result(result)
+
+
+@traced("rewrite")
+def gcopy_server_side(source_path, destination_path, recursive=False):
+	"""
+	Copy between buckets without the bytes passing through this host.
+
+	Each object is rewritten inside GCS (following continuation tokens for
+	large objects) and many small objects are rewritten concurrently. Both
+	paths must be gs:// URLs.
+	"""
+	with _writes_to(destination_path):
+		result = get_backend().rewrite(source_path, destination_path, recursive=recursive)
+	_log_result(result)
+
+
+@traced("cp_batch")
+def gcopy_batch(pairs, raise_on_error=True):
+	"""
+	Copy a list of (source_path, destination_path) pairs in one batch.
+
+	Pairs are grouped by destination prefix and sent through a single copy
+	session per group instead of one gcloud call per file. Returns one
+	CopyOutcome per pair; if any pair failed and raise_on_error is set, raises
+	StorageError after every pair has been attempted.
+	"""
+	pairs = list(pairs)
+	if not pairs:
+		return []
+	with _writes_to(*(destination for _source, destination in pairs)):
+		outcomes = get_backend().cp_many(pairs)
+	for outcome in outcomes:
+		if outcome.ok:
+			logging.info(f"Copied {outcome.source} to {outcome.destination}")
+		else:
+			logging.error(f"Failed to copy {outcome.source} to {outcome.destination}: {outcome.error}")
+	failed = [outcome for outcome in outcomes if not outcome.ok]
+	operation = current_operation()
+	if operation is not None and operation.objects is None:
+		record_transfer(objects=len(outcomes) - len(failed))
+	if failed and raise_on_error:
+		raise StorageError(
+			["storage", "cp", "-I"],
+			f"{len(failed)} of {len(outcomes)} objects failed to copy: " + ", ".join(o.source for o in failed)
+		)
+	return outcomes
+
+
+@traced("mv")
 def gmove(source_path, destination_path):
-	command = [
-		"gcloud",
-		"storage",
-		"mv",
-		source_path,
-		destination_path
-	]
-	result = subprocess.run(command, check=True, capture_output=True, text=True)
-	if result.stdout:
-		logging.info(result.stdout)
-	if result.stderr:
-		logging.info(result.stderr)
+	with _writes_to(source_path, destination_path):
+		result = get_backend().mv(source_path, destination_path)
+	_log_result(result)
 
 
+@traced("rm")
 def gremove(destination_path):
-	command = [
-		"gcloud",
-		"storage",
-		"rm",
-		destination_path
-	]
 	try:
-		result = subprocess.run(command, check=True, capture_output=True, text=True)
+		with _writes_to(destination_path):
+			result = get_backend().rm(destination_path)
 	except subprocess.CalledProcessError:
 		logging.info(f"No files found at {destination_path}; skipping deletion.")
 		return
-	if result.stdout:
-		logging.info(result.stdout)
-	if result.stderr:
-		logging.info(result.stderr)
+	_log_result(result)
 
 
-def gsync(source_path, destination_path, dry_run):
-	command = [
-		"gcloud",
-		"storage",
-		"rsync",
-		"-r",
-		source_path,
-		destination_path
-	]
-	if dry_run:
-		command.insert(4, "--dry-run")
-	result = subprocess.run(command, check=True, capture_output=True, text=True)
-	if result.stdout:
-		logging.info(result.stdout)
-	if result.stderr:
-		logging.info(result.stderr)
+@traced("rsync")
+def gsync(source_path, destination_path, dry_run, exclude=None):
+	"""
+	Sync source into destination. `exclude` is an rsync -x regex matched
+	against the start of each relative path; matching objects are skipped.
+	"""
+	with _writes_to(*([] if dry_run else [destination_path])):
+		result = get_backend().rsync(source_path, destination_path, dry_run=dry_run, exclude=exclude)
+	_log_result(result)
 
 
-def gsync_del(source_path, destination_path, dry_run):
-	command = [
-		"gcloud",
-		"storage",
-		"rsync",
-		"--delete-unmatched-destination-objects",
-		"-r",
-		source_path,
-		destination_path
-	]
-	if dry_run:
-		command.insert(4, "--dry-run")
-	result = subprocess.run(command, check=True, capture_output=True, text=True)
-	if result.stdout:
-		logging.info(result.stdout)
-	if result.stderr:
-		logging.info(result.stderr)
+@traced("rsync_delete")
+def gsync_del(source_path, destination_path, dry_run, exclude=None):
+	"""Like gsync, but also deletes destination objects missing from source (except excluded ones)."""
+	with _writes_to(*([] if dry_run else [destination_path])):
+		result = get_backend().rsync(source_path, destination_path, delete=True, dry_run=dry_run, exclude=exclude)
+	_log_result(result)
 
 
+@traced("add_iam_binding")
 def add_verily_read_access(bucket_name):
 	command = [
 		"gcloud",
@@ -219,16 +331,14 @@ def add_verily_read_access(bucket_name):
 		"dnastack-asap-parkinsons"
 	]
 	result = subprocess.run(command, check=True, capture_output=True, text=True)
-	if result.stdout:
-		logging.info(result.stdout)
-	if result.stderr:
-		logging.info(result.stderr)
+	_log_result(result)
 
 
 __all__ = [
     "get_team_name", "strip_team_prefix", "run_command",
-    "remove_internal_qc_label", "check_admin_binding",
-    "change_gg_storage_admin_to_read_write", "list_dirs",
-    "gcopy", "gmove", "gremove", "gsync", "gsync_del",
+    "remove_internal_qc_label", "has_iam_binding", "add_iam_binding",
+    "remove_iam_binding", "update_bucket_iam_policy", "check_admin_binding",
+    "change_gg_storage_admin_to_read_write", "list_dirs", "iter_objects", "stat_object", "read_range",
+    "gcopy", "gcopy_server_side", "gcopy_batch", "gmove", "gremove", "gsync", "gsync_del",
     "add_verily_read_access",
 ]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""On-disk Parquet snapshots of bucket inventories.
+
+A snapshot is every ObjectRecord under one bucket prefix at one point in time,
+stored as <root>/<bucket>/<prefix>/<listed_at>.parquet with the bucket, prefix
+and listing time in the file's schema metadata. `InventoryStore.refresh()`
+reuses the latest snapshot while it is younger than max_age, otherwise lists
+again, saves a new snapshot and reports which objects were added, removed or
+rewritten (new generation) since the previous one. Two snapshots, e.g. of two
+releases of the same dataset, can be diffed without any API calls.
+
+The store lives in WF_COMMON_INVENTORY_STORE (default
+~/.cache/wf-common/inventories); only the newest KEEP_SNAPSHOTS per prefix
+are kept. Requires pyarrow.
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_integrity import ReleaseDiff
+from storage_backends import ObjectRecord
+
+
+INVENTORY_STORE_ENV_VAR = "WF_COMMON_INVENTORY_STORE"
+DEFAULT_STORE_ROOT = os.path.expanduser("~/.cache/wf-common/inventories")
+KEEP_SNAPSHOTS = 10
+_TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%fZ"
+
+SNAPSHOT_SCHEMA = pa.schema([
+	("name", pa.string()),
+	("size", pa.int64()),
+	("md5_hash", pa.string()),
+	("crc32c", pa.string()),
+	("generation", pa.int64()),
+	("updated", pa.string()),
+])
+
+
+@dataclass
+class InventorySnapshot:
+	bucket: str
+	prefix: str
+	listed_at: datetime
+	records: list[ObjectRecord]
+
+	@property
+	def bucket_name(self):
+		return self.bucket
+
+	@property
+	def age(self) -> float:
+		"""Seconds since the listing was taken."""
+		return (datetime.now(timezone.utc) - self.listed_at).total_seconds()
+
+	def to_table(self) -> pa.Table:
+		columns = {name: [getattr(record, name) for record in self.records] for name in SNAPSHOT_SCHEMA.names}
+		table = pa.Table.from_pydict(columns, schema=SNAPSHOT_SCHEMA)
+		return table.replace_schema_metadata({
+			"bucket": self.bucket,
+			"prefix": self.prefix,
+			"listed_at": self.listed_at.isoformat(),
+		})
+
+	@classmethod
+	def read(cls, path):
+		table = pq.read_table(path)
+		metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+		bucket = metadata["bucket"]
+		records = [ObjectRecord(bucket=bucket, **row) for row in table.to_pylist()]
+		return cls(bucket, metadata["prefix"], datetime.fromisoformat(metadata["listed_at"]), records)
+
+
+@dataclass
+class SnapshotChanges:
+	"""Objects that differ between two snapshots of the same prefix, by name and generation."""
+	added: list[str] = field(default_factory=list)
+	removed: list[str] = field(default_factory=list)
+	rewritten: list[str] = field(default_factory=list)
+
+	@classmethod
+	def between(cls, previous, current):
+		before = {record.name: record.generation for record in previous.records}
+		changes = cls()
+		for record in current.records:
+			generation = before.pop(record.name, None)
+			if generation is None:
+				changes.added.append(record.name)
+			elif generation != record.generation:
+				changes.rewritten.append(record.name)
+		changes.removed = list(before)
+		return changes
+
+	def __bool__(self):
+		return bool(self.added or self.removed or self.rewritten)
+
+	def summary(self) -> str:
+		return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.rewritten)} rewritten"
+
+
+def _prefix_dir(prefix):
+	return prefix.strip("/").replace("/", "__") or "_root"
+
+
+class InventoryStore:
+	def __init__(self, root=None, keep=KEEP_SNAPSHOTS):
+		self.root = root or os.environ.get(INVENTORY_STORE_ENV_VAR, DEFAULT_STORE_ROOT)
+		self.keep = keep
+
+	def directory(self, bucket, prefix):
+		return os.path.join(self.root, bucket, _prefix_dir(prefix))
+
+	def snapshot_paths(self, bucket, prefix):
+		"""Stored snapshots of bucket/prefix, oldest first."""
+		directory = self.directory(bucket, prefix)
+		if not os.path.isdir(directory):
+			return []
+		return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".parquet")]
+
+	def latest(self, bucket, prefix):
+		paths = self.snapshot_paths(bucket, prefix)
+		return InventorySnapshot.read(paths[-1]) if paths else None
+
+	def save(self, snapshot):
+		directory = self.directory(snapshot.bucket, snapshot.prefix)
+		os.makedirs(directory, exist_ok=True)
+		path = os.path.join(directory, f"{snapshot.listed_at.strftime(_TIMESTAMP_FORMAT)}.parquet")
+		# Write then rename so a concurrent reader never sees a partial file
+		pq.write_table(snapshot.to_table(), f"{path}.tmp")
+		os.replace(f"{path}.tmp", path)
+		for stale in self.snapshot_paths(snapshot.bucket, snapshot.prefix)[:-self.keep]:
+			os.remove(stale)
+		return path
+
+	def refresh(self, bucket, prefix, list_records, max_age=None):
+		"""
+		Latest snapshot of bucket/prefix, listing again with list_records() unless
+		the stored one is younger than max_age seconds.
+
+		Returns (snapshot, changes); changes is None when the stored snapshot was
+		reused or there was none to compare against.
+		"""
+		previous = self.latest(bucket, prefix)
+		if previous is not None and max_age is not None and previous.age <= max_age:
+			logging.info(f"Reusing inventory of [gs://{bucket}/{prefix}] listed {previous.age:.0f}s ago ({len(previous.records)} objects)")
+			return previous, None
+		snapshot = InventorySnapshot(bucket, prefix, datetime.now(timezone.utc), list(list_records()))
+		self.save(snapshot)
+		if previous is None:
+			return snapshot, None
+		changes = SnapshotChanges.between(previous, snapshot)
+		logging.info(f"Inventory of [gs://{bucket}/{prefix}] since {previous.listed_at.isoformat()}: {changes.summary()}")
+		return snapshot, changes
+
+
+def diff_snapshots(old, new):
+	"""
+	Offline ReleaseDiff of two snapshots (paths or InventorySnapshot objects).
+
+	Names are compared relative to each snapshot's prefix, so two releases of
+	the same dataset (.../release/v1/ vs .../release/v2/) line up file by file.
+	"""
+	old = old if isinstance(old, InventorySnapshot) else InventorySnapshot.read(old)
+	new = new if isinstance(new, InventorySnapshot) else InventorySnapshot.read(new)
+	return ReleaseDiff.compute(new, old, staging_prefix=new.prefix, curated_prefix=old.prefix)
+
+
+__all__ = [
+    "INVENTORY_STORE_ENV_VAR", "DEFAULT_STORE_ROOT", "KEEP_SNAPSHOTS", "SNAPSHOT_SCHEMA",
+    "InventorySnapshot", "SnapshotChanges", "InventoryStore", "diff_snapshots",
+]
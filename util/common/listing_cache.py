@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Process-wide TTL cache for bucket listings.
+
+Entries are keyed by (url, recursive, long) and expire after a TTL. Writes
+made through gcloud_ops (gcopy, gcopy_batch, gmove, gremove, gsync, gsync_del)
+invalidate every cached listing in the buckets they touch, so a listing is
+never served stale after this process changed the bucket. Writes made by
+other processes are only picked up once the TTL runs out.
+
+Set WF_COMMON_LISTING_CACHE_TTL (seconds) to change the TTL; 0 disables caching.
+"""
+
+import os
+import threading
+import time
+
+
+LISTING_CACHE_TTL_ENV_VAR = "WF_COMMON_LISTING_CACHE_TTL"
+DEFAULT_LISTING_CACHE_TTL = 300.0
+
+
+def _bucket_of(url: str) -> str:
+	return url[len("gs://"):].split("/", 1)[0] if url.startswith("gs://") else ""
+
+
+class ListingCache:
+	def __init__(self, ttl=DEFAULT_LISTING_CACHE_TTL):
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._entries = {}
+		self._lock = threading.Lock()
+
+	def get(self, url, recursive=False, long=False):
+		"""Cached listing output, or None if absent or expired."""
+		key = (url, recursive, long)
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and time.monotonic() - entry[0] < self.ttl:
+				self.hits += 1
+				return entry[1]
+			self._entries.pop(key, None)
+			self.misses += 1
+			return None
+
+	def put(self, url, recursive, long, output):
+		if self.ttl <= 0:
+			return
+		with self._lock:
+			self._entries[(url, recursive, long)] = (time.monotonic(), output)
+
+	def invalidate(self, *urls):
+		"""Drop every cached listing in the buckets of the given URLs; local paths are ignored."""
+		buckets = {_bucket_of(url) for url in urls if str(url).startswith("gs://")}
+		if not buckets:
+			return
+		with self._lock:
+			for key in [key for key in self._entries if _bucket_of(key[0]) in buckets]:
+				del self._entries[key]
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+
+listing_cache = ListingCache(float(os.environ.get(LISTING_CACHE_TTL_ENV_VAR, DEFAULT_LISTING_CACHE_TTL)))
+
+
+__all__ = [
+    "LISTING_CACHE_TTL_ENV_VAR", "DEFAULT_LISTING_CACHE_TTL", "ListingCache", "listing_cache",
+]
@@ -1,15 +1,90 @@
 #!/usr/bin/env python3
+"""Data promotion report, written to disk section by section.
 
-import subprocess
-from datetime import datetime
-from packaging import version
-from data_integrity import compare_blob_names, compare_md5_hashes
+The per-file tables are streamed row by row from the inventories, ReleaseDiff
+and test result dicts the checks already built, so no table is assembled as
+one string and memory stays flat however many files a release has. The same
+pass writes the JSON summary and per-file Parquet table (report_sidecar).
+"""
+
+from data_integrity import ReleaseDiff
+from gcloud_ops import iter_objects
+from report_sidecar import ReportSidecar, test_passed
+from storage_backends import StorageError
+
+
+DEFINITIONS = [
+	("Initial environment", "This is where the staging data lives with the intent of promoting it to production."),
+	("Target environment", "This is where the current production data lives with the intent of replacing it with the staging data in the initial environment."),
+	("New files", "Set of new files (i.e. they didn’t exist in previous runs/workflow versions)."),
+	("Modified files", "Set of files that have different checksums."),
+	("Deleted files", "Set of files that no longer exist in this version of the pipeline (expected, not an error in the pipeline)."),
+	("Not empty test", "A test that checks if all files in buckets are empty or less than or equal to 10 bytes in size."),
+	("Metadata present test", "A test that checks if all files in buckets have an associated metadata. The metadata file (MANIFEST.tsv) is generated in the workflow."),
+	("Checksum test", "A test that checks if each file's MD5 in the bucket matches the md5_hash recorded for it in MANIFEST.tsv. Composite objects (crc32c only) and files without a recorded hash cannot be verified and show N/A with the reason."),
+]
 
 
 def get_combined_manifest_loc(path):
-	command = f"gcloud storage ls {path} | sort | tail -1"
-	file_loc = subprocess.check_output(command, shell=True, text=True, stderr=subprocess.PIPE)
-	return file_loc.strip()
+	"""
+	Latest combined manifest (<version>/workflow_metadata/<timestamp>/MANIFEST.tsv,
+	by path order) under a gs:// prefix, or "" if there is none.
+
+	One prefix listing, streamed; only the running maximum is kept.
+	"""
+	latest = ""
+	try:
+		for record in iter_objects(path):
+			if record.name.endswith("/MANIFEST.tsv") and "/workflow_metadata/" in record.name and record.url > latest:
+				latest = record.url
+	except StorageError as e:
+		if "matched no objects" not in str(e.stderr):
+			raise
+	return latest
+
+
+def _manifest_summary(combined_manifest_df):
+	"""(timestamps as a Markdown list, newest first; "[version](release)" links) for one env."""
+	timestamps = "\n".join(
+		f"- {item}"
+		for item in sorted(
+			(item for item in combined_manifest_df["timestamp"].dropna().unique() if str(item)[0].isdigit()),
+			reverse=True
+		)
+	)
+	pairs = (
+		combined_manifest_df[["workflow_version", "workflow_release"]]
+		.dropna()
+		.drop_duplicates()
+		.astype(str)
+	)
+	workflow_info = ", ".join(
+		f"[{workflow_version}]({workflow_release})"
+		for workflow_version, workflow_release in pairs.itertuples(index=False)
+	)
+	return timestamps, workflow_info
+
+
+def _write_table(fh, header, rows, empty_row):
+	"""Write a Markdown table, one row at a time; empty_row stands in if rows yields nothing."""
+	fh.write(f"| {' | '.join(header)} |\n")
+	fh.write(f"|{'|'.join('---------' for _ in header)}|\n")
+	wrote = False
+	for row in rows:
+		fh.write(f"| {' | '.join(str(cell) for cell in row)} |\n")
+		wrote = True
+	if not wrote and empty_row is not None:
+		fh.write(f"| {' | '.join(empty_row)} |\n")
+
+
+def _write_environment(fh, title, env, bucket, workflow, timestamps, workflow_info, sample_loc, tests_passed):
+	fh.write(f"## {title}\n")
+	fh.write(f"**Environment:** [{env}]\n\n")
+	fh.write(f"**Bucket:** `{bucket}`\n\n")
+	fh.write(f"**Processing timestamp(s):**\n{timestamps}\n\n")
+	fh.write(f"**Harmonized {workflow} workflow version:** {workflow_info}\n\n")
+	fh.write(f"**Sample set:** {sample_loc}\n\n")
+	fh.write(f"**Tests passed:** {tests_passed}\n")
 
 
 def generate_markdown_report(
@@ -23,169 +98,137 @@ def generate_markdown_report(
 	not_empty_tests,
 	metadata_present_tests,
 	test_boolean,
-	test_result
+	test_result,
+	release_diff=None,
+	checksum_tests=None,
+	checksum_statuses=None
 ):
+	"""
+	Write <dataset>_data_promotion_report.md plus its JSON / Parquet sidecar
+	files, and return the JSON summary.
+
+	checksum_statuses: object name -> verify_manifest_checksums() status, for
+	the sidecar's typed hash_status column.
+	"""
 	staging_bucket = f"gs://asap-{staging}-{dataset_id}"
 	production_bucket = f"gs://asap-curated-{dataset_id}"
+	checksum_tests = checksum_tests or {}
+	checksum_statuses = checksum_statuses or {}
+	staging_inventory = file_info[staging]["inventory"]
 
-	staging_combined_manifest = file_info[staging]["combined_manifest_df"]
-	staging_timestamps = "\n".join(
-		f"- {item}"
-		for item in sorted(
-			(item for item in staging_combined_manifest["timestamp"].dropna().unique() if str(item)[0].isdigit()),
-			reverse = True
-		)
-	)
-	staging_pairs = (
-		staging_combined_manifest[["workflow_version", "workflow_release"]]
-		.dropna()
-		.drop_duplicates()
-		.astype(str)
-		.apply(lambda row: f"[{row['workflow_version']}]({row['workflow_release']})", axis=1)
-	)
-	staging_workflow_info = ", ".join(staging_pairs)
-	valid = staging_combined_manifest.dropna(subset=["workflow_version", "workflow_release"])
-	valid = valid.assign(
-		parsed_version=valid["workflow_version"].astype(str).map(lambda v: version.parse(v.lstrip("v")))
-	).sort_values("parsed_version", ascending=False)
-	latest_row = valid.iloc[0]
-	latest_workflow_version = latest_row["workflow_version"]
-	staging_sample_loc = f"`{file_info[staging]["sample_list_loc"][0]}`"
+	staging_timestamps, staging_workflow_info = _manifest_summary(file_info[staging]["combined_manifest_df"])
+	staging_sample_loc = f"`{file_info[staging]['sample_list_loc'][0]}`"
 
 	if "curated" in file_info:
-		production_combined_manifest = file_info["curated"]["combined_manifest_df"]
-		production_timestamps = "\n".join(
-			f"- {item}"
-			for item in sorted(
-				(item for item in production_combined_manifest["timestamp"].dropna().unique() if str(item)[0].isdigit()),
-				reverse = True
-			)
-		)
-		production_pairs = (
-			production_combined_manifest[["workflow_version", "workflow_release"]]
-			.dropna()
-			.drop_duplicates()
-			.astype(str)
-			.apply(lambda row: f"[{row['workflow_version']}]({row['workflow_release']})", axis=1)
-		)
-		production_workflow_info = ", ".join(production_pairs)
-		production_sample_loc = f"`{file_info["curated"]["sample_list_loc"][0]}`"
+		production_timestamps, production_workflow_info = _manifest_summary(file_info["curated"]["combined_manifest_df"])
+		production_sample_loc = f"`{file_info['curated']['sample_list_loc'][0]}`"
 
 		# Compare different envs
-		same_files, new_files, deleted_files = compare_blob_names(file_info, staging)
-		if new_files:
-			new_files_rows = "\n".join(f"| {filename} |" for filename in new_files)
-		else:
-			new_files_rows = "| N/A |"
-		if deleted_files:
-			deleted_files_rows = "\n".join(f"| {filename} |" for filename in deleted_files)
-		else:
-			deleted_files_rows = "| N/A |"
-		modified_files = compare_md5_hashes(file_info, staging, same_files)
-		if same_files == ["N/A"]:
-			modified_files_rows = "| N/A | N/A |"
-		else:
-			modified_files_rows = "\n".join(f"| {filename} | {info['staging_hash']} |" 
-									for filename, info in modified_files.items())
+		if release_diff is None:
+			release_diff = ReleaseDiff.compute(staging_inventory, file_info["curated"]["inventory"])
+		new_files = release_diff.added_urls
+		modified_files = release_diff.modified_urls.items()
+		deleted_files = release_diff.removed_urls
 	else:
 		production_timestamps = "N/A"
 		production_workflow_info = "N/A"
 		production_sample_loc = "N/A"
 
-		new_files_rows = "\n".join(f"| {filename} |" for filename in file_info[staging]["gs_files"])
-		deleted_files_rows = "| N/A |"
-		modified_files_rows = "| N/A | N/A |"
-
-	data_integrity_test_rows = "\n".join(
-			f"| {file} | {timestamp} | {not_empty_tests[file]} | {metadata_present_tests[file]} |"
-			for file in not_empty_tests
+		new_files = file_info[staging]["gs_files"]
+		modified_files = []
+		deleted_files = []
+
+	previous_manifest = get_combined_manifest_loc(f"{staging_bucket}/{workflow}/release/")
+	previous_manifest_loc = f"`{previous_manifest}`" if previous_manifest else "N/A"
+	new_manifest = f"{staging_bucket}/{workflow}/release/{release_version}/workflow_metadata/{timestamp}/MANIFEST.tsv"
+
+	added = set(release_diff.added) if release_diff is not None else None
+
+	def change_type(name):
+		if added is None or name in added:
+			return "added"
+		return "modified" if name in release_diff.modified else "unchanged"
+
+	def file_test_rows():
+		# Each per-file row goes to the Markdown table and the sidecar table together
+		for file in not_empty_tests:
+			record = staging_inventory.by_name.get(file)
+			sidecar.add(
+				staging_inventory.url(file),
+				record.size if record else None,
+				record.md5_hash if record else None,
+				test_passed(not_empty_tests[file]),
+				test_passed(metadata_present_tests[file]),
+				checksum_statuses.get(file),
+				change_type(file),
+			)
+			yield file, timestamp, not_empty_tests[file], metadata_present_tests[file], checksum_tests.get(file, "N/A")
+		if release_diff is not None:
+			curated_inventory = file_info["curated"]["inventory"]
+			for name, url in zip(release_diff.removed, release_diff.removed_urls):
+				record = curated_inventory.by_name.get(name)
+				sidecar.add(url, record.size if record else None, record.md5_hash if record else None, None, None, None, "deleted")
+
+	with ReportSidecar(dataset_id_underscore) as sidecar, open(f"{dataset_id_underscore}_data_promotion_report.md", "w") as fh:
+		fh.write("# Info\n")
+		_write_environment(
+			fh, "Initial environment", staging, staging_bucket, workflow,
+			staging_timestamps, staging_workflow_info, staging_sample_loc, test_boolean
+		)
+		fh.write("\n")
+		_write_environment(
+			fh, "Target environment", "curated", production_bucket, workflow,
+			production_timestamps, production_workflow_info, production_sample_loc, "N/A"
 		)
-	
-	previous_manifest_loc = get_combined_manifest_loc(f"{staging_bucket}/{workflow}/release/**")
-	if previous_manifest_loc == "":
-		previous_manifest_loc = "N/A"
-	else:
-		previous_manifest_loc = f"`{previous_manifest_loc}`"
-
-	markdown_content = f"""# Info
-## Initial environment
-**Environment:** [{staging}]
-
-**Bucket:** `{staging_bucket}`
-
-**Processing timestamp(s):**
-{staging_timestamps}
-
-**Harmonized {workflow} workflow version:** {staging_workflow_info}
-
-**Sample set:** {staging_sample_loc}
-
-**Tests passed:** {test_boolean}
-
-## Target environment
-**Environment:** [curated]
-
-**Bucket:** `{production_bucket}`
-
-**Processing timestamp(s):**
-{production_timestamps}
-
-**Harmonized {workflow} workflow version:** {production_workflow_info}
-
-**Sample set:** {production_sample_loc}
-
-**Tests passed:** N/A
-
-
-# Definitions
-### Table 1: Definitions
-| Term | Definition |
-|---------|---------|
-| Initial environment | This is where the staging data lives with the intent of promoting it to production. |
-| Target environment | This is where the current production data lives with the intent of replacing it with the staging data in the initial environment. |
-| New files | Set of new files (i.e. they didn’t exist in previous runs/workflow versions). |
-| Modified files | Set of files that have different checksums. |
-| Deleted files | Set of files that no longer exist in this version of the pipeline (expected, not an error in the pipeline). |
-| Not empty test | A test that checks if all files in buckets are empty or less than or equal to 10 bytes in size. |
-| Metadata present test | A test that checks if all files in buckets have an associated metadata. The metadata file (MANIFEST.tsv) is generated in the workflow. |
-
-
-# Files changed
-## New (i.e. only in staging)
-| filename |
-|---------|
-{new_files_rows}
-
-## Modified
-| filename | hash (md5) |
-|---------|---------|
-{modified_files_rows}
-
-## Deleted (i.e. only in prod)
-| filename |
-|---------|
-{deleted_files_rows}
-
-
-# File tests
-### Table 2: Summary of data integrity tests results
-Summarizes the results of all data integrity tests on all files and when the tests were run. If all tests pass for all files, the data will be promoted and the "all tests passed" column will show a ✅. If any test fails for any file, the data will not be promoted and the "all tests passed" column will show a ❌.
-| timestamp | all tests passed |
-|---------|---------|
-| {timestamp} | {test_result} |
-
-### Table 3: Data integrity tests results for each file
-Individual data integrity test results for each file (a comprehensive variation of [Table 2](#table-2-summary-of-data-integrity-tests-results)) and when the tests were run. Tests involve checking if files are not empty and have an associated metadata (more details in [Table 1](#table-1-definitions)). All tests for all files must pass in order for data to be promoted.
-| filename | timestamp | not empty test | metadata present test |
-|---------|---------|---------|-------------|
-{data_integrity_test_rows}
-
-
-# Combined manifest file locations
-**New manifest:** `{staging_bucket}/{workflow}/release/{release_version}/workflow_metadata/{timestamp}/MANIFEST.tsv`
 
-**Previous manifest:** {previous_manifest_loc}
-"""
+		fh.write("\n\n# Definitions\n### Table 1: Definitions\n")
+		_write_table(fh, ["Term", "Definition"], DEFINITIONS, None)
+
+		fh.write("\n\n# Files changed\n## New (i.e. only in staging)\n")
+		_write_table(fh, ["filename"], ((filename,) for filename in new_files), ["N/A"])
+		fh.write("\n## Modified\n")
+		_write_table(fh, ["filename", "hash (md5)"], modified_files, ["N/A", "N/A"])
+		fh.write("\n## Deleted (i.e. only in prod)\n")
+		_write_table(fh, ["filename"], ((filename,) for filename in deleted_files), ["N/A"])
+
+		fh.write(
+			"\n\n# File tests\n"
+			"### Table 2: Summary of data integrity tests results\n"
+			"Summarizes the results of all data integrity tests on all files and when the tests were run. "
+			"If all tests pass for all files, the data will be promoted and the \"all tests passed\" column will show a ✅. "
+			"If any test fails for any file, the data will not be promoted and the \"all tests passed\" column will show a ❌.\n"
+		)
+		_write_table(fh, ["timestamp", "all tests passed"], [(timestamp, test_result)], None)
+
+		fh.write(
+			"\n### Table 3: Data integrity tests results for each file\n"
+			"Individual data integrity test results for each file (a comprehensive variation of "
+			"[Table 2](#table-2-summary-of-data-integrity-tests-results)) and when the tests were run. "
+			"Tests involve checking if files are not empty, have an associated metadata and match the checksum recorded in it "
+			"(more details in [Table 1](#table-1-definitions)). All tests for all files must pass in order for data to be promoted.\n"
+		)
+		_write_table(
+			fh,
+			["filename", "timestamp", "not empty test", "metadata present test", "checksum test"],
+			file_test_rows(),
+			None
+		)
 
-	with open(f"{dataset_id_underscore}_data_promotion_report.md", "w") as file:
-		file.write(markdown_content)
+		fh.write("\n\n# Combined manifest file locations\n")
+		fh.write(f"**New manifest:** `{new_manifest}`\n\n")
+		fh.write(f"**Previous manifest:** {previous_manifest_loc}\n")
+
+		# Inside the block: if the report fails part way, the sidecar discards its partial files
+		return sidecar.close({
+			"dataset_id": dataset_id,
+			"workflow": workflow,
+			"release_version": release_version,
+			"timestamp": timestamp,
+			"staging_environment": staging,
+			"staging_bucket": staging_bucket,
+			"production_bucket": production_bucket,
+			"tests_passed": test_boolean == "True",
+			"new_manifest": new_manifest,
+			"previous_manifest": previous_manifest or None,
+			"report": "data_promotion_report.md",
+		})
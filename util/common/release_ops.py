@@ -1,57 +1,250 @@
 #!/usr/bin/env python3
 """Releases-Sheet loading, release constants, and dataset slug classifiers.
 
-Pulls the live Releases Google Sheet as the single source of truth and exposes
-the derived bucket lists and ordered category constants, plus the slug-based
-classifiers used when Sheet metadata isn't available (e.g. internal QC datasets).
+The live Releases Google Sheet is the single source of truth. It is loaded
+lazily through `releases_catalog` on first use (not at import) and cached on
+disk. Every online load checks the Sheet's Drive modifiedTime and re-downloads
+only when it has changed; when modifiedTime can't be read, a cache younger
+than its TTL is used instead of downloading again. With
+`releases_catalog.offline = True` (the scripts' `--offline` flag) the last
+cached snapshot is used without any network access. The derived bucket lists
+are computed on first access, plus the slug-based classifiers used when Sheet
+metadata isn't available (e.g. internal QC datasets).
+
+The cache lives in WF_COMMON_RELEASES_CACHE (default
+~/.cache/wf-common/releases_catalog.json); WF_COMMON_RELEASES_CACHE_TTL sets
+its TTL in seconds (default 3600).
 """
 
 import os
+import re
+import json
+import time
 import logging
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
 
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+SCOPES = [
+	"https://www.googleapis.com/auth/spreadsheets.readonly",
+	# Only used to read the Sheet's modifiedTime for conditional refreshes
+	"https://www.googleapis.com/auth/drive.metadata.readonly",
+]
+RELEASES_SHEET_ID = "1Qx4W3EsGQwRHXKtDd6jBnEyPGsuhxB8YCVdgJ-Mn6Hs"
+RELEASES_TAB_NAME = "Releases_src"
+DEFAULT_CREDENTIALS_PATH = os.path.expanduser("~/.config/gspread/credentials.json")
+RELEASES_CACHE_ENV_VAR = "WF_COMMON_RELEASES_CACHE"
+RELEASES_CACHE_TTL_ENV_VAR = "WF_COMMON_RELEASES_CACHE_TTL"
+DEFAULT_RELEASES_CACHE = os.path.expanduser("~/.cache/wf-common/releases_catalog.json")
+DEFAULT_RELEASES_CACHE_TTL = 3600.0
+
+
+def _authorize(credentials_path):
+	# Imported here so that importing release_ops does not pay for the Google client libraries
+	import gspread
+	from google.oauth2.service_account import Credentials
 
-def get_releases_df(
-	sheet_id: str = "1Qx4W3EsGQwRHXKtDd6jBnEyPGsuhxB8YCVdgJ-Mn6Hs",
-	tab_name: str = "Releases_src",
-	credentials_path: str = os.path.expanduser("~/.config/gspread/credentials.json")
-) -> pd.DataFrame:
 	if not os.path.exists(credentials_path):
 		raise FileNotFoundError(f"Credentials file not found: {credentials_path}; look at README")
 	creds = Credentials.from_service_account_file(credentials_path, scopes=SCOPES)
-	gc = gspread.authorize(creds)
+	return gspread.authorize(creds)
+
+
+def get_releases_df(
+	sheet_id: str = RELEASES_SHEET_ID,
+	tab_name: str = RELEASES_TAB_NAME,
+	credentials_path: str = DEFAULT_CREDENTIALS_PATH
+) -> pd.DataFrame:
+	"""Download the Releases worksheet (uncached)."""
+	gc = _authorize(credentials_path)
 	ws = gc.open_by_key(sheet_id).worksheet(tab_name)
 	return pd.DataFrame(ws.get_all_records())
 
-releases_df = get_releases_df()
-releases_df["raw_buckets"] = "gs://asap-raw-" + releases_df["dataset_id"]
-releases_df["dev_buckets"] = "gs://asap-dev-" + releases_df["dataset_id"]
-
-ALL_TEAMS = releases_df["team_id"].unique().tolist()
-
-## Minor and Major Release that includes pipeline/curated outputs
-### The latest_workflow_version column is being used to infer datasets with pipeline outputs
-unembargoed_dev_buckets_and_workflow_version_outputs = (
-	releases_df[
-		releases_df["latest_workflow_version"].str.startswith("v", na=False)
-	]
-	.sort_values("latest_workflow_version")
-	.drop_duplicates(subset="dev_buckets", keep="last")
-	.set_index("dev_buckets")["latest_workflow_version"]
-	.to_dict()
-)
-## Urgent and Minor Release or platforming exercise during a Major Release
-completed_platforming_raw_buckets = (
-	releases_df[
-		~releases_df["latest_workflow_version"].str.startswith("v", na=False)
-	]["raw_buckets"]
-	.drop_duplicates()
-	.tolist()
-)
+
+class ReleasesCatalog:
+	"""Lazily loaded, disk-cached view of the Releases Sheet and the bucket lists derived from it."""
+
+	def __init__(
+		self,
+		sheet_id=RELEASES_SHEET_ID,
+		tab_name=RELEASES_TAB_NAME,
+		credentials_path=DEFAULT_CREDENTIALS_PATH,
+		cache_path=None,
+		ttl=None,
+		offline=False,
+	):
+		self.sheet_id = sheet_id
+		self.tab_name = tab_name
+		self.credentials_path = credentials_path
+		self.cache_path = cache_path or os.environ.get(RELEASES_CACHE_ENV_VAR, DEFAULT_RELEASES_CACHE)
+		self.ttl = ttl if ttl is not None else float(os.environ.get(RELEASES_CACHE_TTL_ENV_VAR, DEFAULT_RELEASES_CACHE_TTL))
+		self.offline = offline
+
+	def _read_cache(self):
+		try:
+			with open(self.cache_path) as fh:
+				cache = json.load(fh)
+		except (FileNotFoundError, json.JSONDecodeError):
+			return None
+		if cache.get("sheet_id") != self.sheet_id or cache.get("tab_name") != self.tab_name:
+			return None
+		return cache
+
+	def _write_cache(self, records, modified_time):
+		os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+		tmp_path = f"{self.cache_path}.tmp"
+		with open(tmp_path, "w") as fh:
+			json.dump({
+				"sheet_id": self.sheet_id,
+				"tab_name": self.tab_name,
+				"fetched_at": time.time(),
+				"modified_time": modified_time,
+				"records": records,
+			}, fh)
+		os.replace(tmp_path, self.cache_path)
+
+	def _modified_time(self, gc):
+		"""The Sheet's Drive modifiedTime, or None if it can't be read (e.g. Drive API not enabled)."""
+		try:
+			return gc.http_client.get_file_drive_metadata(self.sheet_id)["modifiedTime"]
+		except Exception as e:
+			logging.debug(f"Could not read Releases Sheet modifiedTime: {e}")
+			return None
+
+	def _load_records(self):
+		cache = self._read_cache()
+		if self.offline:
+			if cache is None:
+				raise FileNotFoundError(f"No cached Releases snapshot at {self.cache_path}; run once without --offline first")
+			logging.info(f"Using cached Releases snapshot from {time.ctime(cache['fetched_at'])} (offline)")
+			return cache["records"]
+
+		# The modifiedTime check is always made online; the TTL only lets a
+		# recent cache skip the full download when modifiedTime can't be read
+		try:
+			gc = _authorize(self.credentials_path)
+			modified_time = self._modified_time(gc)
+			if cache is not None and modified_time is not None and modified_time == cache.get("modified_time"):
+				logging.info("Releases Sheet unchanged since the cached snapshot")
+				records = cache["records"]
+			elif cache is not None and modified_time is None and time.time() - cache["fetched_at"] < self.ttl:
+				logging.info(f"Using cached Releases snapshot from {time.ctime(cache['fetched_at'])} (Sheet modifiedTime unavailable)")
+				return cache["records"]
+			else:
+				records = gc.open_by_key(self.sheet_id).worksheet(self.tab_name).get_all_records()
+		except Exception as e:
+			if cache is None:
+				raise
+			logging.warning(f"Could not refresh the Releases Sheet ({e}); using cached snapshot from {time.ctime(cache['fetched_at'])}")
+			return cache["records"]
+		self._write_cache(records, modified_time)
+		return records
+
+	def refresh(self):
+		"""Drop everything loaded so far; the next access reloads (checking modifiedTime again)."""
+		for name in [name for name, value in vars(type(self)).items() if isinstance(value, cached_property)]:
+			self.__dict__.pop(name, None)
+
+	@cached_property
+	def records(self) -> list:
+		"""Releases Sheet rows as dicts, one per row in Sheet order."""
+		return self._load_records()
+
+	@cached_property
+	def index(self) -> "ReleasesIndex":
+		return ReleasesIndex.build(self.records)
+
+	@cached_property
+	def releases_df(self) -> pd.DataFrame:
+		releases_df = pd.DataFrame(self.records)
+		releases_df["raw_buckets"] = "gs://asap-raw-" + releases_df["dataset_id"]
+		releases_df["dev_buckets"] = "gs://asap-dev-" + releases_df["dataset_id"]
+		return releases_df
+
+	@property
+	def all_teams(self) -> list:
+		return list(self.index.datasets_by_team)
+
+	## Minor and Major Release that includes pipeline/curated outputs
+	### The latest_workflow_version column is being used to infer datasets with pipeline outputs
+	@property
+	def unembargoed_dev_buckets_and_workflow_version_outputs(self) -> dict:
+		return self.index.workflow_version_by_dev_bucket
+
+	## Urgent and Minor Release or platforming exercise during a Major Release
+	@property
+	def completed_platforming_raw_buckets(self) -> list:
+		return self.index.completed_platforming_raw_buckets
+
+	def dataset(self, dataset_id) -> dict:
+		"""Releases Sheet row of a dataset (the last one if it is listed more than once)."""
+		return self.index.dataset_rows[dataset_id]
+
+	def team_datasets(self, team_id) -> list:
+		return self.index.datasets_by_team.get(team_id, [])
+
+	def raw_buckets_for_release(self, release_version) -> list:
+		"""Raw buckets of the datasets whose latest_release_version is release_version."""
+		return self.index.raw_buckets_by_release.get(release_version, [])
+
+	def workflow_version_for(self, dev_bucket):
+		"""Latest workflow version with curated outputs for a dev bucket, or None."""
+		return self.index.workflow_version_by_dev_bucket.get(dev_bucket)
+
+
+@dataclass
+class ReleasesIndex:
+	"""Hash indexes over the Releases Sheet rows, built in one pass."""
+	dataset_rows: dict = field(default_factory=dict)
+	datasets_by_team: dict = field(default_factory=dict)
+	raw_buckets_by_release: dict = field(default_factory=dict)
+	workflow_version_by_dev_bucket: dict = field(default_factory=dict)
+	completed_platforming_raw_buckets: list = field(default_factory=list)
+
+	@classmethod
+	def build(cls, records):
+		index = cls()
+		latest_versions = {}
+		completed = {}
+		for row in records:
+			dataset_id = row["dataset_id"]
+			raw_bucket = f"gs://asap-raw-{dataset_id}"
+			index.dataset_rows[dataset_id] = row
+			team_datasets = index.datasets_by_team.setdefault(row["team_id"], [])
+			if dataset_id not in team_datasets:
+				team_datasets.append(dataset_id)
+			release_buckets = index.raw_buckets_by_release.setdefault(row.get("latest_release_version"), [])
+			if raw_bucket not in release_buckets:
+				release_buckets.append(raw_bucket)
+			workflow_version = row.get("latest_workflow_version")
+			if isinstance(workflow_version, str) and workflow_version.startswith("v"):
+				dev_bucket = f"gs://asap-dev-{dataset_id}"
+				latest_versions[dev_bucket] = max(latest_versions.get(dev_bucket, workflow_version), workflow_version)
+			else:
+				completed[raw_bucket] = None
+		# Same ordering as the former sort_values("latest_workflow_version") frame
+		index.workflow_version_by_dev_bucket = dict(sorted(latest_versions.items(), key=lambda item: item[1]))
+		index.completed_platforming_raw_buckets = list(completed)
+		return index
+
+
+releases_catalog = ReleasesCatalog()
+
+# Former import-time globals, now resolved through the catalog on first access.
+# Deliberately not in __all__: a star import would otherwise load the Sheet.
+_CATALOG_ATTRIBUTES = {
+	"releases_df": "releases_df",
+	"ALL_TEAMS": "all_teams",
+	"unembargoed_dev_buckets_and_workflow_version_outputs": "unembargoed_dev_buckets_and_workflow_version_outputs",
+	"completed_platforming_raw_buckets": "completed_platforming_raw_buckets",
+}
+
+
+def __getattr__(name):
+	if name in _CATALOG_ATTRIBUTES:
+		return getattr(releases_catalog, _CATALOG_ATTRIBUTES[name])
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 ######################################################################
@@ -104,90 +297,117 @@ def team_from_slug(slug):
 	return "unknown"
 
 
-def classify_assay(value):
-	"""Map an assay value (free-text Releases-Sheet `assay`, or a dataset slug)
-	to an entry in ASSAY_ORDER. Returns None if no pattern matches — callers
-	decide their own fallback (e.g. 'Unclassified').
+def _rule(label, keywords=(), suffixes=(), exact=()):
+	"""(label, compiled pattern) matching any keyword substring, a suffix at the end of the value, or the whole value."""
+	alternatives = [re.escape(x) for x in keywords]
+	alternatives += [rf"{re.escape(x)}\Z" for x in suffixes]
+	alternatives += [rf"\A{re.escape(x)}\Z" for x in exact]
+	return label, re.compile("|".join(alternatives))
 
-	The patterns cover both Releases-Sheet conventions (snake_case, free-text
-	like 'Bulk_RNA_Seq', 'mass spec') and slug conventions (kebab-case like
-	'sc-rnaseq', 'ms-mb-plasma'). Order matters: more specific patterns are
-	checked before more general ones."""
-	s = str(value).lower()
 
+# Rules are tried in order on the lowercased value; the first match wins, so
+# more specific patterns come before more general ones.
+_ASSAY_RULES = [
 	# ATAC-seq first — broader sc/sn would otherwise capture sc_atac/sn_atac
-	if any(x in s for x in [
+	_rule("sc/snATAC-seq", [
 		"sn-atacseq", "sc-atacseq", "snatacseq", "scatacseq",
 		"sc_atac", "sn_atac", "scatac", "snatac",
 		"sc-atac", "sn-atac", "atacseq", "atac_seq", "atac-seq",
-	]):
-		return "sc/snATAC-seq"
-
+	]),
 	# Multiome (paired RNA+ATAC, e.g. 10x Multiome) — checked before sc/sn RNA-seq
 	# so the multimodal/multiome keyword takes precedence over a generic sc-/sn- match
-	if any(x in s for x in ["multimodal", "multiome", "multiomic"]):
-		return "sc/sn Multiome"
-
+	_rule("sc/sn Multiome", ["multimodal", "multiome", "multiomic"]),
 	# sc/sn RNA-seq — covers both kebab-case slugs and snake_case Sheet values
-	if any(x in s for x in [
+	_rule("sc/snRNA-seq", [
 		"sn-rnaseq", "sc-rnaseq", "scrnaseq", "snrnaseq",
 		"single-cell", "single-nucleus", "single_cell", "single_nucleus",
 		"scrna", "snrna", "sc-rna", "sn-rna",
 		"sc_", "sn_",
-	]):
-		return "sc/snRNA-seq"
-
-	if "bulk" in s:
-		return "Bulk RNA-seq"
-
-	if any(x in s for x in ["spatial", "visium", "geomx", "cosmx", "xenium", "nanostring"]):
-		return "Spatial Transcriptomics"
-
+	]),
+	_rule("Bulk RNA-seq", ["bulk"]),
+	_rule("Spatial Transcriptomics", ["spatial", "visium", "geomx", "cosmx", "xenium", "nanostring"]),
 	# Mass-spec assays — tighten ms-p / ms-mb / ms-l patterns so they don't collide.
 	# Bare `ms-p` is allowed when it's the whole value (e.g. Sheet input "ms-p")
 	# or at the end of a slug; the slug-tightened `ms-p-` / `ms-p_` handles
 	# embedded positions.
-	if (any(x in s for x in ["ms-p-", "ms-p_", "proteom", "mass-spec", "mass_spec", "mass spec"])
-			or s.endswith("ms-p") or s == "ms-p"):
-		return "Proteomics"
-	if any(x in s for x in ["ms-mb-", "ms-mb_", "metabolom"]) or s.endswith("ms-mb") or s == "ms-mb":
-		return "Metabolomics"
-	if any(x in s for x in ["ms-l-", "ms-l_", "lipidom"]) or s.endswith("ms-l") or s == "ms-l":
-		return "Lipidomics"
-
+	_rule("Proteomics", ["ms-p-", "ms-p_", "proteom", "mass-spec", "mass_spec", "mass spec"], suffixes=["ms-p"]),
+	_rule("Metabolomics", ["ms-mb-", "ms-mb_", "metabolom"], suffixes=["ms-mb"]),
+	_rule("Lipidomics", ["ms-l-", "ms-l_", "lipidom"], suffixes=["ms-l"]),
 	# WGS before Genetics — Genetics is the catch-all for genotyping/SNP/array data
-	if any(x in s for x in ["wgs", "whole-genome", "whole_genome"]):
-		return "WGS"
-	if any(x in s for x in ["genetic", "genotyp", "gwas", "snp", "variant"]):
-		return "Genetics"
-	if any(x in s for x in ["metagenom", "shotgun", "microbiome", "16s"]):
-		return "Metagenomics"
+	_rule("WGS", ["wgs", "whole-genome", "whole_genome"]),
+	_rule("Genetics", ["genetic", "genotyp", "gwas", "snp", "variant"]),
+	_rule("Metagenomics", ["metagenom", "shotgun", "microbiome", "16s"]),
+]
+
+_ORGANISM_RULES = [
+	# Human keywords (slug-side: pmdbs; Sheet-side: human, homo)
+	_rule("Human", ["human", "homo", "pmdbs"]),
+	# MEF first — must come before generic mouse check so it doesn't get
+	# swallowed by a slug that happens to contain 'mef' but not 'mouse'
+	_rule("Mouse", ["mef"]),
+	_rule("Mouse", ["mouse", "mus", "sulzer-fecal-metagenome-fp-spf"]),
+	# Cell-line / in-vitro datasets — Human; values that also say mouse have
+	# already matched the Mouse rule above
+	_rule("Human", ["invitro", "ipsc", "hek"]),
+]
+
+_SOURCE_RULES = [
+	# MEF = mouse embryonic fibroblast → must come before generic cell-line check
+	_rule("Embryonic fibroblast", ["mef", "fibroblast", "embryon"]),
+	_rule("Brain tissue", [
+		"brain", "pmdbs", "postmortem", "midbrain", "striatum", "cortex",
+		"substantia-nigra", "substantia nigra",
+		"hippocampus", "cerebellum", "neural",
+	]),
+	_rule("Gastrointestinal", ["colon", "gastro", "intestin", "gi-tract", "gi tract", "gut"]),
+	# Fecal: handles both Human Fecal and Mouse Fecal
+	_rule("Fecal", ["fecal", "stool", "feces", "microbiome", "metagenom"]),
+	_rule("Liver tissue", ["liver"]),
+	_rule("Lung tissue", ["lung"]),
+	_rule("Kidney tissue", ["kidney", "renal"]),
+	_rule("Plasma", ["plasma", "serum", "-blood-"], suffixes=["-blood"], exact=["blood"]),
+	_rule("Cell lines", [
+		"cell line", "cell-line", "invitro", "in vitro", "ipsc", "hek",
+		"neuronal cell", "hesc", "hpsc",
+	]),
+]
+
+_CLASSIFICATION_RULES = {
+	"assay": _ASSAY_RULES,
+	"organism": _ORGANISM_RULES,
+	"source": _SOURCE_RULES,
+}
 
+
+@lru_cache(maxsize=8192)
+def _classify(kind, value):
+	"""First matching label of the kind's rules for an already lowercased value, or None."""
+	for label, pattern in _CLASSIFICATION_RULES[kind]:
+		if pattern.search(value):
+			return label
 	return None
 
 
+def classify_assay(value):
+	"""Map an assay value (free-text Releases-Sheet `assay`, or a dataset slug)
+	to an entry in ASSAY_ORDER. Returns None if no pattern matches — callers
+	decide their own fallback (e.g. 'Unclassified').
+
+	The patterns cover both Releases-Sheet conventions (snake_case, free-text
+	like 'Bulk_RNA_Seq', 'mass spec') and slug conventions (kebab-case like
+	'sc-rnaseq', 'ms-mb-plasma'). Order matters: more specific patterns are
+	checked before more general ones (see _ASSAY_RULES)."""
+	return _classify("assay", str(value).lower())
+
+
 def classify_organism(value):
 	"""Map an organism value (free-text Releases-Sheet `organism`, or a dataset
 	slug) to 'Human' or 'Mouse'. Returns None if neither matches.
 
 	Cell-line / in-vitro values default to Human unless the input also says
 	'mouse' (so a slug like prod-team-alessi-mefs-... resolves to Mouse via
-	the MEF check below)."""
-	s = str(value).lower()
-	# Human keywords (slug-side: pmdbs; Sheet-side: human, homo)
-	if any(x in s for x in ["human", "homo", "pmdbs"]):
-		return "Human"
-	# MEF first — must come before generic mouse check so it doesn't get
-	# swallowed by a slug that happens to contain 'mef' but not 'mouse'
-	if "mef" in s or "mefs" in s:
-		return "Mouse"
-	if any(x in s for x in ["mouse", "mus", "sulzer-fecal-metagenome-fp-spf"]):
-		return "Mouse"
-	# Cell-line / in-vitro datasets — assume Human unless the value also
-	# says mouse (caller decides further disambiguation if needed)
-	if any(x in s for x in ["invitro", "ipsc", "hek"]):
-		return "Human" if "mouse" not in s else "Mouse"
-	return None
+	the MEF check)."""
+	return _classify("organism", str(value).lower())
 
 
 def classify_source(value, organism=""):
@@ -203,44 +423,23 @@ def classify_source(value, organism=""):
 	When called from the Releases-Sheet path, pass the organism so Fecal can
 	be split by Human/Mouse appropriately (currently both still map to 'Fecal',
 	but the organism arg is preserved for future disambiguation needs)."""
-	s = str(value).lower()
-	o = str(organism).lower()
+	return _classify("source", str(value).lower())
 
-	# MEF = mouse embryonic fibroblast → must come before generic cell-line check
-	if "mef" in s or "fibroblast" in s or "embryon" in s:
-		return "Embryonic fibroblast"
 
-	if any(x in s for x in [
-		"brain", "pmdbs", "postmortem", "midbrain", "striatum", "cortex",
-		"substantia-nigra", "substantia nigra",
-		"hippocampus", "cerebellum", "neural",
-	]):
-		return "Brain tissue"
-
-	if any(x in s for x in ["colon", "gastro", "intestin", "gi-tract", "gi tract", "gut"]):
-		return "Gastrointestinal"
-
-	# Fecal: handles both Human Fecal and Mouse Fecal. The organism arg lets
-	# callers route to bucket-specific behavior later; for now both return Fecal.
-	if any(x in s for x in ["fecal", "stool", "feces", "microbiome", "metagenom"]):
-		return "Fecal"
-
-	if "liver" in s:
-		return "Liver tissue"
-	if "lung" in s:
-		return "Lung tissue"
-	if "kidney" in s or "renal" in s:
-		return "Kidney tissue"
-	if any(x in s for x in ["plasma", "serum"]) or "-blood-" in s or s.endswith("-blood") or s == "blood":
-		return "Plasma"
-
-	if any(x in s for x in [
-		"cell line", "cell-line", "invitro", "in vitro", "ipsc", "hek",
-		"neuronal cell", "hesc", "hpsc",
-	]):
-		return "Cell lines"
+def classify_series(values, kind) -> pd.Series:
+	"""
+	Classify a whole column at once; kind is "assay", "organism" or "source".
 
-	return None
+	Same results as applying classify_<kind> to each value, but each distinct
+	value is classified only once. Unmatched values are None. Values are
+	stringified one by one like the scalar classifiers do, so None and NaN
+	become "none" and "nan" instead of missing keys that factorize would drop.
+	"""
+	series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+	lowered = series.astype(object).map(lambda value: str(value).lower())
+	codes, uniques = pd.factorize(lowered)
+	labels = [_classify(kind, value) for value in uniques]
+	return pd.Series([labels[code] for code in codes], index=lowered.index, name=lowered.name, dtype=object)
 
 
 embargoed_dev_buckets = [
@@ -254,15 +453,15 @@ embargoed_dev_buckets = [
 
 def list_teams():
 	logging.info("Available teams:")
-	for team in ALL_TEAMS:
+	for team in releases_catalog.index.datasets_by_team:
 		logging.info(team)
 
 
 __all__ = [
-    "SCOPES", "get_releases_df", "releases_df", "ALL_TEAMS",
-    "unembargoed_dev_buckets_and_workflow_version_outputs",
-    "completed_platforming_raw_buckets",
+    "SCOPES", "RELEASES_SHEET_ID", "RELEASES_TAB_NAME", "DEFAULT_CREDENTIALS_PATH",
+    "RELEASES_CACHE_ENV_VAR", "RELEASES_CACHE_TTL_ENV_VAR", "DEFAULT_RELEASES_CACHE", "DEFAULT_RELEASES_CACHE_TTL",
+    "get_releases_df", "ReleasesCatalog", "ReleasesIndex", "releases_catalog",
     "ASSAY_ORDER", "HUMAN_SOURCES_ORDER", "MOUSE_SOURCES_ORDER",
-    "team_from_slug", "classify_assay", "classify_organism", "classify_source",
+    "team_from_slug", "classify_assay", "classify_organism", "classify_source", "classify_series",
     "embargoed_dev_buckets", "list_teams",
 ]
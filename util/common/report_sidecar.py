@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Machine-readable companion files for the data promotion report.
+
+Written in the same pass as the Markdown report:
+- `<dataset>_data_promotion_report.json`: run metadata, overall result and
+  counts (files, new / modified / deleted / unchanged, test failures, checksum
+  statuses).
+- `<dataset>_data_promotion_files.parquet`: one typed row per file with its
+  non_empty / in_manifest / hash_status / change_type, flushed to the Parquet
+  writer in batches so memory does not grow with the number of files.
+"""
+
+import json
+import os
+from collections import Counter
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+REPORT_JSON_NAME = "data_promotion_report.json"
+FILES_PARQUET_NAME = "data_promotion_files.parquet"
+SIDECAR_BATCH_SIZE = 10000
+FILE_SCHEMA = pa.schema([
+	("filename", pa.string()),  # gs:// URL
+	("size", pa.int64()),
+	("md5_hash", pa.string()),
+	("non_empty", pa.bool_()),  # null for files only in curated
+	("in_manifest", pa.bool_()),  # null where the test does not apply (MANIFEST.tsv itself)
+	("hash_status", pa.string()),  # data_integrity.CHECKSUM_STATUSES
+	("change_type", pa.string()),  # added, modified, unchanged or deleted
+])
+
+
+def sidecar_paths(dataset_id_underscore):
+	"""Local (json, parquet) paths; they are uploaded as REPORT_JSON_NAME and FILES_PARQUET_NAME."""
+	return f"{dataset_id_underscore}_{REPORT_JSON_NAME}", f"{dataset_id_underscore}_{FILES_PARQUET_NAME}"
+
+
+def test_passed(cell):
+	"""Report cell ("✅", "❌", "N/A ...") as True / False / None."""
+	if cell is None or str(cell).startswith("N/A"):
+		return None
+	return "❌" not in cell
+
+
+class ReportSidecar:
+	"""
+	Use as a context manager: leaving the block without a successful close()
+	(e.g. the report raised part way) discards the partial sidecar files.
+	"""
+
+	def __init__(self, dataset_id_underscore, batch_size=SIDECAR_BATCH_SIZE):
+		self.json_path, self.parquet_path = sidecar_paths(dataset_id_underscore)
+		self.batch_size = batch_size
+		self.counts = Counter()
+		self.hash_statuses = Counter()
+		self._rows = []
+		self._writer = pq.ParquetWriter(self.parquet_path, FILE_SCHEMA)
+		self._closed = False
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if not self._closed:
+			self.discard()
+		return False
+
+	def add(self, filename, size, md5_hash, non_empty, in_manifest, hash_status, change_type):
+		self._rows.append((filename, size, md5_hash, non_empty, in_manifest, hash_status, change_type))
+		self.counts[change_type] += 1
+		if change_type != "deleted":
+			self.counts["files"] += 1
+		if hash_status:
+			self.hash_statuses[hash_status] += 1
+		if non_empty is False:
+			self.counts["empty_files"] += 1
+		if in_manifest is False:
+			self.counts["missing_metadata"] += 1
+		if len(self._rows) >= self.batch_size:
+			self._flush()
+
+	def _flush(self):
+		if self._rows:
+			columns = list(zip(*self._rows))
+			self._writer.write_batch(pa.record_batch(
+				[pa.array(column, type=field.type) for column, field in zip(columns, FILE_SCHEMA)],
+				schema=FILE_SCHEMA,
+			))
+			self._rows = []
+
+	def close(self, summary):
+		"""Flush the per-file table and write the JSON summary (summary plus the counts)."""
+		self._flush()
+		self._writer.close()
+		self._closed = True
+		counts = {key: self.counts[key] for key in ("files", "added", "modified", "unchanged", "deleted", "empty_files", "missing_metadata")}
+		summary = {**summary, "counts": counts, "hash_statuses": dict(self.hash_statuses), "files_table": FILES_PARQUET_NAME}
+		with open(self.json_path, "w") as fh:
+			json.dump(summary, fh, indent=2)
+		return summary
+
+	def discard(self):
+		"""Close the Parquet writer and remove both sidecar files, so no truncated table is left behind."""
+		self._closed = True
+		self._writer.close()
+		for path in (self.parquet_path, self.json_path):
+			if os.path.exists(path):
+				os.remove(path)
+
+
+__all__ = [
+    "REPORT_JSON_NAME", "FILES_PARQUET_NAME", "SIDECAR_BATCH_SIZE", "FILE_SCHEMA", "sidecar_paths",
+    "test_passed", "ReportSidecar",
+]
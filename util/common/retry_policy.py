@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Retry policy for transient Cloud Storage failures.
+
+Errors are classified as transient (HTTP 408/429/5xx, rate limiting, dropped
+connections, timeouts) or permanent; only transient ones are retried, with
+jittered exponential backoff, a cap on attempts and a cap on total elapsed
+time. Each retry is logged and counted in the storage trace.
+
+The storage backends apply the policy at the smallest unit they can resume
+from: each object for the in-process backends, each idempotent `gcloud storage`
+call for the CLI backend (ls, cat, rsync, single-object cp, IAM reads; a re-run
+rsync only transfers what is still missing). Multi-object mv/rm/cp calls are
+not retried, since a re-run would repeat work the failed attempt already did.
+"""
+
+import logging
+import os
+import random
+import re
+import subprocess
+import time
+from dataclasses import dataclass
+
+from storage_trace import record_retry
+
+
+RETRY_MAX_ATTEMPTS_ENV_VAR = "WF_COMMON_RETRY_MAX_ATTEMPTS"
+RETRY_MAX_ELAPSED_ENV_VAR = "WF_COMMON_RETRY_MAX_ELAPSED"
+
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+_TRANSIENT_MESSAGE_RE = re.compile(
+	r"\b(?:HTTPError |HTTP |status[ =:]*|code[ =:]*)(?:408|429|50[0234])\b|too many requests|rate ?limit|backend ?error|service unavailable"
+	r"|internal error|connection (?:reset|aborted|refused)|broken pipe|timed? ?out|temporarily unavailable",
+	re.IGNORECASE,
+)
+# Transport errors from requests/urllib3/google-auth, matched by name so neither has to be importable here
+_TRANSIENT_ERROR_NAMES = frozenset({
+	"ConnectionError", "ConnectTimeout", "ReadTimeout", "Timeout", "ChunkedEncodingError",
+	"ProtocolError", "TransportError", "RetryError",
+})
+
+
+def is_transient(error: BaseException) -> bool:
+	"""True if retrying the same request could succeed."""
+	if isinstance(error, subprocess.CalledProcessError):
+		if _TRANSIENT_MESSAGE_RE.search(f"{error.stderr or ''}\n{error.output or ''}"):
+			return True
+	elif isinstance(error, (ConnectionError, TimeoutError)):
+		return True
+	elif isinstance(getattr(error, "code", None), int):
+		return error.code in TRANSIENT_STATUS_CODES
+	elif type(error).__name__ in _TRANSIENT_ERROR_NAMES:
+		return True
+	cause = error.__cause__
+	return cause is not None and cause is not error and is_transient(cause)
+
+
+def _summarize(error: BaseException) -> str:
+	if isinstance(error, subprocess.CalledProcessError):
+		message = (error.stderr or str(error)).strip()
+	else:
+		message = str(error)
+	lines = message.splitlines()
+	return lines[-1] if lines else type(error).__name__
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+	max_attempts: int = 6
+	initial_delay: float = 1.0
+	max_delay: float = 60.0
+	multiplier: float = 2.0
+	max_elapsed: float = 600.0
+
+	def backoff(self, attempt: int) -> float:
+		"""Full-jitter delay before retry number `attempt` (1-based)."""
+		ceiling = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+		return random.uniform(0, ceiling)
+
+	def call(self, fn, *args, description=None, **kwargs):
+		"""
+		Call fn(*args, **kwargs), retrying transient failures.
+
+		The last error is re-raised once it is permanent, the attempts are used
+		up, or the next wait would exceed max_elapsed.
+		"""
+		start = time.monotonic()
+		attempt = 1
+		while True:
+			try:
+				return fn(*args, **kwargs)
+			except Exception as e:
+				if not is_transient(e) or attempt >= self.max_attempts:
+					raise
+				delay = self.backoff(attempt)
+				if time.monotonic() - start + delay > self.max_elapsed:
+					logging.error(f"Giving up on {description or getattr(fn, '__name__', 'storage call')} after {attempt} attempts ({self.max_elapsed:.0f}s retry budget exhausted)")
+					raise
+				logging.warning(
+					f"Transient error during {description or getattr(fn, '__name__', 'storage call')}: {_summarize(e)}; "
+					f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_attempts})"
+				)
+				record_retry()
+				time.sleep(delay)
+				attempt += 1
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+_policy = RetryPolicy(
+	max_attempts=int(os.environ.get(RETRY_MAX_ATTEMPTS_ENV_VAR, RetryPolicy.max_attempts)),
+	max_elapsed=float(os.environ.get(RETRY_MAX_ELAPSED_ENV_VAR, RetryPolicy.max_elapsed)),
+)
+
+
+def get_retry_policy() -> RetryPolicy:
+	return _policy
+
+
+def set_retry_policy(policy: RetryPolicy):
+	"""Install the policy used by the storage backends for the rest of the process."""
+	global _policy
+	_policy = policy
+
+
+def retry_call(fn, *args, description=None, **kwargs):
+	"""Call fn under the process-wide retry policy."""
+	return _policy.call(fn, *args, description=description, **kwargs)
+
+
+__all__ = [
+    "RETRY_MAX_ATTEMPTS_ENV_VAR", "RETRY_MAX_ELAPSED_ENV_VAR", "TRANSIENT_STATUS_CODES",
+    "is_transient", "RetryPolicy", "NO_RETRY", "get_retry_policy", "set_retry_policy",
+    "retry_call",
+]
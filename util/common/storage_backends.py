@@ -0,0 +1,828 @@
+#!/usr/bin/env python3
+"""Pluggable Cloud Storage backends used by the gcloud_ops helpers.
+
+- `CliBackend` shells out to `gcloud storage ...` once per call (the original
+  behaviour, kept as the fallback).
+- `ClientBackend` keeps a single long-lived google.cloud.storage.Client, so every
+  call reuses the same authorized HTTP session and connection pool.
+- `LocalBackend` maps gs://<bucket>/<name> onto <root>/<bucket>/<name> so the
+  promotion scripts can be exercised and benchmarked offline.
+
+Every backend returns a subprocess.CompletedProcess and raises StorageError (a
+CalledProcessError subclass), so callers that log stdout/stderr or catch
+CalledProcessError behave the same whichever backend is active.
+
+The active backend is chosen with `set_backend()` or the WF_COMMON_STORAGE_BACKEND
+environment variable: `client` (default), `cli` or `local` (the latter rooted at
+WF_COMMON_STORAGE_LOCAL_ROOT).
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from retry_policy import retry_call
+from storage_trace import attach, current_operation, record_transfer
+
+
+BACKEND_ENV_VAR = "WF_COMMON_STORAGE_BACKEND"
+LOCAL_ROOT_ENV_VAR = "WF_COMMON_STORAGE_LOCAL_ROOT"
+_NO_MATCH_MESSAGE = "One or more URLs matched no objects."
+_WILDCARD_RE = re.compile(r"[*?\[]")
+REWRITE_MAX_WORKERS = 16
+# gcloud's error forms for a stale etag on set-iam-policy (412) or a concurrent policy change (409)
+_IAM_CONFLICT_RE = re.compile(r"HTTPError (?:409|412)\b|precondition ?failed|conditionNotMet", re.IGNORECASE)
+_RANGE_NOT_SATISFIABLE_RE = re.compile(r"HTTPError 416|range not satisfiable|InvalidRange", re.IGNORECASE)
+_OBJECT_NOT_FOUND_RE = re.compile(r"HTTPError 404|No URLs matched|matched no objects|not found", re.IGNORECASE)
+
+
+class StorageError(subprocess.CalledProcessError):
+	"""Raised by the native backends; mirrors a failed `gcloud storage` call."""
+
+	def __init__(self, command, message):
+		super().__init__(returncode=1, cmd=command, output="", stderr=message)
+
+	def __str__(self):
+		return f"{' '.join(self.cmd)}: {self.stderr}"
+
+
+class IamPolicyConflict(StorageError):
+	"""The bucket IAM policy changed since it was read (etag mismatch)."""
+
+
+@dataclass(frozen=True)
+class ObjectRecord:
+	"""One object in a listing. Checksums are base64 strings as reported by GCS."""
+	bucket: str
+	name: str
+	size: int
+	md5_hash: str | None = None
+	crc32c: str | None = None
+	generation: int | None = None
+	updated: str | None = None
+
+	@property
+	def url(self) -> str:
+		return f"gs://{self.bucket}/{self.name}"
+
+
+@dataclass
+class CopyOutcome:
+	"""Per-object result of a batched copy."""
+	source: str
+	destination: str
+	ok: bool
+	error: str | None = None
+
+
+def is_gs_url(path: str) -> bool:
+	return str(path).startswith("gs://")
+
+
+def split_gs_url(url: str) -> tuple[str, str]:
+	"""gs://bucket/some/name → ('bucket', 'some/name'); the name may be empty."""
+	if not is_gs_url(url):
+		raise ValueError(f"Not a gs:// URL: [{url}]")
+	bucket, _, name = url[len("gs://"):].partition("/")
+	return bucket, name
+
+
+def _has_wildcard(name: str) -> bool:
+	return bool(_WILDCARD_RE.search(name))
+
+
+def _wildcard_to_regex(pattern: str) -> re.Pattern:
+	"""gcloud wildcard semantics: `**` crosses '/', `*` and `?` do not."""
+	parts = re.split(r"(\*\*|\*|\?)", pattern)
+	regex = "".join(
+		".*" if part == "**" else "[^/]*" if part == "*" else "[^/]" if part == "?" else re.escape(part)
+		for part in parts
+	)
+	return re.compile(rf"^{regex}$")
+
+
+def _basename(path: str) -> str:
+	return path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _join(prefix: str, name: str) -> str:
+	return f"{prefix.rstrip('/')}/{name}" if prefix else name
+
+
+def _completed(command, stdout_lines=(), stderr_lines=()) -> subprocess.CompletedProcess:
+	stdout = "".join(f"{line}\n" for line in stdout_lines)
+	stderr = "".join(f"{line}\n" for line in stderr_lines)
+	return subprocess.CompletedProcess(command, 0, stdout, stderr)
+
+
+def parse_ls_long_line(line: str) -> ObjectRecord | None:
+	"""
+	Parse one `gcloud storage ls --long` line (`<size>  <updated>  gs://...`).
+
+	Returns None for directory headers, prefixes, blank lines and the TOTAL line.
+	"""
+	parts = line.split(None, 2)
+	if len(parts) != 3 or not parts[2].startswith("gs://"):
+		return None
+	size, updated, url = parts[0], parts[1], parts[2].rstrip()
+	if url.endswith("/") or not size.isdigit():
+		return None
+	bucket, name = split_gs_url(url)
+	return ObjectRecord(bucket=bucket, name=name, size=int(size), updated=updated)
+
+
+class CliBackend:
+	"""`gcloud storage` subprocess per call."""
+	name = "cli"
+
+	def run(self, command, input=None, retry=True) -> subprocess.CompletedProcess:
+		"""
+		Run one gcloud command; transient failures are retried only if retry is set.
+
+		Only pass retry=True for commands that can safely be re-run whole (ls,
+		cat, rsync, single-object cp, IAM reads). A multi-object mv/rm/cp that
+		fails part way would otherwise be repeated from the start.
+		"""
+		if not retry:
+			return subprocess.run(command, check=True, capture_output=True, text=True, input=input)
+		# A retried rsync only transfers what the failed attempt had not finished
+		return retry_call(
+			subprocess.run, command, check=True, capture_output=True, text=True, input=input,
+			description=f"`{' '.join(command[:4])}`",
+		)
+
+	def ls(self, url, recursive=False, long=False):
+		command = ["gcloud", "storage", "ls", url]
+		if long:
+			command.insert(3, "--long")
+		if recursive:
+			command.insert(3, "--recursive")
+		return self.run(command)
+
+	def iter_objects(self, url, user_project=None):
+		"""
+		Stream `gcloud storage ls --recursive --long` output, one ObjectRecord per line.
+
+		stdout is parsed as the child process writes it, so memory stays flat
+		however large the bucket is and callers can aggregate while it runs.
+		"""
+		command = ["gcloud", "storage", "ls", "--recursive", "--long", url]
+		if user_project:
+			command[-1:-1] = ["--billing-project", user_project]
+		with tempfile.TemporaryFile("w+") as stderr:
+			process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, text=True, bufsize=1 << 16)
+			try:
+				for line in process.stdout:
+					record = parse_ls_long_line(line)
+					if record is not None:
+						yield record
+				returncode = process.wait()
+			finally:
+				if process.poll() is None:
+					process.kill()
+					process.wait()
+				process.stdout.close()
+			if returncode:
+				stderr.seek(0)
+				raise StorageError(command[1:], stderr.read().strip())
+
+	def read_range(self, url, start, length) -> bytes:
+		if length <= 0:
+			return b""
+		command = ["gcloud", "storage", "cat", f"--range={start}-{start + length - 1}", url]
+		try:
+			return retry_call(
+				subprocess.run, command, check=True, capture_output=True,
+				description=f"`{' '.join(command[:4])}`",
+			).stdout
+		except subprocess.CalledProcessError as e:
+			stderr = (e.stderr or b"").decode(errors="replace").strip()
+			if _RANGE_NOT_SATISFIABLE_RE.search(stderr):
+				# Range starts at or past the end of the object
+				return b""
+			raise StorageError(command[1:], stderr) from e
+
+	def stat(self, url):
+		"""ObjectRecord of a single object, or None if it does not exist."""
+		command = ["gcloud", "storage", "objects", "describe", url, "--format=json"]
+		try:
+			result = self.run(command)
+		except subprocess.CalledProcessError as e:
+			if _OBJECT_NOT_FOUND_RE.search(e.stderr or ""):
+				return None
+			raise StorageError(command[1:], (e.stderr or "").strip()) from e
+		info = json.loads(result.stdout)
+		return ObjectRecord(
+			bucket=info.get("bucket"),
+			name=info.get("name"),
+			size=int(info.get("size") or 0),
+			md5_hash=info.get("md5_hash"),
+			crc32c=info.get("crc32c_hash"),
+			generation=int(info["generation"]) if info.get("generation") else None,
+			updated=info.get("update_time"),
+		)
+
+	def cp(self, source, destination, recursive=False):
+		command = ["gcloud", "storage", "cp", source, destination]
+		if recursive:
+			command.insert(3, "--recursive")
+		# Re-running a single-object copy just overwrites the same destination
+		return self.run(command, retry=not recursive and not _has_wildcard(source))
+
+	def rewrite(self, source, destination, recursive=False):
+		# gcloud storage cp already copies between buckets server-side
+		return self.cp(source, destination, recursive=recursive)
+
+	def cp_many(self, pairs):
+		"""
+		Copy many (source, destination) pairs with as few CLI calls as possible.
+
+		Pairs that keep their basename are grouped by destination prefix and
+		streamed through one `gcloud storage cp -I <prefix>/` per group (the
+		same pattern as the upload_outputs docker script). If a group fails,
+		its pairs are retried one by one so each object gets its own outcome.
+		"""
+		groups = {}
+		singles = []
+		for source, destination in pairs:
+			prefix, _, name = destination.rpartition("/")
+			if name and name == _basename(source):
+				groups.setdefault(prefix + "/", []).append((source, destination))
+			else:
+				singles.append((source, destination))
+		outcomes = []
+		for prefix, group in groups.items():
+			if len(group) == 1:
+				singles.extend(group)
+				continue
+			try:
+				# Not retried as a whole; on failure every pair is retried individually below
+				self.run(["gcloud", "storage", "cp", "-I", prefix], input="".join(f"{src}\n" for src, _dst in group), retry=False)
+				outcomes.extend(CopyOutcome(src, dst, True) for src, dst in group)
+			except subprocess.CalledProcessError as e:
+				logging.warning(f"Batched copy to [{prefix}] failed; copying its {len(group)} objects individually: {e.stderr}")
+				singles.extend(group)
+		for source, destination in singles:
+			try:
+				self.cp(source, destination)
+				outcomes.append(CopyOutcome(source, destination, True))
+			except subprocess.CalledProcessError as e:
+				outcomes.append(CopyOutcome(source, destination, False, (e.stderr or str(e)).strip()))
+		return outcomes
+
+	def mv(self, source, destination):
+		return self.run(["gcloud", "storage", "mv", source, destination], retry=False)
+
+	def rm(self, url):
+		return self.run(["gcloud", "storage", "rm", url], retry=False)
+
+	def rsync(self, source, destination, delete=False, dry_run=False, exclude=None):
+		command = ["gcloud", "storage", "rsync", "-r", source, destination]
+		if delete:
+			command.insert(3, "--delete-unmatched-destination-objects")
+		if dry_run:
+			command.insert(4, "--dry-run")
+		if exclude:
+			command[-2:-2] = ["-x", exclude]
+		return self.run(command)
+
+	def get_iam_policy(self, bucket_url) -> dict:
+		result = self.run(["gcloud", "storage", "buckets", "get-iam-policy", bucket_url, "--format=json"])
+		return json.loads(result.stdout)
+
+	def set_iam_policy(self, bucket_url, policy: dict) -> dict:
+		with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fh:
+			json.dump(policy, fh)
+		command = ["gcloud", "storage", "buckets", "set-iam-policy", bucket_url, fh.name, "--format=json"]
+		try:
+			# Not retried here: a lost response to an applied update would come back as an etag conflict
+			result = self.run(command, retry=False)
+		except subprocess.CalledProcessError as e:
+			stderr = e.stderr or ""
+			if _IAM_CONFLICT_RE.search(stderr):
+				raise IamPolicyConflict(command, stderr) from e
+			raise
+		finally:
+			os.remove(fh.name)
+		return json.loads(result.stdout)
+
+
+class _NativeBackend:
+	"""Implements the gcloud_ops verbs on top of a handful of object primitives.
+
+	Subclasses provide _list / _get / _upload / _download / _read_range / _copy / _delete and
+	the tuples of their native exception types in `_errors` and `_not_found`.
+	"""
+	name = "native"
+	_errors: tuple = (OSError,)
+	_not_found: tuple = (FileNotFoundError,)
+
+	@contextmanager
+	def _translate_errors(self, command):
+		try:
+			yield
+		except StorageError:
+			raise
+		except self._errors as e:
+			raise StorageError(command, str(e)) from e
+
+	# -- listing helpers
+
+	def iter_objects(self, url, user_project=None):
+		"""Yield every object under a gs:// prefix (recursive, no delimiter)."""
+		bucket, prefix = split_gs_url(url)
+		with self._translate_errors(["storage", "ls", "--recursive", url]):
+			yield from self._list(bucket, prefix)[0]
+
+	def read_range(self, url, start, length) -> bytes:
+		"""Up to length bytes of an object from offset start (fewer at the end of the object)."""
+		bucket, name = split_gs_url(url)
+		if length <= 0:
+			return b""
+		with self._translate_errors(["storage", "cat", f"--range={start}-{start + length - 1}", url]):
+			return self._read_range(bucket, name, start, length)
+
+	def stat(self, url):
+		"""ObjectRecord of a single object, or None if it does not exist."""
+		bucket, name = split_gs_url(url)
+		with self._translate_errors(["storage", "objects", "describe", url]):
+			return self._get(bucket, name)
+
+	def _expand(self, url, recursive):
+		"""Resolve a gs:// URL to (records, root) where root is the prefix that
+		relative destination names are computed from.
+
+		Like _list / _get, raises the backend's native errors; only call it
+		inside a verb's _translate_errors block."""
+		bucket, name = split_gs_url(url)
+		if _has_wildcard(name):
+			literal = _WILDCARD_RE.split(name, 1)[0]
+			pattern = _wildcard_to_regex(name)
+			records = [r for r in self._list(bucket, literal)[0] if pattern.match(r.name)]
+			return records, None
+		if name and not name.endswith("/"):
+			record = self._get(bucket, name)
+			if record is not None:
+				return [record], None
+		if not recursive:
+			return [], None
+		directory = name.rstrip("/") + "/" if name else ""
+		return list(self._list(bucket, directory)[0]), directory
+
+	def _destination_is_dir(self, destination):
+		if destination.endswith("/"):
+			return True
+		if is_gs_url(destination):
+			bucket, name = split_gs_url(destination)
+			if not name:
+				return True
+			_records, prefixes = self._list(bucket, name.rstrip("/") + "/", delimiter="/", max_results=1)
+			return bool(_records) or bool(prefixes)
+		return os.path.isdir(destination)
+
+	# -- gcloud_ops verbs
+
+	def ls(self, url, recursive=False, long=False):
+		"""Same listing as `gcloud storage ls`; recursive listings are flat (no per-directory headers)."""
+		command = ["storage", "ls", url]
+		with self._translate_errors(command):
+			bucket, name = split_gs_url(url)
+			prefixes = []
+			if _has_wildcard(name) or recursive:
+				records = self._expand(url, recursive=recursive)[0]
+			else:
+				record = self._get(bucket, name) if name and not name.endswith("/") else None
+				records = [record] if record is not None else []
+				if not records:
+					directory = name.rstrip("/") + "/" if name else ""
+					records, prefixes = self._list(bucket, directory, delimiter="/")
+			if not records and not prefixes:
+				raise StorageError(command, _NO_MATCH_MESSAGE)
+			entries = sorted([(r.url, r) for r in records] + [(f"gs://{bucket}/{p}", None) for p in prefixes], key=lambda e: e[0])
+			if not long:
+				return _completed(command, [entry_url for entry_url, _record in entries])
+			lines = [
+				f"{record.size:>10}  {record.updated or '':<20}  {entry_url}" if record else f"{'':>34}{entry_url}"
+				for entry_url, record in entries
+			]
+			lines.append(f"TOTAL: {len(records)} objects, {sum(r.size for r in records)} bytes")
+			return _completed(command, lines)
+
+	def cp(self, source, destination, recursive=False):
+		command = ["storage", "cp", source, destination]
+		with self._translate_errors(command):
+			pairs = self._plan_copy(source, destination, recursive, command)
+			log = []
+			for src, dst in pairs:
+				self._transfer(src, dst)
+				log.append(f"Copying {src} to {dst}")
+			return _completed(command, stderr_lines=log)
+
+	def rewrite(self, source, destination, recursive=False, max_workers=REWRITE_MAX_WORKERS):
+		"""
+		Server-side bucket-to-bucket copy of `source` (same expansion rules as cp).
+
+		Every object is copied with its own server-side call and up to
+		max_workers of them run at once, so many small objects are not
+		serialized and no object bytes pass through this host.
+		"""
+		command = ["storage", "cp", source, destination]
+		if not (is_gs_url(source) and is_gs_url(destination)):
+			raise ValueError(f"Server-side copies need gs:// source and destination: [{source}] -> [{destination}]")
+		with self._translate_errors(command):
+			pairs = self._plan_copy(source, destination, recursive, command)
+			operation = current_operation()
+
+			def _copy_one(pair):
+				with attach(operation):
+					self._transfer(*pair)
+
+			with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs))), thread_name_prefix="rewrite") as pool:
+				list(pool.map(_copy_one, pairs))
+			return _completed(command, stderr_lines=[f"Copying {src} to {dst}" for src, dst in pairs])
+
+	def cp_many(self, pairs):
+		"""Copy (source, destination) pairs one object at a time in this session."""
+		outcomes = []
+		for source, destination in pairs:
+			try:
+				with self._translate_errors(["storage", "cp", source, destination]):
+					self._transfer(source, destination)
+				outcomes.append(CopyOutcome(source, destination, True))
+			except StorageError as e:
+				outcomes.append(CopyOutcome(source, destination, False, e.stderr))
+		return outcomes
+
+	def mv(self, source, destination):
+		command = ["storage", "mv", source, destination]
+		with self._translate_errors(command):
+			pairs = self._plan_copy(source, destination, True, command)
+			log = []
+			for src, dst in pairs:
+				self._transfer(src, dst)
+				self._remove(src)
+				log.append(f"Moving {src} to {dst}")
+			return _completed(command, stderr_lines=log)
+
+	def rm(self, url):
+		command = ["storage", "rm", url]
+		with self._translate_errors(command):
+			records, _root = self._expand(url, recursive=False)
+			if not records:
+				raise StorageError(command, _NO_MATCH_MESSAGE)
+			for record in records:
+				self._delete_with_retry(record.bucket, record.name)
+			record_transfer(objects=len(records))
+			return _completed(command, stderr_lines=[f"Removing {r.url}" for r in records])
+
+	def rsync(self, source, destination, delete=False, dry_run=False, exclude=None):
+		"""Delta sync through sync_planner: one inventory per side, then only the differing objects."""
+		from sync_planner import execute_plan, plan_sync  # sync_planner builds on this module
+		command = ["storage", "rsync", "-r", source, destination]
+		with self._translate_errors(command):
+			plan = plan_sync(source, destination, delete=delete, exclude=exclude, backend=self)
+			if dry_run:
+				return _completed(command, stderr_lines=plan.describe(dry_run=True))
+			return _completed(command, stderr_lines=execute_plan(plan, backend=self))
+
+	def copy_object(self, src, dst):
+		"""Copy exactly one object/file (no directory or wildcard expansion)."""
+		self._transfer(src, dst)
+
+	def remove_object(self, location):
+		self._remove(location)
+
+	# -- internals shared by the verbs
+
+	def _plan_copy(self, source, destination, recursive, command):
+		"""Return the (source, destination) pairs a cp/mv of `source` expands to."""
+		if not is_gs_url(source):
+			if os.path.isdir(source):
+				if not recursive:
+					raise StorageError(command, f"Omitting directory {source}; use --recursive")
+				root = _join(destination, _basename(source)) if self._destination_is_dir(destination) else destination
+				return [
+					(os.path.join(dirpath, f), _join(root, os.path.relpath(os.path.join(dirpath, f), source).replace(os.sep, "/")))
+					for dirpath, _dirs, files in os.walk(source)
+					for f in sorted(files)
+				]
+			if not os.path.exists(source):
+				raise StorageError(command, _NO_MATCH_MESSAGE)
+			target = _join(destination, _basename(source)) if self._destination_is_dir(destination) else destination
+			return [(source, target)]
+
+		records, root = self._expand(source, recursive)
+		if not records:
+			raise StorageError(command, _NO_MATCH_MESSAGE)
+		if root is None:
+			if len(records) == 1 and not self._destination_is_dir(destination):
+				return [(records[0].url, destination)]
+			return [(r.url, _join(destination, _basename(r.name))) for r in records]
+		target_root = _join(destination, _basename(root)) if self._destination_is_dir(destination) else destination
+		return [(r.url, _join(target_root, r.name[len(root):])) for r in records]
+
+	def _transfer(self, src, dst):
+		# Retried per object, so a transient failure never repeats objects already transferred
+		retry_call(self._transfer_once, src, dst, description=f"copy {src} to {dst}")
+
+	def _transfer_once(self, src, dst):
+		if is_gs_url(src) and is_gs_url(dst):
+			size = self._copy(*split_gs_url(src), *split_gs_url(dst))
+		elif is_gs_url(dst):
+			self._upload(src, *split_gs_url(dst))
+			size = os.path.getsize(src)
+		else:
+			os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+			if is_gs_url(src):
+				self._download(*split_gs_url(src), dst)
+			else:
+				shutil.copyfile(src, dst)
+			size = os.path.getsize(dst)
+		record_transfer(bytes=size, objects=1)
+
+	def _delete_with_retry(self, bucket, name):
+		"""Delete one object, retrying transient failures.
+
+		If an earlier attempt's response was lost, the object may already be
+		gone; NotFound on a retried attempt therefore counts as success.
+		"""
+		attempts = 0
+
+		def _attempt():
+			nonlocal attempts
+			attempts += 1
+			try:
+				self._delete(bucket, name)
+			except self._not_found:
+				if attempts == 1:
+					raise
+				logging.info(f"gs://{bucket}/{name} already removed by an earlier attempt")
+
+		retry_call(_attempt, description=f"remove gs://{bucket}/{name}")
+
+	def _remove(self, location):
+		if is_gs_url(location):
+			self._delete_with_retry(*split_gs_url(location))
+		else:
+			os.remove(location)
+
+
+def file_md5(path: str) -> str:
+	"""Base64 MD5 of a local file, comparable with ObjectRecord.md5_hash."""
+	digest = hashlib.md5()
+	with open(path, "rb") as fh:
+		for chunk in iter(lambda: fh.read(1 << 20), b""):
+			digest.update(chunk)
+	return base64.b64encode(digest.digest()).decode("ascii")
+
+
+class ClientBackend(_NativeBackend):
+	"""In-process JSON API calls through one shared google.cloud.storage.Client."""
+	name = "client"
+
+	def __init__(self, project=None):
+		from google.cloud import storage
+		from google.api_core import exceptions
+		from google.api_core.iam import Policy
+		self._errors = (exceptions.GoogleAPIError, OSError)
+		self._conflicts = (exceptions.PreconditionFailed, exceptions.Conflict)
+		self._range_errors = (exceptions.RequestRangeNotSatisfiable,)
+		self._not_found = (exceptions.NotFound,)
+		self._policy_type = Policy
+		self._project = project
+		self._storage = storage
+		self._client = None
+		self._client_lock = threading.Lock()
+
+	@property
+	def client(self):
+		if self._client is None:
+			with self._client_lock:
+				if self._client is None:
+					self._client = self._storage.Client(project=self._project)
+		return self._client
+
+	@staticmethod
+	def _record(blob) -> ObjectRecord:
+		return ObjectRecord(
+			bucket=blob.bucket.name,
+			name=blob.name,
+			size=blob.size or 0,
+			md5_hash=blob.md5_hash,
+			crc32c=blob.crc32c,
+			generation=blob.generation,
+			updated=blob.updated.isoformat() if blob.updated else None,
+		)
+
+	def _list(self, bucket, prefix, delimiter=None, max_results=None):
+		iterator = self.client.list_blobs(bucket, prefix=prefix or None, delimiter=delimiter, max_results=max_results)
+		records = [self._record(blob) for blob in iterator if not blob.name.endswith("/")]
+		return records, sorted(iterator.prefixes)
+
+	def iter_objects(self, url, user_project=None):
+		# list_blobs pages lazily, so records are yielded while later pages are still unfetched
+		bucket, prefix = split_gs_url(url)
+		# Errors surface while pages are fetched, so the whole loop is translated
+		with self._translate_errors(["storage", "ls", "--recursive", url]):
+			for blob in self.client.list_blobs(self.client.bucket(bucket, user_project=user_project), prefix=prefix or None):
+				if not blob.name.endswith("/"):
+					yield self._record(blob)
+
+	def _get(self, bucket, name):
+		blob = self.client.bucket(bucket).get_blob(name)
+		return self._record(blob) if blob is not None else None
+
+	def _upload(self, path, bucket, name):
+		self.client.bucket(bucket).blob(name).upload_from_filename(path)
+
+	def _download(self, bucket, name, path):
+		self.client.bucket(bucket).blob(name).download_to_filename(path)
+
+	def _read_range(self, bucket, name, start, length):
+		try:
+			return self.client.bucket(bucket).blob(name).download_as_bytes(start=start, end=start + length - 1, checksum=None)
+		except self._range_errors:
+			# Range starts at or past the end of the object
+			return b""
+
+	def _copy(self, src_bucket, src_name, dst_bucket, dst_name):
+		# objects.rewrite copies inside GCS; large or cross-location/storage-class copies
+		# take several calls, each resumed from the previous call's continuation token
+		source = self.client.bucket(src_bucket).blob(src_name)
+		destination = self.client.bucket(dst_bucket).blob(dst_name)
+		token, rewritten, total = destination.rewrite(source)
+		while token is not None:
+			logging.info(f"Rewriting gs://{src_bucket}/{src_name} to gs://{dst_bucket}/{dst_name}: {rewritten}/{total} bytes")
+			token, rewritten, total = destination.rewrite(source, token=token)
+		return total
+
+	def _delete(self, bucket, name):
+		self.client.bucket(bucket).delete_blob(name)
+
+	def get_iam_policy(self, bucket_url) -> dict:
+		command = ["storage", "buckets", "get-iam-policy", bucket_url]
+		with self._translate_errors(command):
+			policy = self.client.bucket(split_gs_url(bucket_url)[0]).get_iam_policy()
+			return policy.to_api_repr()
+
+	def set_iam_policy(self, bucket_url, policy: dict) -> dict:
+		command = ["storage", "buckets", "set-iam-policy", bucket_url]
+		try:
+			with self._translate_errors(command):
+				bucket = self.client.bucket(split_gs_url(bucket_url)[0])
+				return bucket.set_iam_policy(self._policy_type.from_api_repr(policy)).to_api_repr()
+		except StorageError as e:
+			if isinstance(e.__cause__, self._conflicts):
+				raise IamPolicyConflict(command, e.stderr) from e.__cause__
+			raise
+
+
+class LocalBackend(_NativeBackend):
+	"""Filesystem stand-in: gs://<bucket>/<name> lives at <root>/<bucket>/<name>."""
+	name = "local"
+
+	def __init__(self, root):
+		self.root = os.path.abspath(root)
+
+	def _path(self, bucket, name=""):
+		return os.path.join(self.root, bucket, *name.split("/")) if name else os.path.join(self.root, bucket)
+
+	def _record(self, bucket, name) -> ObjectRecord:
+		stat = os.stat(self._path(bucket, name))
+		return ObjectRecord(
+			bucket=bucket,
+			name=name,
+			size=stat.st_size,
+			md5_hash=file_md5(self._path(bucket, name)),
+			generation=stat.st_mtime_ns,
+			updated=datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+		)
+
+	def _list(self, bucket, prefix, delimiter=None, max_results=None):
+		bucket_root = self._path(bucket)
+		if not os.path.isdir(bucket_root):
+			raise StorageError(["storage", "ls", f"gs://{bucket}"], f"Bucket not found: gs://{bucket}")
+		names = []
+		for dirpath, _dirs, files in os.walk(bucket_root):
+			for f in files:
+				name = os.path.relpath(os.path.join(dirpath, f), bucket_root).replace(os.sep, "/")
+				if name.startswith(prefix):
+					names.append(name)
+		names.sort()
+		if delimiter is None:
+			records = [self._record(bucket, n) for n in names]
+			return (records[:max_results] if max_results else records), []
+		records, prefixes = [], set()
+		for name in names:
+			rest = name[len(prefix):]
+			if delimiter in rest:
+				prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+			else:
+				records.append(self._record(bucket, name))
+		return records, sorted(prefixes)
+
+	def _get(self, bucket, name):
+		return self._record(bucket, name) if os.path.isfile(self._path(bucket, name)) else None
+
+	def _upload(self, path, bucket, name):
+		target = self._path(bucket, name)
+		os.makedirs(os.path.dirname(target), exist_ok=True)
+		shutil.copyfile(path, target)
+
+	def _download(self, bucket, name, path):
+		shutil.copyfile(self._path(bucket, name), path)
+
+	def _read_range(self, bucket, name, start, length):
+		with open(self._path(bucket, name), "rb") as fh:
+			fh.seek(start)
+			return fh.read(length)
+
+	def _copy(self, src_bucket, src_name, dst_bucket, dst_name):
+		self._upload(self._path(src_bucket, src_name), dst_bucket, dst_name)
+		return os.path.getsize(self._path(dst_bucket, dst_name))
+
+	def _delete(self, bucket, name):
+		os.remove(self._path(bucket, name))
+
+	def _policy_path(self, bucket_url):
+		return os.path.join(self.root, ".iam", f"{split_gs_url(bucket_url)[0]}.json")
+
+	def get_iam_policy(self, bucket_url) -> dict:
+		path = self._policy_path(bucket_url)
+		if not os.path.exists(path):
+			return {"bindings": [], "etag": "ACAB", "version": 1}
+		with open(path) as fh:
+			return json.load(fh)
+
+	def set_iam_policy(self, bucket_url, policy: dict) -> dict:
+		command = ["storage", "buckets", "set-iam-policy", bucket_url]
+		if policy.get("etag") != self.get_iam_policy(bucket_url).get("etag"):
+			raise IamPolicyConflict(command, "412 Precondition Failed: etag mismatch")
+		stored = {key: value for key, value in policy.items() if key != "etag"}
+		stored["etag"] = base64.b64encode(hashlib.md5(json.dumps(stored, sort_keys=True).encode()).digest()[:8]).decode()
+		os.makedirs(os.path.dirname(self._policy_path(bucket_url)), exist_ok=True)
+		with open(self._policy_path(bucket_url), "w") as fh:
+			json.dump(stored, fh)
+		return stored
+
+
+_BACKENDS = {
+	"cli": CliBackend,
+	"client": ClientBackend,
+	"local": lambda: LocalBackend(os.environ[LOCAL_ROOT_ENV_VAR]),
+}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def make_backend(name: str):
+	if name not in _BACKENDS:
+		raise ValueError(f"Unknown storage backend: [{name}]. Choose from: {', '.join(_BACKENDS)}")
+	if name == "local" and LOCAL_ROOT_ENV_VAR not in os.environ:
+		raise ValueError(f"The local storage backend requires {LOCAL_ROOT_ENV_VAR} to be set")
+	return _BACKENDS[name]()
+
+
+def set_backend(backend):
+	"""Install a backend instance (or backend name) for the rest of the process."""
+	global _backend
+	with _backend_lock:
+		_backend = make_backend(backend) if isinstance(backend, str) else backend
+	logging.info(f"Using [{_backend.name}] storage backend")
+	return _backend
+
+
+def get_backend():
+	"""Return the process-wide backend, creating it on first use.
+
+	Falls back to the CLI backend when google-cloud-storage is not installed."""
+	global _backend
+	if _backend is None:
+		with _backend_lock:
+			if _backend is None:
+				name = os.environ.get(BACKEND_ENV_VAR, "client")
+				try:
+					_backend = make_backend(name)
+				except ImportError:
+					logging.warning("google-cloud-storage is not installed; falling back to the gcloud CLI backend")
+					_backend = CliBackend()
+	return _backend
+
+
+__all__ = [
+    "BACKEND_ENV_VAR", "LOCAL_ROOT_ENV_VAR", "REWRITE_MAX_WORKERS", "StorageError",
+    "IamPolicyConflict", "ObjectRecord", "CopyOutcome",
+    "is_gs_url", "split_gs_url", "file_md5", "parse_ls_long_line", "CliBackend", "ClientBackend", "LocalBackend",
+    "make_backend", "set_backend", "get_backend",
+]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Lightweight per-call instrumentation for the gcloud_ops storage helpers.
+
+Every wrapped call records its operation, bucket, wall time, bytes moved,
+object count, exit status and retry count. Tracing is off unless enabled with
+`enable_tracing()` (or the WF_COMMON_TRACE environment variable); records are
+then written as JSON lines as they complete, or as a Chrome trace file
+(chrome://tracing, Perfetto) when the path ends in `.json`. A summary table
+grouped by operation and bucket is logged at exit.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+
+TRACE_ENV_VAR = "WF_COMMON_TRACE"
+
+
+@dataclass
+class OperationRecord:
+	op: str
+	bucket: str | None
+	target: str | None
+	start: float
+	wall_time: float = 0.0
+	bytes: int | None = None
+	objects: int | None = None
+	status: str = "ok"
+	exit_code: int = 0
+	retries: int = 0
+	thread: str = field(default_factory=lambda: threading.current_thread().name)
+
+
+class _Tracer:
+	def __init__(self):
+		self.enabled = False
+		self.path = None
+		self.format = "jsonl"
+		self.records = []
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		self._summary_registered = False
+
+	def stack(self):
+		if not hasattr(self._local, "stack"):
+			self._local.stack = []
+		return self._local.stack
+
+	def finish(self, record):
+		with self._lock:
+			self.records.append(record)
+			if self.path and self.format == "jsonl":
+				with open(self.path, "a") as fh:
+					fh.write(json.dumps(asdict(record)) + "\n")
+
+
+_tracer = _Tracer()
+
+
+def enable_tracing(path=None, fmt=None):
+	"""
+	Start recording storage operations for the rest of the process.
+
+	path: optional output file; JSON lines by default, Chrome trace if it ends
+	      in `.json` or fmt="chrome". The summary table is logged at exit either way.
+	"""
+	_tracer.enabled = True
+	_tracer.path = path
+	_tracer.format = fmt or ("chrome" if path and path.endswith(".json") else "jsonl")
+	if path and _tracer.format == "jsonl":
+		open(path, "w").close()
+	if not _tracer._summary_registered:
+		atexit.register(_finalize)
+		_tracer._summary_registered = True
+	logging.info(f"Tracing storage operations{f' to [{path}]' if path else ''}")
+
+
+def current_operation():
+	"""The innermost operation being traced on this thread, or None."""
+	stack = _tracer.stack() if _tracer.enabled else None
+	return stack[-1] if stack else None
+
+
+@contextmanager
+def attach(record):
+	"""Attribute work done on this thread (e.g. a pool worker) to `record`."""
+	if record is None:
+		yield
+		return
+	stack = _tracer.stack()
+	stack.append(record)
+	try:
+		yield
+	finally:
+		stack.pop()
+
+
+def record_transfer(bytes=None, objects=None):
+	"""Attribute bytes/objects to the operation currently running on this thread."""
+	record = current_operation()
+	if record is None:
+		return
+	with _tracer._lock:
+		if bytes is not None:
+			record.bytes = (record.bytes or 0) + bytes
+		if objects is not None:
+			record.objects = (record.objects or 0) + objects
+
+
+def record_retry():
+	record = current_operation()
+	if record is not None:
+		with _tracer._lock:
+			record.retries += 1
+
+
+def _first_url(args, kwargs):
+	for value in list(args) + list(kwargs.values()):
+		if isinstance(value, str) and value.startswith("gs://"):
+			return value
+		if isinstance(value, (list, tuple)) and value:
+			found = _first_url(value, {})
+			if found:
+				return found
+	return None
+
+
+def traced(op):
+	"""Decorator recording one OperationRecord per call while tracing is enabled."""
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if not _tracer.enabled:
+				return func(*args, **kwargs)
+			target = _first_url(args, kwargs)
+			bucket = target[len("gs://"):].split("/", 1)[0] if target else None
+			record = OperationRecord(op=op, bucket=bucket, target=target, start=time.time())
+			stack = _tracer.stack()
+			stack.append(record)
+			started = time.perf_counter()
+			try:
+				return func(*args, **kwargs)
+			except subprocess.CalledProcessError as e:
+				record.status, record.exit_code = "error", e.returncode
+				raise
+			except Exception:
+				record.status, record.exit_code = "error", 1
+				raise
+			finally:
+				record.wall_time = time.perf_counter() - started
+				stack.pop()
+				_tracer.finish(record)
+		return wrapper
+	return decorator
+
+
+def summary_rows():
+	"""Aggregate records by (op, bucket), slowest total wall time first."""
+	groups = {}
+	with _tracer._lock:
+		records = list(_tracer.records)
+	for record in records:
+		row = groups.setdefault((record.op, record.bucket or "-"), {
+			"op": record.op, "bucket": record.bucket or "-", "calls": 0, "total_s": 0.0,
+			"max_s": 0.0, "bytes": 0, "objects": 0, "errors": 0, "retries": 0,
+		})
+		row["calls"] += 1
+		row["total_s"] += record.wall_time
+		row["max_s"] = max(row["max_s"], record.wall_time)
+		row["bytes"] += record.bytes or 0
+		row["objects"] += record.objects or 0
+		row["errors"] += record.status != "ok"
+		row["retries"] += record.retries
+	return sorted(groups.values(), key=lambda row: row["total_s"], reverse=True)
+
+
+def format_summary(rows):
+	header = f"{'operation':<20} {'bucket':<50} {'calls':>6} {'total_s':>9} {'max_s':>8} {'bytes':>14} {'objects':>8} {'errors':>6} {'retries':>7}"
+	lines = [header, "-" * len(header)]
+	for row in rows:
+		lines.append(
+			f"{row['op']:<20} {row['bucket']:<50} {row['calls']:>6} {row['total_s']:>9.2f} {row['max_s']:>8.2f} "
+			f"{row['bytes']:>14} {row['objects']:>8} {row['errors']:>6} {row['retries']:>7}"
+		)
+	return "\n".join(lines)
+
+
+def write_chrome_trace(path):
+	with _tracer._lock:
+		records = list(_tracer.records)
+	threads = {name: i for i, name in enumerate(sorted({r.thread for r in records}))}
+	events = [
+		{
+			"name": record.op,
+			"cat": record.bucket or "",
+			"ph": "X",
+			"ts": record.start * 1e6,
+			"dur": record.wall_time * 1e6,
+			"pid": os.getpid(),
+			"tid": threads[record.thread],
+			"args": {k: v for k, v in asdict(record).items() if k not in ("op", "start", "wall_time", "thread")},
+		}
+		for record in records
+	]
+	with open(path, "w") as fh:
+		json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+
+
+def _finalize():
+	if not _tracer.records:
+		return
+	if _tracer.path and _tracer.format == "chrome":
+		write_chrome_trace(_tracer.path)
+	logging.info("Storage operation summary:\n" + format_summary(summary_rows()))
+
+
+if os.environ.get(TRACE_ENV_VAR):
+	enable_tracing(os.environ[TRACE_ENV_VAR])
+
+
+__all__ = [
+    "TRACE_ENV_VAR", "OperationRecord", "enable_tracing", "current_operation", "attach",
+    "record_transfer", "record_retry", "traced", "summary_rows", "format_summary",
+    "write_chrome_trace",
+]
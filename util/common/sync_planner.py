@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Delta-sync planner used by the in-process storage backends for rsync.
+
+`plan_sync()` lists the source and the destination once each (in parallel)
+into inventories of (name, size, crc32c/md5, generation), and compares them
+into a SyncPlan: which objects must be copied (missing or changed at the
+destination), which destination objects must be deleted, and how many are
+already in sync or excluded. A dry run is just the plan, so it is instant and
+exactly what a real run would do; `execute_plan()` then runs the copies (and
+afterwards the deletes) in parallel, server-side for bucket-to-bucket syncs.
+
+Exclude patterns follow `gcloud storage rsync -x`: a Python regex matched
+against the start of each path relative to the sync root, applied to both
+sides (excluded destination objects are never deleted).
+"""
+
+import base64
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from storage_backends import (
+	StorageError,
+	file_md5,
+	get_backend,
+	is_gs_url,
+	split_gs_url,
+)
+from storage_trace import attach, current_operation
+
+
+SYNC_MAX_WORKERS = 16
+
+
+@dataclass(frozen=True)
+class InventoryEntry:
+	"""One object (or local file) under a sync root."""
+	name: str  # path relative to the sync root
+	location: str  # gs:// URL or local path
+	size: int
+	md5_hash: str | None = None
+	crc32c: str | None = None
+	generation: int | None = None
+
+
+@dataclass(frozen=True)
+class SyncAction:
+	kind: str  # "copy" or "delete"
+	name: str
+	source: str | None
+	destination: str
+	size: int = 0
+	reason: str = ""  # for copies: "missing" or "changed"
+
+
+@dataclass
+class SyncPlan:
+	source: str
+	destination: str
+	delete: bool
+	copies: list[SyncAction] = field(default_factory=list)
+	deletes: list[SyncAction] = field(default_factory=list)
+	unchanged: int = 0
+	excluded: int = 0
+
+	@property
+	def bytes_to_copy(self) -> int:
+		return sum(action.size for action in self.copies)
+
+	@property
+	def is_noop(self) -> bool:
+		return not self.copies and not self.deletes
+
+	def describe(self, dry_run=False) -> list[str]:
+		"""gcloud-style per-object lines for this plan."""
+		copy_verb, delete_verb = ("Would copy", "Would remove") if dry_run else ("Copying", "Removing")
+		return (
+			[f"{copy_verb} {action.source} to {action.destination}" for action in self.copies]
+			+ [f"{delete_verb} {action.destination}" for action in self.deletes]
+		)
+
+	def summary(self) -> str:
+		return (
+			f"{self.source} -> {self.destination}: {len(self.copies)} to copy ({self.bytes_to_copy} bytes), "
+			f"{len(self.deletes)} to delete, {self.unchanged} unchanged, {self.excluded} excluded"
+		)
+
+
+def _root_prefix(url):
+	bucket, name = split_gs_url(url)
+	return bucket, name.rstrip("/") + "/" if name else ""
+
+
+def build_inventory(root, backend=None) -> dict[str, InventoryEntry]:
+	"""Map each path relative to root (a gs:// prefix or local directory) to its InventoryEntry."""
+	if is_gs_url(root):
+		backend = backend or get_backend()
+		bucket, prefix = _root_prefix(root)
+		return {
+			record.name[len(prefix):]: InventoryEntry(
+				name=record.name[len(prefix):],
+				location=record.url,
+				size=record.size,
+				md5_hash=record.md5_hash,
+				crc32c=record.crc32c,
+				generation=record.generation,
+			)
+			for record in backend.iter_objects(f"gs://{bucket}/{prefix}")
+		}
+	inventory = {}
+	for dirpath, _dirs, files in os.walk(root):
+		for f in files:
+			path = os.path.join(dirpath, f)
+			name = os.path.relpath(path, root).replace(os.sep, "/")
+			# Local hashes are only computed when a size match needs confirming
+			inventory[name] = InventoryEntry(name=name, location=path, size=os.path.getsize(path))
+	return inventory
+
+
+def _local_crc32c(path):
+	try:
+		import google_crc32c
+	except ImportError:
+		return None
+	checksum = google_crc32c.Checksum()
+	with open(path, "rb") as fh:
+		for chunk in iter(lambda: fh.read(1 << 20), b""):
+			checksum.update(chunk)
+	return base64.b64encode(checksum.digest()).decode("ascii")
+
+
+def _with_hashes(entry, wanted):
+	"""Fill in the local-file checksum needed to compare against `wanted` (md5 unless it only has crc32c)."""
+	if is_gs_url(entry.location) or entry.md5_hash or entry.crc32c:
+		return entry
+	if wanted.crc32c and not wanted.md5_hash:
+		return InventoryEntry(entry.name, entry.location, entry.size, crc32c=_local_crc32c(entry.location))
+	return InventoryEntry(entry.name, entry.location, entry.size, md5_hash=file_md5(entry.location))
+
+
+def same_content(source: InventoryEntry, destination: InventoryEntry) -> bool:
+	"""Size, then crc32c or md5 (whichever both sides have). Unknown hashes count as different."""
+	if source.size != destination.size:
+		return False
+	source = _with_hashes(source, destination)
+	destination = _with_hashes(destination, source)
+	if source.crc32c and destination.crc32c:
+		return source.crc32c == destination.crc32c
+	if source.md5_hash and destination.md5_hash:
+		return source.md5_hash == destination.md5_hash
+	return False
+
+
+def _join(root, name):
+	return f"{root.rstrip('/')}/{name}" if is_gs_url(root) else os.path.join(root, *name.split("/"))
+
+
+def plan_sync(source, destination, delete=False, exclude=None, backend=None) -> SyncPlan:
+	"""
+	Compare source and destination inventories into a SyncPlan.
+
+	Raises StorageError if the source matches nothing, rather than planning
+	to delete the whole destination.
+	"""
+	backend = backend or get_backend()
+	excluded = re.compile(exclude) if exclude else None
+	with ThreadPoolExecutor(max_workers=2) as pool:
+		source_future = pool.submit(build_inventory, source, backend)
+		destination_future = pool.submit(build_inventory, destination, backend)
+		source_files, destination_files = source_future.result(), destination_future.result()
+	if not source_files:
+		raise StorageError(["storage", "rsync", source, destination], "One or more URLs matched no objects.")
+
+	plan = SyncPlan(source=source, destination=destination, delete=delete)
+	for name, entry in sorted(source_files.items()):
+		if excluded and excluded.match(name):
+			plan.excluded += 1
+			continue
+		existing = destination_files.get(name)
+		if existing is not None and same_content(entry, existing):
+			plan.unchanged += 1
+			continue
+		plan.copies.append(SyncAction(
+			"copy", name, entry.location, _join(destination, name), entry.size,
+			"missing" if existing is None else "changed",
+		))
+	if delete:
+		for name, entry in sorted(destination_files.items()):
+			if name in source_files or (excluded and excluded.match(name)):
+				continue
+			plan.deletes.append(SyncAction("delete", name, None, entry.location, entry.size))
+	return plan
+
+
+def execute_plan(plan: SyncPlan, backend=None, max_workers=SYNC_MAX_WORKERS) -> list[str]:
+	"""
+	Run the plan's copies, then its deletes, each with up to max_workers in flight.
+
+	Every action is attempted; if any failed, raises StorageError listing them.
+	Returns the gcloud-style log lines of the actions that completed.
+	"""
+	backend = backend or get_backend()
+	logging.info(f"Sync plan {plan.summary()}")
+	operation = current_operation()
+
+	def _run(action):
+		with attach(operation):
+			if action.kind == "copy":
+				backend.copy_object(action.source, action.destination)
+				return f"Copying {action.source} to {action.destination}"
+			backend.remove_object(action.destination)
+			return f"Removing {action.destination}"
+
+	log, failures = [], []
+	for actions in (plan.copies, plan.deletes):
+		if not actions:
+			continue
+		with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync") as pool:
+			futures = [(action, pool.submit(_run, action)) for action in actions]
+			for action, future in futures:
+				try:
+					log.append(future.result())
+				except Exception as e:
+					failures.append(f"{action.kind} {action.destination}: {e}")
+		if failures:
+			# Never delete while copies are incomplete
+			break
+	if failures:
+		raise StorageError(
+			["storage", "rsync", plan.source, plan.destination],
+			f"{len(failures)} sync actions failed:\n" + "\n".join(failures)
+		)
+	return log
+
+
+__all__ = [
+    "SYNC_MAX_WORKERS", "InventoryEntry", "SyncAction", "SyncPlan", "build_inventory",
+    "same_content", "plan_sync", "execute_plan",
+]
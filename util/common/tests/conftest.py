@@ -0,0 +1,38 @@
+"""Shared fixtures; puts util/common on sys.path the same way the scripts do."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import storage_backends
+from listing_cache import listing_cache
+
+
+@pytest.fixture
+def local_root(tmp_path, monkeypatch):
+	"""Install a LocalBackend rooted at a temporary directory for one test.
+
+	gs://<bucket>/<name> lives at <root>/<bucket>/<name>; create the bucket
+	directories the test needs."""
+	root = tmp_path / "buckets"
+	root.mkdir()
+	monkeypatch.setenv(storage_backends.BACKEND_ENV_VAR, "local")
+	monkeypatch.setenv(storage_backends.LOCAL_ROOT_ENV_VAR, str(root))
+	previous = storage_backends._backend
+	storage_backends.set_backend(storage_backends.LocalBackend(str(root)))
+	listing_cache.clear()
+	yield root
+	listing_cache.clear()
+	storage_backends._backend = previous
+
+
+def write_object(root, url, data=b""):
+	"""Create gs://<bucket>/<name> under a local_root with the given bytes."""
+	bucket, name = url[len("gs://"):].split("/", 1)
+	path = root / bucket / name
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(data.encode() if isinstance(data, str) else data)
+	return path
@@ -0,0 +1,105 @@
+import pandas as pd
+
+from conftest import write_object
+from data_integrity import (
+	BlobInventory, ManifestFilenameIndex, ReleaseDiff, associated_metadata_check, checksum_check,
+	release_prefix, verify_manifest_checksums,
+)
+from gcloud_ops import iter_objects
+from storage_backends import ObjectRecord
+
+
+WORKFLOW, VERSION = "pmdbs_sc_rnaseq", "v1.0.0"
+PREFIX = release_prefix(WORKFLOW, VERSION)
+
+
+def _inventory(bucket_name, records):
+	return BlobInventory(None, VERSION, WORKFLOW, records, bucket_name=bucket_name)
+
+
+def _listed(bucket_name):
+	return _inventory(bucket_name, list(iter_objects(f"gs://{bucket_name}/{PREFIX}")))
+
+
+def test_release_diff_against_local_buckets(local_root):
+	for name, data in {"same.txt": "same", "changed.txt": "new", "added.txt": "added"}.items():
+		write_object(local_root, f"gs://uat/{PREFIX}{name}", data)
+	for name, data in {"same.txt": "same", "changed.txt": "old", "removed.txt": "removed"}.items():
+		write_object(local_root, f"gs://curated/{PREFIX}{name}", data)
+
+	diff = ReleaseDiff.compute(_listed("uat"), _listed("curated"))
+	assert diff.added == [f"{PREFIX}added.txt"]
+	assert diff.removed == [f"{PREFIX}removed.txt"]
+	assert list(diff.modified) == [f"{PREFIX}changed.txt"]
+	assert diff.unchanged == [f"{PREFIX}same.txt"]
+	assert diff.added_urls == [f"gs://uat/{PREFIX}added.txt"]
+	assert diff.removed_urls == [f"gs://uat/{PREFIX}removed.txt"]
+
+
+def test_release_diff_uses_strongest_shared_checksum():
+	staging = _inventory("uat", [
+		ObjectRecord("uat", "md5-differs", 4, md5_hash="a", crc32c="c"),
+		ObjectRecord("uat", "composite-same", 4, crc32c="c"),
+		ObjectRecord("uat", "composite-vs-md5", 4, crc32c="c"),
+		ObjectRecord("uat", "size-only", 5),
+	])
+	curated = _inventory("curated", [
+		ObjectRecord("curated", "md5-differs", 4, md5_hash="b", crc32c="c"),
+		ObjectRecord("curated", "composite-same", 4, md5_hash="x", crc32c="c"),
+		ObjectRecord("curated", "composite-vs-md5", 4, md5_hash="x", crc32c="d"),
+		ObjectRecord("curated", "size-only", 4),
+	])
+	diff = ReleaseDiff.compute(staging, curated)
+	assert diff.modified == {"md5-differs": "a", "composite-vs-md5": "c", "size-only": None}
+	assert diff.unchanged == ["composite-same"]
+
+
+def test_release_diff_with_prefixes_compares_relative_names():
+	v1 = _inventory("curated", [ObjectRecord("curated", "wf/release/v1/a.txt", 1, md5_hash="a")])
+	v2 = _inventory("curated", [ObjectRecord("curated", "wf/release/v2/a.txt", 1, md5_hash="a")])
+	diff = ReleaseDiff.compute(v2, v1, staging_prefix="wf/release/v2/", curated_prefix="wf/release/v1/")
+	assert diff.unchanged == ["a.txt"]
+	assert not diff.added and not diff.removed
+
+
+def test_verify_manifest_checksums_statuses():
+	inventory = _inventory("uat", [
+		ObjectRecord("uat", f"{PREFIX}match.h5", 10, md5_hash="m1"),
+		ObjectRecord("uat", f"{PREFIX}old-row-too.h5", 10, md5_hash="new"),
+		ObjectRecord("uat", f"{PREFIX}mismatch.h5", 10, md5_hash="m2"),
+		ObjectRecord("uat", f"{PREFIX}no-hash.h5", 10, md5_hash="m3"),
+		ObjectRecord("uat", f"{PREFIX}composite.h5", 10, crc32c="c"),
+		ObjectRecord("uat", f"{PREFIX}deep-verified.h5", 10, crc32c="c"),
+		ObjectRecord("uat", f"{PREFIX}unlisted.h5", 10, md5_hash="m4"),
+	])
+	manifest = pd.DataFrame({
+		"filename": ["match.h5", "old-row-too.h5", "old-row-too.h5", "mismatch.h5", "no-hash.h5", "composite.h5", "deep-verified.h5"],
+		"md5_hash": ["m1", "old", "new", "other", None, "x", "dv"],
+	})
+	checks = verify_manifest_checksums(manifest, inventory, computed_md5={f"{PREFIX}deep-verified.h5": "dv"})
+	statuses = dict(zip(checks["name"].str.rsplit("/", n=1).str[-1], checks["status"]))
+	assert statuses == {
+		"match.h5": "match",
+		"old-row-too.h5": "match",
+		"mismatch.h5": "mismatch",
+		"no-hash.h5": "missing_manifest_hash",
+		"composite.h5": "composite_object",
+		"deep-verified.h5": "match",
+		"unlisted.h5": "not_in_manifest",
+	}
+	cells = checksum_check(checks, "OK", "X")
+	assert cells[f"{PREFIX}mismatch.h5"] == "X"
+	assert cells[f"{PREFIX}composite.h5"] == "N/A (composite_object)"
+
+
+def test_manifest_filename_index_matches_substring_scan():
+	filenames = ["sample_1.bam", "sample_10.bam", "run.h5ad", None, "ab", "sample_1.bam"]
+	index = ManifestFilenameIndex(filenames)
+	for name in ["sample_1.bam", "sample_1", "ample_10", "h5ad", "b", "ab", "missing.bam", "zzz", "bam.h5"]:
+		assert index.contains(name) == any(name in f for f in filenames if isinstance(f, str)), name
+
+
+def test_associated_metadata_check():
+	manifest = pd.DataFrame({"filename": ["a.bam"]})
+	cells = associated_metadata_check(manifest, [f"{PREFIX}a.bam", f"{PREFIX}b.bam", f"{PREFIX}MANIFEST.tsv"], "OK", "X")
+	assert cells == {f"{PREFIX}a.bam": "OK", f"{PREFIX}b.bam": "X", f"{PREFIX}MANIFEST.tsv": "N/A"}
@@ -0,0 +1,97 @@
+import base64
+import dataclasses
+import hashlib
+import sqlite3
+
+import pytest
+
+import deep_verify as deep_verify_module
+from deep_verify import HashCache, deep_verify, hash_object
+from storage_backends import ObjectRecord
+
+
+class _FakeBlob:
+	def __init__(self, data, reads):
+		self.data = data
+		self.reads = reads
+
+	def download_as_bytes(self, start, end, checksum=None):
+		self.reads.append((start, end))
+		return self.data[start:end + 1]
+
+
+class _FakeBucket:
+	"""Serves ranged reads of in-memory objects the way google.cloud.storage blobs do."""
+
+	def __init__(self, objects):
+		self.objects = objects
+		self.reads = []
+
+	def blob(self, name, generation=None):
+		return _FakeBlob(self.objects[name], self.reads)
+
+
+class _FakeInventory:
+	def __init__(self, objects, md5s=None):
+		self.bucket_name = "uat"
+		self.bucket = _FakeBucket(objects)
+		self.records = [
+			ObjectRecord("uat", name, len(data), md5_hash=(md5s or {}).get(name), generation=1)
+			for name, data in objects.items()
+		]
+
+	def url(self, name):
+		return f"gs://{self.bucket_name}/{name}"
+
+
+def _md5(data):
+	return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+
+def test_hash_object_reads_in_ranges_and_matches_md5():
+	data = bytes(range(256)) * 41
+	bucket = _FakeBucket({"a.bin": data})
+	record = ObjectRecord("uat", "a.bin", len(data), generation=1)
+	md5, _crc32c = hash_object("gs://uat/a.bin", bucket, record, chunk_size=1000, range_workers=3)
+	assert md5 == _md5(data)
+	assert sorted(bucket.reads)[0] == (0, 999)
+	assert sorted(bucket.reads)[-1] == (10000, len(data) - 1)
+
+
+def test_deep_verify_hashes_only_missing_md5_and_caches(tmp_path):
+	objects = {"composite.bin": b"x" * 5000, "plain.txt": b"plain"}
+	inventory = _FakeInventory(objects, md5s={"plain.txt": _md5(b"plain")})
+	cache_path = str(tmp_path / "hashes.sqlite")
+
+	assert deep_verify(inventory, HashCache(cache_path), chunk_size=1024) == {"composite.bin": _md5(objects["composite.bin"])}
+
+	inventory.bucket.reads.clear()
+	with HashCache(cache_path) as cache:
+		assert deep_verify(inventory, cache, chunk_size=1024) == {"composite.bin": _md5(objects["composite.bin"])}
+	assert inventory.bucket.reads == []
+
+
+def test_deep_verify_closes_its_own_cache_when_hashing_fails(tmp_path, monkeypatch):
+	cache_path = str(tmp_path / "hashes.sqlite")
+	monkeypatch.setenv(deep_verify_module.DEEP_VERIFY_CACHE_ENV_VAR, cache_path)
+	opened = []
+	monkeypatch.setattr(deep_verify_module, "HashCache", lambda: opened.append(HashCache()) or opened[-1])
+	inventory = _FakeInventory({"good.bin": b"good", "bad.bin": b"bad"})
+	inventory.records[1] = dataclasses.replace(inventory.records[1], crc32c="not-the-crc")
+	monkeypatch.setattr(deep_verify_module, "hash_object", lambda url, bucket, record, *args: (_md5(b""), "computed-crc"))
+
+	with pytest.raises(IOError):
+		deep_verify(inventory)
+	assert opened[0]._db is None
+	# The database is neither locked nor holding uncommitted rows
+	with sqlite3.connect(cache_path, timeout=0) as db:
+		db.execute("INSERT INTO hashes VALUES ('uat', 'other', 1, 0, '', '')")
+
+
+def test_hash_cache_close_is_idempotent(tmp_path):
+	cache = HashCache(str(tmp_path / "hashes.sqlite"))
+	cache.put("uat", "a", 1, 1, "md5", "crc")
+	cache.close()
+	cache.close()
+	with HashCache(str(tmp_path / "hashes.sqlite")) as reopened:
+		assert reopened.get("uat", "a", 1) == ("md5", "crc")
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import file_utils
+from conftest import write_object
+from file_utils import check_csv_rows, csv_profile, detect_csv_delimiter, read_head_lines
+
+
+def _rows(count, delimiter=","):
+	return "".join(f"s{i}{delimiter}{i}{delimiter}x\n" for i in range(count))
+
+
+def test_read_head_lines_stops_after_enough_lines(tmp_path, monkeypatch):
+	path = tmp_path / "big.csv"
+	path.write_text("sample_id,n,tag\n" + _rows(100000))
+	read = []
+	original = file_utils._iter_head_chunks
+
+	def counting_chunks(*args, **kwargs):
+		for chunk in original(*args, **kwargs):
+			read.append(len(chunk))
+			yield chunk
+
+	monkeypatch.setattr(file_utils, "_iter_head_chunks", counting_chunks)
+
+	lines, encoding = read_head_lines(path, 5)
+	assert lines == ["sample_id,n,tag", "s0,0,x", "s1,1,x", "s2,2,x", "s3,3,x"]
+	assert encoding == "utf-8-sig"
+	assert len(read) == 1
+
+
+def test_read_head_lines_drops_partial_line_at_byte_budget(tmp_path):
+	path = tmp_path / "long.csv"
+	path.write_text("a,b\n" + "1,22222\n" * 10)
+	lines, _encoding = read_head_lines(path, 50, byte_budget=14)
+	assert lines == ["a,b", "1,22222"]
+
+
+def test_read_head_lines_keeps_last_line_without_newline(tmp_path):
+	path = tmp_path / "short.csv"
+	path.write_bytes(b"a;b\r\n1;2\r\n\r\n3;4")
+	assert read_head_lines(path, 50)[0] == ["a;b", "1;2", "3;4"]
+
+
+def test_read_head_lines_from_gs_matches_local(local_root, tmp_path):
+	text = "sample_id\tn\ttag\n" + _rows(20000, "\t")
+	local = tmp_path / "local.tsv"
+	local.write_text(text)
+	write_object(local_root, "gs://raw/metadata/SAMPLE.tsv", text)
+	assert read_head_lines("gs://raw/metadata/SAMPLE.tsv", 50) == read_head_lines(local, 50)
+
+
+def test_read_head_lines_missing_object_raises(local_root):
+	(local_root / "raw").mkdir()
+	with pytest.raises(FileNotFoundError):
+		read_head_lines("gs://raw/missing.csv")
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t", "|"])
+def test_detect_csv_delimiter(tmp_path, delimiter):
+	path = tmp_path / "table.csv"
+	path.write_text(delimiter.join(["sample_id", "n", "tag"]) + "\n" + _rows(10, delimiter))
+	assert detect_csv_delimiter(path) == delimiter
+
+
+def test_detect_csv_delimiter_defaults_to_comma(tmp_path):
+	assert detect_csv_delimiter(tmp_path / "missing.csv") == ","
+	(tmp_path / "empty.csv").write_text("")
+	assert detect_csv_delimiter(tmp_path / "empty.csv") == ","
+
+
+def test_csv_profile_reads_header_counts_and_columns(tmp_path):
+	path = tmp_path / "SAMPLE.csv"
+	path.write_text("sample_id;Source\ns1;brain\n\ns2\n")
+	profile = csv_profile(path)
+	assert profile.delimiter == ";"
+	assert profile.header == ["sample_id", "Source"]
+	assert profile.row_count == 4
+	assert profile.values("SOURCE") == ["brain", None]
+	assert profile.value_set("sample_id") == {"s1", "s2"}
+	assert profile.values("missing") is None
+	assert check_csv_rows(path)["row_count"] == 4
+
+
+def test_csv_profile_decodes_cp1252_like_the_detector(tmp_path):
+	path = tmp_path / "STUDY.csv"
+	raw = "title,pi\n“Smart” quotes,José\n".encode("cp1252")
+	path.write_bytes(raw)
+	profile = csv_profile(path)
+	assert profile.encoding == read_head_lines(path)[1] == "cp1252"
+	assert profile.values("title") == ["“Smart” quotes"]
+
+
+def test_csv_profile_is_reparsed_after_the_file_changes(tmp_path):
+	path = tmp_path / "DATA.csv"
+	path.write_text("sample_id\ns1\n")
+	first = csv_profile(path)
+	assert csv_profile(path) is first
+	path.write_text("sample_id\ns1\ns2\n")
+	os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+	assert csv_profile(path).values("sample_id") == ["s1", "s2"]
@@ -0,0 +1,97 @@
+import subprocess
+
+import pytest
+
+import gcloud_ops
+import storage_backends
+from gcloud_ops import add_iam_binding, has_iam_binding, remove_iam_binding, update_bucket_iam_policy
+from storage_backends import CliBackend, IamPolicyConflict, get_backend
+
+
+VIEWER, ADMIN = "roles/storage.objectViewer", "roles/storage.admin"
+MEMBER = "group:team-a@example.org"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+	monkeypatch.setattr(gcloud_ops.time, "sleep", lambda seconds: None)
+
+
+def test_binding_helpers():
+	policy = {"bindings": [{"role": ADMIN, "members": [MEMBER]}]}
+	assert not add_iam_binding(policy, ADMIN, MEMBER)
+	assert add_iam_binding(policy, VIEWER, MEMBER)
+	assert remove_iam_binding(policy, ADMIN, MEMBER)
+	assert policy["bindings"] == [{"role": VIEWER, "members": [MEMBER]}]
+	assert not has_iam_binding(policy, ADMIN, MEMBER)
+
+
+def test_update_applies_all_edits_in_one_write(local_root, monkeypatch):
+	writes = []
+	backend = get_backend()
+	original = backend.set_iam_policy
+
+	def counting_set(url, policy):
+		writes.append(url)
+		return original(url, policy)
+
+	monkeypatch.setattr(backend, "set_iam_policy", counting_set)
+
+	def edit(policy):
+		add_iam_binding(policy, ADMIN, MEMBER)
+		return add_iam_binding(policy, VIEWER, MEMBER)
+
+	_policy, changed = update_bucket_iam_policy("gs://bucket", edit)
+	assert changed and writes == ["gs://bucket"]
+	stored = backend.get_iam_policy("gs://bucket")
+	assert has_iam_binding(stored, ADMIN, MEMBER) and has_iam_binding(stored, VIEWER, MEMBER)
+	assert update_bucket_iam_policy("gs://bucket", lambda policy: add_iam_binding(policy, VIEWER, MEMBER)) == (stored, False)
+	assert writes == ["gs://bucket"]
+
+
+def test_update_retries_on_concurrent_change(local_root):
+	backend = get_backend()
+	attempts = []
+
+	def edit(policy):
+		attempts.append(1)
+		if len(attempts) == 1:
+			# Another writer changes the policy between our read and write
+			concurrent = backend.get_iam_policy("gs://bucket")
+			add_iam_binding(concurrent, ADMIN, "group:other@example.org")
+			backend.set_iam_policy("gs://bucket", concurrent)
+		return add_iam_binding(policy, VIEWER, MEMBER)
+
+	policy, changed = update_bucket_iam_policy("gs://bucket", edit)
+	assert changed and len(attempts) == 2
+	assert has_iam_binding(policy, ADMIN, "group:other@example.org")
+	assert has_iam_binding(policy, VIEWER, MEMBER)
+
+
+def test_update_gives_up_after_max_attempts(local_root, monkeypatch):
+	backend = get_backend()
+
+	def always_conflict(url, policy):
+		raise IamPolicyConflict(["storage", "buckets", "set-iam-policy", url], "412 Precondition Failed")
+
+	monkeypatch.setattr(backend, "set_iam_policy", always_conflict)
+	with pytest.raises(IamPolicyConflict):
+		update_bucket_iam_policy("gs://bucket", lambda policy: add_iam_binding(policy, VIEWER, MEMBER), max_attempts=3)
+
+
+@pytest.mark.parametrize("stderr, conflict", [
+	("ERROR: (gcloud.storage.buckets.set-iam-policy) HTTPError 412: Precondition Failed", True),
+	("ERROR: HTTPError 409: conflict", True),
+	("ERROR: conditionNotMet", True),
+	("ERROR: HTTPError 403: project asap-4120 request 409812 denied", False),
+	("ERROR: HTTPError 400: invalid etag format", False),
+])
+def test_cli_conflict_detection(monkeypatch, stderr, conflict):
+	def fake_run(command, **kwargs):
+		raise subprocess.CalledProcessError(1, command, output="", stderr=stderr)
+
+	monkeypatch.setattr(storage_backends.subprocess, "run", fake_run)
+	expected = IamPolicyConflict if conflict else subprocess.CalledProcessError
+	with pytest.raises(expected) as excinfo:
+		CliBackend().set_iam_policy("gs://bucket", {"bindings": [], "etag": "x"})
+	assert isinstance(excinfo.value, IamPolicyConflict) == conflict
@@ -0,0 +1,57 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import write_object
+from gcloud_ops import iter_objects
+from inventory_reports import iter_report_records
+
+
+def _write_csv(path, rows, header="bucket,name,size,md5Hash,crc32c,generation"):
+	path.write_text(header + "\n" + "".join(",".join(map(str, row)) + "\n" for row in rows))
+
+
+def test_csv_shards_filtered_by_bucket_and_prefix(tmp_path):
+	shards = tmp_path / "report"
+	shards.mkdir()
+	_write_csv(shards / "shard-0.csv", [
+		("uat", "wf/release/v1/a.txt", 1, "MDAwMA==", "AAAAAA==", 1),
+		("curated", "wf/release/v1/a.txt", 1, "MTExMQ==", "", 2),
+	])
+	_write_csv(shards / "shard-1.csv", [
+		("uat", "wf/release/v1/b.txt", 2, "", "AAAAAB==", 3),
+		("uat", "wf/release/v2/c.txt", 3, "", "", 4),
+	])
+	records = sorted(iter_report_records(shards, "gs://uat/wf/release/v1/"), key=lambda record: record.name)
+	assert [(record.bucket, record.name, record.size, record.generation) for record in records] == [
+		("uat", "wf/release/v1/a.txt", 1, 1),
+		("uat", "wf/release/v1/b.txt", 2, 3),
+	]
+	# Checksums stay strings, and empty cells are missing values
+	assert records[0].md5_hash == "MDAwMA=="
+	assert records[1].md5_hash is None
+
+
+def test_parquet_report_without_bucket_column_matches_listing(local_root, tmp_path):
+	write_object(local_root, "gs://uat/wf/a.txt", "a")
+	write_object(local_root, "gs://uat/wf/sub/b.txt", "bb")
+	listed = list(iter_objects("gs://uat/wf/"))
+	table = pa.table({
+		"name": [record.name for record in listed],
+		"size": [record.size for record in listed],
+		"md5_hash": [record.md5_hash for record in listed],
+	})
+	pq.write_table(table, tmp_path / "report.parquet")
+	from_report = list(iter_report_records(str(tmp_path / "*.parquet"), "gs://uat/wf/"))
+	assert [(r.bucket, r.name, r.size, r.md5_hash) for r in from_report] == [(r.bucket, r.name, r.size, r.md5_hash) for r in listed]
+
+
+def test_report_errors(tmp_path):
+	with pytest.raises(FileNotFoundError):
+		list(iter_report_records(str(tmp_path / "missing*.csv")))
+	_write_csv(tmp_path / "no-bucket.csv", [("wf/a.txt", 1)], header="name,size")
+	with pytest.raises(ValueError):
+		list(iter_report_records(tmp_path / "no-bucket.csv"))
+	_write_csv(tmp_path / "no-size.csv", [("uat", "wf/a.txt")], header="bucket,name")
+	with pytest.raises(ValueError):
+		list(iter_report_records(tmp_path / "no-size.csv"))
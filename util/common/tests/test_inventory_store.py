@@ -0,0 +1,84 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from conftest import write_object
+from gcloud_ops import iter_objects
+from inventory_store import InventorySnapshot, InventoryStore, diff_snapshots
+
+
+PREFIX = "pmdbs_sc_rnaseq/release/v1.0.0/"
+
+
+def _list(bucket, prefix=PREFIX):
+	return lambda: iter_objects(f"gs://{bucket}/{prefix}")
+
+
+def test_refresh_saves_snapshot_and_reports_changes(local_root, tmp_path):
+	write_object(local_root, f"gs://uat/{PREFIX}a.txt", "a")
+	write_object(local_root, f"gs://uat/{PREFIX}b.txt", "b")
+	store = InventoryStore(str(tmp_path / "store"))
+
+	first, changes = store.refresh("uat", PREFIX, _list("uat"))
+	assert changes is None
+	assert sorted(record.name for record in first.records) == [f"{PREFIX}a.txt", f"{PREFIX}b.txt"]
+
+	os.remove(local_root / "uat" / PREFIX / "a.txt")
+	write_object(local_root, f"gs://uat/{PREFIX}c.txt", "c")
+	second, changes = store.refresh("uat", PREFIX, _list("uat"))
+	assert changes.added == [f"{PREFIX}c.txt"]
+	assert changes.removed == [f"{PREFIX}a.txt"]
+	assert len(store.snapshot_paths("uat", PREFIX)) == 2
+	assert InventorySnapshot.read(store.snapshot_paths("uat", PREFIX)[-1]).records == second.records
+
+
+def test_refresh_reuses_young_snapshot_only_with_max_age(local_root, tmp_path):
+	write_object(local_root, f"gs://uat/{PREFIX}a.txt", "a")
+	store = InventoryStore(str(tmp_path / "store"))
+	store.refresh("uat", PREFIX, _list("uat"))
+	write_object(local_root, f"gs://uat/{PREFIX}b.txt", "b")
+
+	reused, changes = store.refresh("uat", PREFIX, _list("uat"), max_age=3600)
+	assert changes is None
+	assert [record.name for record in reused.records] == [f"{PREFIX}a.txt"]
+
+	fresh, changes = store.refresh("uat", PREFIX, _list("uat"), max_age=None)
+	assert changes.added == [f"{PREFIX}b.txt"]
+	assert len(fresh.records) == 2
+
+
+def test_refresh_relists_once_snapshot_is_older_than_max_age(local_root, tmp_path):
+	write_object(local_root, f"gs://uat/{PREFIX}a.txt", "a")
+	store = InventoryStore(str(tmp_path / "store"))
+	old = InventorySnapshot("uat", PREFIX, datetime.now(timezone.utc) - timedelta(hours=2), [])
+	store.save(old)
+
+	snapshot, changes = store.refresh("uat", PREFIX, _list("uat"), max_age=3600)
+	assert changes.added == [f"{PREFIX}a.txt"]
+	assert len(snapshot.records) == 1
+
+
+def test_save_keeps_only_newest_snapshots(tmp_path):
+	store = InventoryStore(str(tmp_path / "store"), keep=2)
+	now = datetime.now(timezone.utc)
+	for minutes in (30, 20, 10):
+		store.save(InventorySnapshot("uat", PREFIX, now - timedelta(minutes=minutes), []))
+	paths = store.snapshot_paths("uat", PREFIX)
+	assert len(paths) == 2
+	assert InventorySnapshot.read(paths[-1]).listed_at == now - timedelta(minutes=10)
+
+
+def test_diff_snapshots_lines_up_two_releases(local_root):
+	v1, v2 = "wf/release/v1.0.0/", "wf/release/v2.0.0/"
+	write_object(local_root, f"gs://curated/{v1}same.txt", "same")
+	write_object(local_root, f"gs://curated/{v1}gone.txt", "gone")
+	write_object(local_root, f"gs://curated/{v2}same.txt", "same")
+	write_object(local_root, f"gs://curated/{v2}new.txt", "new")
+	now = datetime.now(timezone.utc)
+	old = InventorySnapshot("curated", v1, now, list(iter_objects(f"gs://curated/{v1}")))
+	new = InventorySnapshot("curated", v2, now, list(iter_objects(f"gs://curated/{v2}")))
+
+	diff = diff_snapshots(old, new)
+	assert diff.added == ["new.txt"]
+	assert diff.removed == ["gone.txt"]
+	assert diff.unchanged == ["same.txt"]
+	assert diff.added_urls == [f"gs://curated/{v2}new.txt"]
@@ -0,0 +1,50 @@
+import listing_cache as listing_cache_module
+from conftest import write_object
+from gcloud_ops import gcopy, gremove, list_dirs
+from listing_cache import ListingCache, listing_cache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+	now = [100.0]
+	monkeypatch.setattr(listing_cache_module.time, "monotonic", lambda: now[0])
+	cache = ListingCache(ttl=10)
+	cache.put("gs://b/p", False, False, "out")
+	assert cache.get("gs://b/p") == "out"
+	assert cache.get("gs://b/p", recursive=True) is None
+	now[0] += 10
+	assert cache.get("gs://b/p") is None
+	assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_zero_ttl_disables_caching():
+	cache = ListingCache(ttl=0)
+	cache.put("gs://b/p", False, False, "out")
+	assert cache.get("gs://b/p") is None
+
+
+def test_invalidate_drops_every_listing_in_the_bucket():
+	cache = ListingCache()
+	cache.put("gs://b/p", False, False, "p")
+	cache.put("gs://b", True, True, "all")
+	cache.put("gs://other/p", False, False, "other")
+	cache.invalidate("gs://b/x/y.txt", "/local/path")
+	assert cache.get("gs://b/p") is None
+	assert cache.get("gs://b", True, True) is None
+	assert cache.get("gs://other/p") == "other"
+
+
+def test_list_dirs_is_cached_until_a_write(local_root):
+	write_object(local_root, "gs://bucket/a.txt", "a")
+	first = list_dirs("gs://bucket")
+	misses = listing_cache.misses
+
+	# Written behind gcloud_ops' back: still served from the cache
+	write_object(local_root, "gs://bucket/b.txt", "b")
+	assert list_dirs("gs://bucket") == first
+	assert listing_cache.misses == misses
+
+	gcopy("gs://bucket/a.txt", "gs://bucket/c.txt")
+	assert "gs://bucket/c.txt" in list_dirs("gs://bucket")
+
+	gremove("gs://bucket/c.txt")
+	assert "gs://bucket/c.txt" not in list_dirs("gs://bucket")
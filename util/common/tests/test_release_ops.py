@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import release_ops
+from release_ops import classify_assay, classify_organism, classify_series, classify_source
+
+
+SCALAR_CLASSIFIERS = {
+	"assay": classify_assay,
+	"organism": classify_organism,
+	"source": classify_source,
+}
+
+VALUES = [
+	"bulk", None, np.nan, "sc-rnaseq", "NaN", "", "Bulk_RNA_Seq", "mass spec",
+	"prod-team-alessi-mefs-bulk-rnaseq", "pmdbs-sn-rnaseq", "mouse-fecal-metagenome",
+	"human-plasma", "blood", "bulk", "nothing-matches-here", 42, "cohort-2-sc-rnaseq-human-brain",
+]
+
+
+@pytest.mark.parametrize("kind", sorted(SCALAR_CLASSIFIERS))
+def test_classify_series_matches_scalar_classifier(kind):
+	expected = [SCALAR_CLASSIFIERS[kind](value) for value in VALUES]
+	assert list(classify_series(VALUES, kind)) == expected
+
+
+def test_classify_series_keeps_missing_values_unclassified():
+	result = classify_series(["bulk", None, np.nan, "sc-rnaseq"], "assay")
+	assert list(result) == [classify_assay("bulk"), None, None, classify_assay("sc-rnaseq")]
+
+
+def test_classify_series_keeps_series_index_and_name():
+	values = pd.Series(["bulk", None], index=[10, 20], name="assay")
+	result = classify_series(values, "assay")
+	assert list(result.index) == [10, 20]
+	assert result.name == "assay"
+
+
+def test_classify_series_rejects_unknown_kind():
+	with pytest.raises(KeyError):
+		classify_series(["bulk"], "tissue")
+
+
+class _FakeSheetClient:
+	"""Stands in for a gspread client: serves rows and a Drive modifiedTime."""
+
+	def __init__(self, records, modified_time):
+		self.records = records
+		self.modified_time = modified_time
+		self.downloads = 0
+		self.http_client = self
+
+	def get_file_drive_metadata(self, sheet_id):
+		if self.modified_time is None:
+			raise RuntimeError("Drive API not enabled")
+		return {"modifiedTime": self.modified_time}
+
+	def open_by_key(self, sheet_id):
+		return self
+
+	def worksheet(self, tab_name):
+		return self
+
+	def get_all_records(self):
+		self.downloads += 1
+		return list(self.records)
+
+
+ROW = {"dataset_id": "team-a-pmdbs-sn-rnaseq", "team_id": "team-a", "latest_release_version": "v1.0.0"}
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+	client = _FakeSheetClient([ROW], "2026-01-01T00:00:00Z")
+	monkeypatch.setattr(release_ops, "_authorize", lambda credentials_path: client)
+	return client
+
+
+def _catalog(tmp_path, **kwargs):
+	return release_ops.ReleasesCatalog(cache_path=str(tmp_path / "releases.json"), **kwargs)
+
+
+def test_catalog_checks_modified_time_inside_ttl(tmp_path, sheet):
+	assert _catalog(tmp_path, ttl=3600).records == [ROW]
+	assert _catalog(tmp_path, ttl=3600).records == [ROW]
+	assert sheet.downloads == 1
+
+	changed = dict(ROW, latest_release_version="v2.0.0")
+	sheet.records, sheet.modified_time = [changed], "2026-01-02T00:00:00Z"
+	assert _catalog(tmp_path, ttl=3600).records == [changed]
+	assert sheet.downloads == 2
+
+
+def test_catalog_uses_ttl_only_without_modified_time(tmp_path, sheet):
+	sheet.modified_time = None
+	_catalog(tmp_path, ttl=3600).records
+	_catalog(tmp_path, ttl=3600).records
+	assert sheet.downloads == 1
+	_catalog(tmp_path, ttl=0).records
+	assert sheet.downloads == 2
+
+
+def test_catalog_offline_reads_cache_without_network(tmp_path, sheet, monkeypatch):
+	with pytest.raises(FileNotFoundError):
+		_catalog(tmp_path, offline=True).records
+	_catalog(tmp_path).records
+	monkeypatch.setattr(release_ops, "_authorize", None)
+	assert _catalog(tmp_path, offline=True).records == [ROW]
+
+
+def test_catalog_falls_back_to_cache_when_sheet_unreachable(tmp_path, sheet, monkeypatch):
+	_catalog(tmp_path).records
+
+	def unreachable(credentials_path):
+		raise OSError("network down")
+
+	monkeypatch.setattr(release_ops, "_authorize", unreachable)
+	assert _catalog(tmp_path).records == [ROW]
+
+
+RELEASE_ROWS = [
+	{"dataset_id": "team-a-pmdbs-sn-rnaseq", "team_id": "team-a", "latest_release_version": "v2.0.0", "latest_workflow_version": "v1.0.0"},
+	{"dataset_id": "team-a-pmdbs-sn-rnaseq", "team_id": "team-a", "latest_release_version": "v3.0.0", "latest_workflow_version": "v1.2.0"},
+	{"dataset_id": "team-b-mouse-bulk-rnaseq", "team_id": "team-b", "latest_release_version": "v3.0.0", "latest_workflow_version": ""},
+	{"dataset_id": "team-b-mouse-bulk-rnaseq", "team_id": "team-b", "latest_release_version": "v3.0.0", "latest_workflow_version": "NA"},
+	{"dataset_id": "team-a-pmdbs-spatial-visium", "team_id": "team-a", "latest_release_version": "v3.0.0", "latest_workflow_version": "v0.9.0"},
+]
+
+
+def test_releases_index_matches_dataframe_derivation():
+	df = pd.DataFrame(RELEASE_ROWS)
+	df["raw_buckets"] = "gs://asap-raw-" + df["dataset_id"]
+	df["dev_buckets"] = "gs://asap-dev-" + df["dataset_id"]
+	has_outputs = df["latest_workflow_version"].str.startswith("v", na=False)
+	expected_versions = (
+		df[has_outputs].sort_values("latest_workflow_version")
+		.drop_duplicates(subset="dev_buckets", keep="last")
+		.set_index("dev_buckets")["latest_workflow_version"].to_dict()
+	)
+
+	index = release_ops.ReleasesIndex.build(RELEASE_ROWS)
+	assert index.workflow_version_by_dev_bucket == expected_versions
+	assert list(index.workflow_version_by_dev_bucket) == list(expected_versions)
+	assert index.completed_platforming_raw_buckets == df[~has_outputs]["raw_buckets"].drop_duplicates().tolist()
+	assert list(index.datasets_by_team) == df["team_id"].unique().tolist()
+	assert index.raw_buckets_by_release["v3.0.0"] == [
+		"gs://asap-raw-team-a-pmdbs-sn-rnaseq", "gs://asap-raw-team-b-mouse-bulk-rnaseq", "gs://asap-raw-team-a-pmdbs-spatial-visium",
+	]
+	assert index.dataset_rows["team-a-pmdbs-sn-rnaseq"] == RELEASE_ROWS[1]
+
+
+def test_catalog_lookups(tmp_path, sheet):
+	sheet.records = RELEASE_ROWS
+	catalog = _catalog(tmp_path)
+	assert catalog.team_datasets("team-a") == ["team-a-pmdbs-sn-rnaseq", "team-a-pmdbs-spatial-visium"]
+	assert catalog.team_datasets("team-z") == []
+	assert catalog.workflow_version_for("gs://asap-dev-team-a-pmdbs-sn-rnaseq") == "v1.2.0"
+	assert catalog.raw_buckets_for_release("v2.0.0") == ["gs://asap-raw-team-a-pmdbs-sn-rnaseq"]
+	assert catalog.releases_df["dev_buckets"].iloc[0] == "gs://asap-dev-team-a-pmdbs-sn-rnaseq"
@@ -0,0 +1,44 @@
+import json
+
+import pyarrow.parquet as pq
+import pytest
+
+import report_sidecar
+from report_sidecar import ReportSidecar
+
+
+def _add_files(sidecar, count):
+	for i in range(count):
+		sidecar.add(f"gs://uat/f{i}.txt", i, "md5", i > 0, True, "match", "added" if i % 2 else "unchanged")
+
+
+def test_close_writes_table_and_summary(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	with ReportSidecar("team_a", batch_size=3) as sidecar:
+		_add_files(sidecar, 7)
+		sidecar.add("gs://uat/gone.txt", 0, None, None, None, None, "deleted")
+		summary = sidecar.close({"dataset_id": "team-a"})
+	assert summary["counts"] == {
+		"files": 7, "added": 3, "modified": 0, "unchanged": 4, "deleted": 1, "empty_files": 1, "missing_metadata": 0,
+	}
+	table = pq.read_table(sidecar.parquet_path)
+	assert table.num_rows == 8
+	assert table.schema == report_sidecar.FILE_SCHEMA
+	with open(sidecar.json_path) as fh:
+		assert json.load(fh) == summary
+
+
+def test_failure_inside_block_discards_partial_files(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	with pytest.raises(RuntimeError):
+		with ReportSidecar("team_a", batch_size=2) as sidecar:
+			_add_files(sidecar, 5)
+			raise RuntimeError("report failed")
+	assert list(tmp_path.iterdir()) == []
+
+
+def test_report_cells_as_booleans():
+	assert report_sidecar.test_passed("✅") is True
+	assert report_sidecar.test_passed("❌") is False
+	assert report_sidecar.test_passed("N/A (composite_object)") is None
+	assert report_sidecar.test_passed(None) is None
@@ -0,0 +1,145 @@
+import subprocess
+
+import pytest
+
+import retry_policy
+import storage_backends
+from conftest import write_object
+from retry_policy import RetryPolicy, is_transient
+from storage_backends import CliBackend, StorageError
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+	monkeypatch.setattr(retry_policy.time, "sleep", lambda seconds: None)
+
+
+def _called_process_error(stderr):
+	return subprocess.CalledProcessError(1, ["gcloud", "storage", "ls"], output="", stderr=stderr)
+
+
+@pytest.mark.parametrize("error", [
+	_called_process_error("ERROR: HTTPError 503: Service Unavailable"),
+	_called_process_error("ERROR: HTTPError 429: rate limit exceeded"),
+	_called_process_error("Connection reset by peer"),
+	ConnectionResetError(),
+	TimeoutError(),
+	type("ReadTimeout", (Exception,), {})(),
+])
+def test_transient_errors(error):
+	assert is_transient(error)
+
+
+@pytest.mark.parametrize("error", [
+	_called_process_error("ERROR: HTTPError 404: gs://bucket/name not found"),
+	_called_process_error("ERROR: HTTPError 403: request id 5031 denied"),
+	FileNotFoundError(),
+	ValueError("bad input"),
+])
+def test_permanent_errors(error):
+	assert not is_transient(error)
+
+
+def test_transient_cause_is_transient():
+	try:
+		try:
+			raise ConnectionResetError()
+		except ConnectionResetError as e:
+			raise StorageError(["storage", "cp"], "copy failed") from e
+	except StorageError as e:
+		assert is_transient(e)
+
+
+def _flaky(failures, error=ConnectionResetError):
+	calls = []
+
+	def fn():
+		calls.append(1)
+		if len(calls) <= failures:
+			raise error()
+		return "ok"
+
+	return fn, calls
+
+
+def test_call_retries_transient_errors_until_success():
+	fn, calls = _flaky(2)
+	assert RetryPolicy(max_attempts=3).call(fn) == "ok"
+	assert len(calls) == 3
+
+
+def test_call_gives_up_after_max_attempts():
+	fn, calls = _flaky(5)
+	with pytest.raises(ConnectionResetError):
+		RetryPolicy(max_attempts=3).call(fn)
+	assert len(calls) == 3
+
+
+def test_call_does_not_retry_permanent_errors():
+	fn, calls = _flaky(1, error=FileNotFoundError)
+	with pytest.raises(FileNotFoundError):
+		RetryPolicy().call(fn)
+	assert len(calls) == 1
+
+
+def test_call_respects_elapsed_budget():
+	fn, calls = _flaky(5)
+	with pytest.raises(ConnectionResetError):
+		RetryPolicy(initial_delay=10, max_elapsed=0.001).call(fn)
+	assert len(calls) == 1
+
+
+def test_backoff_is_capped():
+	policy = RetryPolicy(initial_delay=1, max_delay=4)
+	assert all(0 <= policy.backoff(attempt) <= 4 for attempt in range(1, 20))
+
+
+def test_cli_backend_does_not_retry_non_idempotent_commands(monkeypatch):
+	calls = []
+
+	def fake_run(command, **kwargs):
+		calls.append(command)
+		raise _called_process_error("ERROR: HTTPError 503: Service Unavailable")
+
+	monkeypatch.setattr(storage_backends.subprocess, "run", fake_run)
+	backend = CliBackend()
+	for operation in (
+		lambda: backend.rm("gs://bucket/a"),
+		lambda: backend.mv("gs://bucket/a", "gs://bucket/b"),
+		lambda: backend.cp("gs://bucket/dir", "gs://other/dir", recursive=True),
+	):
+		calls.clear()
+		with pytest.raises(subprocess.CalledProcessError):
+			operation()
+		assert len(calls) == 1
+
+	calls.clear()
+	monkeypatch.setattr(retry_policy, "_policy", RetryPolicy(max_attempts=2))
+	with pytest.raises(subprocess.CalledProcessError):
+		backend.ls("gs://bucket")
+	assert len(calls) == 2
+
+
+def test_delete_lost_response_counts_as_success(local_root, monkeypatch):
+	path = write_object(local_root, "gs://bucket/a.txt", "a")
+	backend = storage_backends.get_backend()
+	original = backend._delete
+
+	def delete_then_drop_response(bucket, name):
+		original(bucket, name)
+		if not hasattr(delete_then_drop_response, "done"):
+			delete_then_drop_response.done = True
+			raise ConnectionResetError("response lost")
+
+	monkeypatch.setattr(backend, "_delete", delete_then_drop_response)
+	backend.rm("gs://bucket/a.txt")
+	assert not path.exists()
+
+
+def test_delete_not_found_on_first_attempt_still_fails(local_root):
+	write_object(local_root, "gs://bucket/a.txt", "a")
+	backend = storage_backends.get_backend()
+	with pytest.raises(FileNotFoundError):
+		backend._delete_with_retry("bucket", "missing.txt")
+	with pytest.raises(StorageError):
+		backend.rm("gs://bucket/missing.txt")
@@ -0,0 +1,125 @@
+import pytest
+
+from conftest import write_object
+from gcloud_ops import (
+	gcopy, gcopy_batch, gcopy_server_side, gmove, gremove, iter_objects, list_dirs, read_range, stat_object,
+)
+from storage_backends import StorageError, get_backend, split_gs_url
+
+
+def _names(root, bucket):
+	return sorted(p.relative_to(root / bucket).as_posix() for p in (root / bucket).rglob("*") if p.is_file())
+
+
+def test_split_gs_url():
+	assert split_gs_url("gs://bucket") == ("bucket", "")
+	assert split_gs_url("gs://bucket/a/b.txt") == ("bucket", "a/b.txt")
+
+
+def test_ls_lists_one_level_or_recursively(local_root):
+	write_object(local_root, "gs://bucket/top.txt", "t")
+	write_object(local_root, "gs://bucket/dir/a.txt", "a")
+	write_object(local_root, "gs://bucket/dir/sub/b.txt", "b")
+	assert list_dirs("gs://bucket").split() == ["gs://bucket/dir/", "gs://bucket/top.txt"]
+	assert list_dirs("gs://bucket/dir", recursive=True).split() == ["gs://bucket/dir/a.txt", "gs://bucket/dir/sub/b.txt"]
+	assert list_dirs("gs://bucket/dir/*.txt").split() == ["gs://bucket/dir/a.txt"]
+	assert "TOTAL: 1 objects, 1 bytes" in list_dirs("gs://bucket/top.txt", long=True)
+
+
+def test_ls_of_nothing_raises(local_root):
+	(local_root / "bucket").mkdir()
+	with pytest.raises(StorageError):
+		get_backend().ls("gs://bucket/missing/")
+
+
+def test_copy_between_local_and_bucket(local_root, tmp_path):
+	source = tmp_path / "out"
+	(source / "nested").mkdir(parents=True)
+	(source / "a.txt").write_text("a")
+	(source / "nested" / "b.txt").write_text("b")
+	(local_root / "bucket").mkdir()
+	gcopy(str(source), "gs://bucket/run/", recursive=True)
+	assert _names(local_root, "bucket") == ["run/out/a.txt", "run/out/nested/b.txt"]
+
+	download = tmp_path / "download.txt"
+	gcopy("gs://bucket/run/out/a.txt", str(download))
+	assert download.read_text() == "a"
+
+
+def test_move_and_remove(local_root):
+	write_object(local_root, "gs://bucket/a.txt", "a")
+	write_object(local_root, "gs://bucket/dir/b.txt", "b")
+	(local_root / "other").mkdir()
+	gmove("gs://bucket/a.txt", "gs://other/moved.txt")
+	assert _names(local_root, "bucket") == ["dir/b.txt"]
+	assert _names(local_root, "other") == ["moved.txt"]
+	gremove("gs://bucket/dir/b.txt")
+	assert _names(local_root, "bucket") == []
+	# Nothing left to remove: logged and skipped
+	gremove("gs://bucket/dir/b.txt")
+
+
+def test_stat_and_read_range(local_root):
+	write_object(local_root, "gs://bucket/data.bin", b"0123456789")
+	record = stat_object("gs://bucket/data.bin")
+	assert (record.size, record.url) == (10, "gs://bucket/data.bin")
+	assert stat_object("gs://bucket/missing.bin") is None
+	assert read_range("gs://bucket/data.bin", 2, 3) == b"234"
+	assert read_range("gs://bucket/data.bin", 8, 10) == b"89"
+
+
+def test_gcopy_batch_attempts_every_pair(local_root, tmp_path):
+	write_object(local_root, "gs://src/a.txt", "a")
+	write_object(local_root, "gs://src/b.txt", "b")
+	(local_root / "dst").mkdir()
+	pairs = [
+		("gs://src/a.txt", "gs://dst/x/a.txt"),
+		("gs://src/missing.txt", "gs://dst/x/missing.txt"),
+		("gs://src/b.txt", str(tmp_path / "b.txt")),
+	]
+	with pytest.raises(StorageError) as excinfo:
+		gcopy_batch(pairs)
+	assert "1 of 3 objects failed" in excinfo.value.stderr
+	assert _names(local_root, "dst") == ["x/a.txt"]
+	assert (tmp_path / "b.txt").read_text() == "b"
+
+	outcomes = gcopy_batch(pairs, raise_on_error=False)
+	assert [outcome.ok for outcome in outcomes] == [True, False, True]
+	assert gcopy_batch([]) == []
+
+
+def test_iter_objects_streams_records(local_root):
+	write_object(local_root, "gs://bucket/run/a.txt", "aa")
+	write_object(local_root, "gs://bucket/run/sub/b.txt", "b")
+	write_object(local_root, "gs://bucket/other.txt", "o")
+	records = list(iter_objects("gs://bucket/run/"))
+	assert [(record.name, record.size) for record in records] == [("run/a.txt", 2), ("run/sub/b.txt", 1)]
+	assert all(record.md5_hash for record in records)
+
+
+def test_iter_objects_raises_storage_error(local_root, monkeypatch):
+	with pytest.raises(StorageError):
+		list(iter_objects("gs://missing-bucket/run/"))
+
+	def forbidden(bucket, prefix, delimiter=None, max_results=None):
+		raise PermissionError("403 requester pays bucket")
+
+	(local_root / "bucket").mkdir()
+	monkeypatch.setattr(get_backend(), "_list", forbidden)
+	with pytest.raises(StorageError) as excinfo:
+		list(iter_objects("gs://bucket/run/"))
+	assert "requester pays" in excinfo.value.stderr
+
+
+def test_gcopy_server_side_copies_prefix(local_root):
+	for i in range(12):
+		write_object(local_root, f"gs://uat/wf/release/v1/file{i}.txt", str(i))
+	(local_root / "prod").mkdir()
+	gcopy_server_side("gs://uat/wf/release/v1", "gs://prod/wf/release/", recursive=True)
+	assert _names(local_root, "prod") == sorted(f"wf/release/v1/file{i}.txt" for i in range(12))
+	assert (local_root / "prod/wf/release/v1/file7.txt").read_text() == "7"
+
+
+def test_gcopy_server_side_needs_bucket_urls(local_root, tmp_path):
+	with pytest.raises(ValueError):
+		gcopy_server_side(str(tmp_path), "gs://prod/run/")
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import storage_trace
+from conftest import write_object
+from gcloud_ops import gcopy, list_dirs
+
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+	tracer = storage_trace._Tracer()
+	tracer.enabled = True
+	tracer.path = str(tmp_path / "trace.jsonl")
+	monkeypatch.setattr(storage_trace, "_tracer", tracer)
+	return tracer
+
+
+def test_traced_calls_record_bucket_volume_and_status(local_root, tracer):
+	write_object(local_root, "gs://src/a.txt", "hello")
+	(local_root / "dst").mkdir()
+	gcopy("gs://src/a.txt", "gs://dst/a.txt")
+	with pytest.raises(Exception):
+		gcopy("gs://src/missing.txt", "gs://dst/missing.txt")
+
+	ok, failed = tracer.records
+	assert (ok.op, ok.bucket, ok.status, ok.objects, ok.bytes) == ("cp", "src", "ok", 1, 5)
+	assert (failed.status, failed.exit_code) == ("error", 1)
+	with open(tracer.path) as fh:
+		assert [json.loads(line)["target"] for line in fh] == ["gs://src/a.txt", "gs://src/missing.txt"]
+
+
+def test_summary_groups_by_operation_and_bucket(local_root, tracer):
+	write_object(local_root, "gs://src/a.txt", "a")
+	list_dirs("gs://src", recursive=True, long=True)
+	list_dirs("gs://src")
+	rows = storage_trace.summary_rows()
+	assert [(row["op"], row["bucket"], row["calls"]) for row in rows] == [("ls", "src", 2)]
+	assert "ls" in storage_trace.format_summary(rows)
+
+
+def test_chrome_trace(local_root, tracer, tmp_path):
+	write_object(local_root, "gs://src/a.txt", "a")
+	list_dirs("gs://src")
+	storage_trace.write_chrome_trace(str(tmp_path / "trace.json"))
+	with open(tmp_path / "trace.json") as fh:
+		events = json.load(fh)["traceEvents"]
+	assert [(event["name"], event["cat"], event["ph"]) for event in events] == [("ls", "src", "X")]
+
+
+def test_nothing_recorded_when_disabled(local_root, monkeypatch):
+	tracer = storage_trace._Tracer()
+	monkeypatch.setattr(storage_trace, "_tracer", tracer)
+	write_object(local_root, "gs://src/a.txt", "a")
+	list_dirs("gs://src")
+	assert tracer.records == []
@@ -0,0 +1,87 @@
+import pytest
+
+from conftest import write_object
+from gcloud_ops import gsync, gsync_del
+from storage_backends import StorageError, get_backend
+from sync_planner import InventoryEntry, execute_plan, plan_sync, same_content
+
+
+@pytest.fixture
+def buckets(local_root):
+	write_object(local_root, "gs://src/run/a.txt", "same")
+	write_object(local_root, "gs://src/run/b.txt", "new content")
+	write_object(local_root, "gs://src/run/sub/c.txt", "added")
+	write_object(local_root, "gs://src/run/tmp/skip.txt", "excluded")
+	write_object(local_root, "gs://dst/run/a.txt", "same")
+	write_object(local_root, "gs://dst/run/b.txt", "old content")
+	write_object(local_root, "gs://dst/run/stale.txt", "stale")
+	write_object(local_root, "gs://dst/run/tmp/keep.txt", "excluded")
+	return local_root
+
+
+def test_plan_sync_classifies_objects(buckets):
+	plan = plan_sync("gs://src/run", "gs://dst/run", delete=True, exclude=r"tmp/")
+	assert [(action.name, action.reason) for action in plan.copies] == [("b.txt", "changed"), ("sub/c.txt", "missing")]
+	assert [action.destination for action in plan.deletes] == ["gs://dst/run/stale.txt"]
+	assert plan.unchanged == 1
+	assert plan.excluded == 1
+	assert plan.bytes_to_copy == len("new content") + len("added")
+
+
+def test_plan_sync_without_delete_keeps_extra_objects(buckets):
+	plan = plan_sync("gs://src/run", "gs://dst/run")
+	assert plan.deletes == []
+	assert not plan.is_noop
+
+
+def test_execute_plan_makes_destination_match(buckets):
+	plan = plan_sync("gs://src/run", "gs://dst/run", delete=True, exclude=r"tmp/")
+	log = execute_plan(plan)
+	assert "Removing gs://dst/run/stale.txt" in log
+	assert (buckets / "dst/run/b.txt").read_text() == "new content"
+	assert (buckets / "dst/run/sub/c.txt").read_text() == "added"
+	assert not (buckets / "dst/run/stale.txt").exists()
+	assert (buckets / "dst/run/tmp/keep.txt").exists()
+	assert plan_sync("gs://src/run", "gs://dst/run", delete=True, exclude=r"tmp/").is_noop
+
+
+def test_execute_plan_skips_deletes_when_a_copy_fails(buckets, monkeypatch):
+	backend = get_backend()
+
+	def failing_copy(source, destination):
+		raise OSError("copy failed")
+
+	monkeypatch.setattr(backend, "copy_object", failing_copy)
+	plan = plan_sync("gs://src/run", "gs://dst/run", delete=True)
+	with pytest.raises(StorageError):
+		execute_plan(plan)
+	assert (buckets / "dst/run/stale.txt").exists()
+
+
+def test_plan_sync_refuses_empty_source(buckets):
+	(buckets / "empty").mkdir()
+	with pytest.raises(StorageError):
+		plan_sync("gs://empty/run", "gs://dst/run", delete=True)
+
+
+def test_sync_from_local_directory(buckets, tmp_path):
+	local = tmp_path / "outputs"
+	(local / "nested").mkdir(parents=True)
+	(local / "a.txt").write_text("same")
+	(local / "nested" / "d.txt").write_text("local")
+	gsync_del(str(local), "gs://dst/run", dry_run=False)
+	assert sorted(p.relative_to(buckets / "dst/run").as_posix() for p in (buckets / "dst/run").rglob("*") if p.is_file()) == ["a.txt", "nested/d.txt"]
+
+
+def test_dry_run_changes_nothing(buckets):
+	gsync("gs://src/run", "gs://dst/run", dry_run=True)
+	assert (buckets / "dst/run/b.txt").read_text() == "old content"
+
+
+def test_same_content_compares_size_then_hashes():
+	a = InventoryEntry("a", "gs://b/a", 4, md5_hash="x")
+	assert same_content(a, InventoryEntry("a", "gs://c/a", 4, md5_hash="x"))
+	assert not same_content(a, InventoryEntry("a", "gs://c/a", 5, md5_hash="x"))
+	assert not same_content(a, InventoryEntry("a", "gs://c/a", 4, md5_hash="y"))
+	# Nothing to compare: treated as different
+	assert not same_content(a, InventoryEntry("a", "gs://c/a", 4, crc32c="z"))
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from conftest import write_object
+from gcloud_ops import gcopy
+from transfer_executor import TransferExecutor
+
+
+def test_jobs_with_one_key_run_in_order_and_keys_overlap():
+	events, lock = [], threading.Lock()
+	started = {key: threading.Event() for key in ("a", "b")}
+
+	def job(key, step):
+		started[key].set()
+		# Each key waits for the other to start, which only works if keys run concurrently
+		assert started["b" if key == "a" else "a"].wait(5)
+		with lock:
+			events.append((key, step))
+
+	with TransferExecutor(max_workers=2) as executor:
+		for step in range(3):
+			executor.submit("a", f"a{step}", job, "a", step)
+			executor.submit("b", f"b{step}", job, "b", step)
+	assert [step for key, step in events if key == "a"] == [0, 1, 2]
+	assert [step for key, step in events if key == "b"] == [0, 1, 2]
+	assert not executor.failed
+
+
+def test_failure_skips_later_jobs_for_the_key_only():
+	def fail():
+		raise RuntimeError("boom")
+
+	with TransferExecutor(max_workers=2) as executor:
+		executor.submit("a", "first", fail)
+		executor.submit("a", "second", lambda: "never")
+		executor.submit("b", "other", lambda: "done")
+	statuses = {result.description: result.status for result in executor.results}
+	assert statuses == {"first": "failed", "second": "skipped", "other": "ok"}
+	assert [result.description for result in executor.failed] == ["first"]
+	assert isinstance(executor.failed[0].error, RuntimeError)
+
+
+def test_system_exit_is_reported_as_a_failure():
+	def exits():
+		raise SystemExit(1)
+
+	with TransferExecutor() as executor:
+		executor.submit("a", "exits", exits)
+	assert executor.failed[0].description == "exits"
+
+
+def test_dry_run_only_skips_mutating_jobs(local_root):
+	write_object(local_root, "gs://src/a.txt", "a")
+	(local_root / "dst").mkdir()
+	ran = []
+	with TransferExecutor(dry_run=True) as executor:
+		executor.submit("dst", "copy a", gcopy, "gs://src/a.txt", "gs://dst/a.txt")
+		executor.submit("dst", "plan", lambda: ran.append(True), mutating=False)
+	assert [result.status for result in executor.results] == ["dry-run", "ok"]
+	assert ran == [True]
+	assert not (local_root / "dst" / "a.txt").exists()
+
+
+def test_wait_returns_all_results():
+	executor = TransferExecutor(max_workers=3)
+	for i in range(10):
+		executor.submit(f"k{i % 3}", f"job {i}", time.sleep, 0.001)
+	assert len(executor.wait()) == 10
+	executor.shutdown()
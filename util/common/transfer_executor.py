@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Bounded-concurrency executor for independent bucket transfers.
+
+Jobs are submitted under a key (usually the bucket or dataset they touch).
+Jobs sharing a key run one after another in submission order; jobs with
+different keys run concurrently, up to `max_workers` at a time. Every job
+produces a JobResult, so a script can report all failures at the end instead
+of stopping at the first one.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+DEFAULT_MAX_WORKERS = 4
+
+
+@dataclass
+class JobResult:
+	key: str
+	description: str
+	status: str  # "ok", "failed", "skipped" (earlier job for the key failed) or "dry-run"
+	result: object = None
+	error: BaseException | None = None
+	elapsed: float = 0.0
+
+
+class TransferExecutor:
+	"""
+	Run transfer jobs concurrently across keys and in order within a key.
+
+	With dry_run=True, jobs submitted with mutating=True are only logged as
+	"Would <description>"; jobs that handle dry runs themselves (e.g. gsync with
+	dry_run=True) should be submitted with mutating=False so they still run.
+
+	Usage:
+		with TransferExecutor(max_workers=4, dry_run=dry_run) as executor:
+			executor.submit(bucket, f"sync {src} to {dst}", gsync, src, dst, dry_run, mutating=False)
+		if executor.failed:
+			...
+	"""
+
+	def __init__(self, max_workers=DEFAULT_MAX_WORKERS, dry_run=False):
+		self.dry_run = dry_run
+		self.results = []
+		self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transfer")
+		self._queues = {}
+		self._active = set()
+		self._failed_keys = set()
+		self._pending = 0
+		self._lock = threading.Lock()
+		self._idle = threading.Condition(self._lock)
+
+	def submit(self, key, description, fn, *args, mutating=True, **kwargs):
+		with self._lock:
+			self._queues.setdefault(key, deque()).append((description, fn, args, kwargs, mutating))
+			self._pending += 1
+			if key not in self._active:
+				self._active.add(key)
+				self._pool.submit(self._drain, key)
+
+	def _drain(self, key):
+		while True:
+			with self._lock:
+				queue = self._queues[key]
+				if not queue:
+					self._active.discard(key)
+					return
+				description, fn, args, kwargs, mutating = queue.popleft()
+				skip = key in self._failed_keys
+			result = self._run_job(key, description, fn, args, kwargs, mutating, skip)
+			with self._lock:
+				self.results.append(result)
+				if result.status == "failed":
+					self._failed_keys.add(key)
+				self._pending -= 1
+				if self._pending == 0:
+					self._idle.notify_all()
+
+	def _run_job(self, key, description, fn, args, kwargs, mutating, skip):
+		if skip:
+			logging.warning(f"[{key}] Skipping '{description}' because an earlier job for this key failed")
+			return JobResult(key, description, "skipped")
+		if self.dry_run and mutating:
+			logging.info(f"Would {description}")
+			return JobResult(key, description, "dry-run")
+		start = time.monotonic()
+		try:
+			value = fn(*args, **kwargs)
+		except (Exception, SystemExit) as e:
+			logging.error(f"[{key}] '{description}' failed: {e}")
+			return JobResult(key, description, "failed", error=e, elapsed=time.monotonic() - start)
+		return JobResult(key, description, "ok", result=value, elapsed=time.monotonic() - start)
+
+	def wait(self):
+		"""Block until every submitted job has finished; returns all results."""
+		with self._lock:
+			while self._pending:
+				self._idle.wait()
+			return list(self.results)
+
+	def shutdown(self):
+		self.wait()
+		self._pool.shutdown()
+
+	@property
+	def failed(self):
+		with self._lock:
+			return [result for result in self.results if result.status == "failed"]
+
+	def log_summary(self):
+		counts = {}
+		for result in self.results:
+			counts[result.status] = counts.get(result.status, 0) + 1
+		logging.info("Transfer jobs: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+		for result in self.failed:
+			logging.error(f"FAILED [{result.key}] {result.description}: {result.error}")
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.shutdown()
+		return False
+
+
+__all__ = ["DEFAULT_MAX_WORKERS", "JobResult", "TransferExecutor"]
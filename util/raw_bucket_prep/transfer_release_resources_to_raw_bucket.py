@@ -31,7 +31,8 @@ from pathlib import Path
 
 import os, sys
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
-from gcloud_ops import gcopy
+from gcloud_ops import gcopy_batch
+from transfer_executor import DEFAULT_MAX_WORKERS, TransferExecutor
 import os, sys
 from collections import defaultdict
 import json
@@ -108,19 +109,30 @@ def main(args):
 
     # Transfers validated files per dataset
     # to gs://asap-raw-team-<dataset_id>/release-resources/<release_version>/
-    for dataset_id in dataset_ids:
-        bucket_name = f"gs://asap-raw-{dataset_id}"
-        release_resources_bucket = f"{bucket_name}/release_resources/{release_version}" # Note: "release_resources" (with underscore)
-        validate_files = validated_files_per_dataset[dataset_id]
-        for local_file_path in validate_files:
-            bucket_file_path = f"{release_resources_bucket}/{local_file_path.relative_to(release_resources_dir)}"
+    # Datasets are transferred concurrently; files within a bucket are copied in order
+    with TransferExecutor(max_workers=args.max_workers, dry_run=dry_run) as executor:
+        for dataset_id in dataset_ids:
+            bucket_name = f"gs://asap-raw-{dataset_id}"
+            release_resources_bucket = f"{bucket_name}/release_resources/{release_version}" # Note: "release_resources" (with underscore)
+            validate_files = validated_files_per_dataset[dataset_id]
+            pairs = [
+                (str(local_file_path), f"{release_resources_bucket}/{local_file_path.relative_to(release_resources_dir)}")
+                for local_file_path in validate_files
+            ]
             if dry_run:
-                logging.info(f"Would copy {local_file_path} to {bucket_file_path}")
+                for local_file_path, bucket_file_path in pairs:
+                    logging.info(f"Would copy {local_file_path} to {bucket_file_path}")
             else:
-                logging.info(f"Transferring file: {local_file_path} to {bucket_file_path}")
-                gcopy(source_path=str(local_file_path), 
-                      destination_path=bucket_file_path,
-                      recursive=False)
+                # One batched copy per dataset instead of one gcloud call per file
+                executor.submit(
+                    bucket_name,
+                    f"copy {len(pairs)} release-resources files to {release_resources_bucket}",
+                    gcopy_batch,
+                    pairs
+                )
+    executor.log_summary()
+    if executor.failed:
+        sys.exit(1)
     
 
 if __name__ == "__main__":
@@ -162,6 +174,13 @@ if __name__ == "__main__":
 		required=False,
 		help="Promote data (omit for dry run).\n\n"
 	)
+    parser.add_argument(
+        "-j",
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Number of dataset buckets transferred concurrently (default: {DEFAULT_MAX_WORKERS})."
+    )
 
     args = parser.parse_args()
     main(args)
@@ -28,6 +28,7 @@ Inconsistency reconciliation tables (if issues are found):
 
 Usage as CLI:
 python3 validate_raw_bucket_structure.py -d team-smith-sc-rnaseq
+python3 validate_raw_bucket_structure.py -d team-smith-sc-rnaseq -r inventory_reports/   # structure from an inventory report
 
 Usage as module:
 from validate_raw_bucket_structure import perform_bucket_validation
@@ -45,7 +46,6 @@ from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 import argparse
-import pandas as pd
 
 repo_root = Path(__file__).resolve().parents[2]
 metadata_root = repo_root.parent / "asap-crn-cloud-dataset-metadata"
@@ -66,7 +66,7 @@ from bucket_validation_utils import (
 from file_utils import (
     get_file_extension,
     check_csv_rows,
-    detect_csv_delimiter,
+    csv_profile,
     )
 
 # crn-utils
@@ -115,6 +115,14 @@ MANDATORY_COLS_PER_TABLE = {
     "subject_id": ["CLINPATH", "SAMPLE", "SUBJECT", "MOUSE", "CELL", "PROTEOMICS"],
 }
 
+# Cell values treated as missing when comparing mandatory column values across
+# tables (pandas' default NA markers, which the check used when it read tables
+# with pd.read_csv).
+_MISSING_VALUE_MARKERS = frozenset({
+    '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
 # Illumina FASTQ naming suffixes after normalization (lowercase, hyphens → underscores).
 # Full form: <sample>_S<n>_L<n>_[R|I]<n>_<nnn>.fastq.gz
 _FULL_ILLUMINA_SUFFIX_RE = re.compile(r'_s\d+_l\d+_[ri]\d+_\d{3}\.fastq\.gz$')
@@ -355,26 +363,21 @@ def check_mandatory_column_consistency(metadata_dir: Path, mandatory_cols: dict)
         if not present:
             continue
 
-        name_to_df = {}
+        name_to_profile = {}
         for t, stem in present.items():
-            table_path = metadata_dir / f"{stem}.csv"
-            delim = detect_csv_delimiter(table_path)
-            for enc in ('utf-8-sig', 'utf-8', 'latin-1'):
-                try:
-                    name_to_df[t] = pd.read_csv(table_path, sep=delim, encoding=enc)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            try:
+                name_to_profile[t] = csv_profile(metadata_dir / f"{stem}.csv")
+            except Exception:
+                continue
 
         col_found_in = {}
         col_missing_in = []
-        for table_name, df in name_to_df.items():
-            col_key = next((c for c in df.columns if c.lower().strip() == col_name.lower()), None)
-            if col_key is None:
+        for table_name, profile in name_to_profile.items():
+            values = profile.value_set(col_name)
+            if values is None:
                 col_missing_in.append(table_name)
             else:
-                values = set(df[col_key].dropna().astype(str).str.strip()) - {''}
-                col_found_in[table_name] = values
+                col_found_in[table_name] = values - _MISSING_VALUE_MARKERS
 
         presence_status = emoji_error if col_missing_in else emoji_success
         presence_detail = f"Missing column in: {', '.join(sorted(col_missing_in))}" if col_missing_in else ''
@@ -566,27 +569,17 @@ def check_three_way_consistency(
                 break
         if sample_csv_path:
             result['sample_csv_found'] = True
-            sample_delim = detect_csv_delimiter(sample_csv_path)
-            for encoding in ('utf-8-sig', 'utf-8', 'latin-1'):
-                try:
-                    with open(sample_csv_path, 'r', encoding=encoding) as fh:
-                        reader = csv.DictReader(fh, delimiter=sample_delim)
-                        col = next(
-                            (k for k in (reader.fieldnames or []) if k.lower().strip() == 'sample_id'),
-                            None,
-                        )
-                        if col:
-                            result['sample_id_col_found'] = True
-                            for row in reader:
-                                val = row[col].strip()
-                                if val:
-                                    sample_ids_from_sample[val.lower()] = val
-                    break
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    result['issues'].append(f"Could not read SAMPLE.csv: {e}")
-                    break
+            try:
+                sample_ids = csv_profile(sample_csv_path).values('sample_id')
+            except Exception as e:
+                result['issues'].append(f"Could not read SAMPLE.csv: {e}")
+                sample_ids = None
+            if sample_ids is not None:
+                result['sample_id_col_found'] = True
+                for val in sample_ids:
+                    val = (val or '').strip()
+                    if val:
+                        sample_ids_from_sample[val.lower()] = val
 
     # ── 2. Read DATA.csv ──────────────────────────────────────────────
     data_csv_path = None
@@ -605,45 +598,34 @@ def check_three_way_consistency(
     data_by_sample = defaultdict(list)  # lower sample_id → [{'sample_id': str, 'file_name': str}]
     all_file_names = []
 
-    data_delim = detect_csv_delimiter(data_csv_path)
-    for encoding in ('utf-8-sig', 'utf-8', 'latin-1'):
-        try:
-            with open(data_csv_path, 'r', encoding=encoding) as fh:
-                reader = csv.DictReader(fh, delimiter=data_delim)
-                fieldnames = reader.fieldnames or []
-                sample_id_key = next(
-                    (k for k in fieldnames if k.lower().strip() == 'sample_id'), None
-                )
-                file_name_key = next(
-                    (k for k in fieldnames if k.lower().strip() == 'file_name'), None
-                )
-                if sample_id_key:
-                    result['data_sample_id_col_found'] = True
-                if file_name_key:
-                    result['data_file_name_col_found'] = True
-                if not sample_id_key:
-                    result['issues'].append(f"No 'sample_id' column in {data_csv_name}")
-                    return result
-                if not file_name_key:
-                    result['issues'].append(f"No 'file_name' column in {data_csv_name}")
-                    return result
-                for row in reader:
-                    sid = row[sample_id_key].strip()
-                    fn_raw = row[file_name_key].strip()
-                    fn = os.path.basename(fn_raw)
-                    if sid and fn:
-                        data_by_sample[sid.lower()].append({
-                            'sample_id': sid,
-                            'file_name': fn,
-                            'file_name_was_path': fn != fn_raw,
-                        })
-                        all_file_names.append(fn)
-            break
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            result['issues'].append(f"Could not read {data_csv_name}: {e}")
-            return result
+    try:
+        data_profile = csv_profile(data_csv_path)
+    except Exception as e:
+        result['issues'].append(f"Could not read {data_csv_name}: {e}")
+        return result
+    data_sample_ids = data_profile.values('sample_id')
+    data_file_names = data_profile.values('file_name')
+    if data_sample_ids is not None:
+        result['data_sample_id_col_found'] = True
+    if data_file_names is not None:
+        result['data_file_name_col_found'] = True
+    if data_sample_ids is None:
+        result['issues'].append(f"No 'sample_id' column in {data_csv_name}")
+        return result
+    if data_file_names is None:
+        result['issues'].append(f"No 'file_name' column in {data_csv_name}")
+        return result
+    for sid, fn_raw in zip(data_sample_ids, data_file_names):
+        sid = (sid or '').strip()
+        fn_raw = (fn_raw or '').strip()
+        fn = os.path.basename(fn_raw)
+        if sid and fn:
+            data_by_sample[sid.lower()].append({
+                'sample_id': sid,
+                'file_name': fn,
+                'file_name_was_path': fn != fn_raw,
+            })
+            all_file_names.append(fn)
 
     # ── 3. Bucket file list ───────────────────────────────────────────
     bucket_file_names = []
@@ -1448,7 +1430,8 @@ def _get_raw_display(result: dict) -> tuple:
 
 def perform_bucket_validation(gs_bucket: str,
                outdir: Path,
-               save_metadata: bool = False) -> dict:
+               save_metadata: bool = False,
+               inventory_report: str = None) -> dict:
     """
     Perform pre-QC on a single GCS bucket and return results.
 
@@ -1460,6 +1443,9 @@ def perform_bucket_validation(gs_bucket: str,
         Output directory for TSV files and temp metadata.
     save_metadata : bool
         If True, keep downloaded metadata after processing.
+    inventory_report : str, optional
+        Inventory report file(s) to read the bucket structure from instead of
+        listing the bucket; metadata files are still downloaded from the bucket.
 
     Returns
     -------
@@ -1509,7 +1495,7 @@ def perform_bucket_validation(gs_bucket: str,
             return results
 
         structure, folder_name_map, case_warnings = list_bucket_structure(
-            gs_bucket, temp_dir, save_metadata, CASE_FOLDERS
+            gs_bucket, temp_dir, save_metadata, CASE_FOLDERS, inventory_report
         )
 
         for warning in case_warnings:
@@ -1591,7 +1577,10 @@ def perform_bucket_validation(gs_bucket: str,
                     f for f in (list(metadata_dir.glob('*.csv')) + list(metadata_dir.glob('*.CSV')))
                     if f.is_file() and not f.name.startswith('._')
                 ):
-                    delim = detect_csv_delimiter(csv_file)
+                    try:
+                        delim = csv_profile(csv_file).delimiter
+                    except Exception:
+                        delim = ','
                     if delim != ',':
                         non_comma_files.append(csv_file.name)
             if non_comma_files:
@@ -2055,6 +2044,15 @@ def main() -> int:
              "Default: False (temporary files are deleted)."
     )
 
+    parser.add_argument(
+        "-r",
+        "--inventory-report",
+        default=None,
+        help="Bucket inventory report (Storage Insights CSV or Parquet file,\n"
+             "directory of shards, or glob) to read the bucket structure from\n"
+             "instead of listing the bucket."
+    )
+
     args = parser.parse_args()
     save_metadata = args.save_metadata
     dataset_id = args.dataset_id
@@ -2077,10 +2075,11 @@ def main() -> int:
     print(f"Minimum CSV rows required: {MIN_CSV_ROWS}")
     print(f"Mandatory folders: {MANDATORY_DISPLAY}")
     print(f"Subdirectory levels to display: {NUMBER_SUBDIRS}")
-    print(f"Save metadata temp files: {'Yes' if save_metadata else 'No'}\n")
+    print(f"Save metadata temp files: {'Yes' if save_metadata else 'No'}")
+    print(f"Inventory report: {args.inventory_report or 'No (live listing)'}\n")
 
     try:
-        result = perform_bucket_validation(gs_bucket, outdir, save_metadata)
+        result = perform_bucket_validation(gs_bucket, outdir, save_metadata, args.inventory_report)
         report_path = outdir / "bucket_validation.md"
         generate_report([result], report_path)
     except Exception as e: